@@ -0,0 +1,148 @@
+import logging
+import threading
+from ctypes import byref, memmove, addressof
+
+import zlgcan
+
+logger = logging.getLogger("ZLG_CAN_TOOL")
+
+DEFAULT_SLOTS = 32        # 每通道硬體定時發送槽數 (保守值，依設備可調整)
+AUTO_PARAM_DELAY = 1      # ZCANFD_AUTO_TRANSMIT_OBJ_PARAM.type：首次發送延遲 (ms)
+
+
+class AutoSendError(Exception):
+    pass
+
+
+# --- 硬體定時發送表 ---
+# 將週期報文寫入設備的 auto_send / auto_send_canfd 槽，由硬體計時發送，主機端不再參與每個週期；
+# 槽位用完或週期無法以整數 ms 表示時，交給 fallback (軟體 CyclicScheduler) 處理。
+# 介面與 CyclicScheduler 相同 (add/update/remove/clear/keys/stats)，UI 可直接切換。
+class AutoSendTable:
+    def __init__(self, zcanlib, device_handle, chn, can_type, slots=DEFAULT_SLOTS, fallback=None):
+        self.zcanlib, self.device_handle, self.chn, self.fd = zcanlib, device_handle, chn, can_type == 1
+        self.slots, self.fallback = slots, fallback
+        self._hw = {}  # key -> [index, obj, period_ms, delay_ms]
+        self._sw = set()
+        self._lock = threading.Lock()
+
+    def _set(self, prop, value):
+        ret = self.zcanlib.ZCAN_SetValue(self.device_handle, f"{self.chn}/{prop}", value)
+        if ret != zlgcan.ZCAN_STATUS_OK: raise AutoSendError(f"設定 {self.chn}/{prop} 失敗 (ret={ret})")
+
+    def _build(self, index, can_id, data, period_ms, enable=1):
+        if self.fd:
+            obj = zlgcan.ZCANFD_AUTO_TRANSMIT_OBJ()
+            obj.obj.frame.len, obj.obj.frame.brs = len(data), 1
+        else:
+            obj = zlgcan.ZCAN_AUTO_TRANSMIT_OBJ()
+            obj.obj.frame.can_dlc = len(data)
+        obj.enable, obj.index, obj.interval = enable, index, period_ms
+        obj.obj.frame.can_id, obj.obj.frame.eff = can_id, 1 if can_id > 0x7FF else 0
+        obj.obj.transmit_type = 0
+        memmove(addressof(obj.obj.frame.data), bytes(data), len(data))
+        return obj
+
+    def _program(self, obj, delay_ms):
+        self._set("auto_send_canfd" if self.fd else "auto_send", byref(obj))
+        if delay_ms:
+            param = zlgcan.ZCANFD_AUTO_TRANSMIT_OBJ_PARAM()
+            param.indix, param.type, param.value = obj.index, AUTO_PARAM_DELAY, int(delay_ms)
+            self._set("auto_send_param", byref(param))
+        self._set("apply_auto_send", "0".encode("utf-8"))
+
+    def _free_index(self):
+        used = {slot[0] for slot in self._hw.values()}
+        return next((i for i in range(self.slots) if i not in used), None)
+
+    def add(self, key, can_id, data, period, delay_ms=0):
+        """新增或更新週期任務，回傳實際使用的模式 "HW" 或 "SW"。"""
+        period_ms = round(period * 1000)
+        with self._lock:
+            slot = self._hw.get(key)
+            if slot is not None:
+                if slot[2] == period_ms and slot[3] == delay_ms and slot[1].obj.frame.can_id == can_id:
+                    self._update_slot(slot, data); return "HW"
+                self._remove_hw(key)
+            index = self._free_index() if abs(period * 1000 - period_ms) < 1e-6 and period_ms >= 1 else None
+            if index is not None:
+                obj = self._build(index, can_id, data, period_ms)
+                try:
+                    self._program(obj, delay_ms)
+                except AutoSendError as e:
+                    logger.warning(f"硬體定時發送寫入失敗，改用軟體排程: {e}")
+                else:
+                    if key in self._sw: self._sw.discard(key); self.fallback.remove(key)
+                    self._hw[key] = [index, obj, period_ms, delay_ms]
+                    logger.info(f"硬體定時發送 {key} -> 槽 #{index} ({period_ms} ms, 延遲 {delay_ms} ms)")
+                    return "HW"
+            if self.fallback is None: raise AutoSendError(f"硬體定時發送槽已滿 ({self.slots})，且無軟體排程可用")
+            self._sw.add(key)
+        self.fallback.add(key, can_id, data, period)
+        return "SW"
+
+    def _update_slot(self, slot, data):
+        data = bytes(data)
+        frame = slot[1].obj.frame
+        n = frame.len if self.fd else frame.can_dlc
+        if n == len(data) and bytes(frame.data[:n]) == data: return
+        if self.fd: frame.len = len(data)
+        else: frame.can_dlc = len(data)
+        memmove(addressof(frame.data), data, len(data))
+        self._program(slot[1], 0)
+
+    def update(self, key, data):
+        with self._lock:
+            slot = self._hw.get(key)
+            if slot is not None: self._update_slot(slot, data); return
+            sw = key in self._sw
+        if sw: self.fallback.update(key, data)
+
+    def _remove_hw(self, key):
+        # 停用成功後才移出追蹤；失敗時槽仍在設備上發送，保留以便之後 remove/clear 再次停用
+        slot = self._hw[key]
+        slot[1].enable = 0
+        try: self._program(slot[1], 0)
+        except AutoSendError:
+            slot[1].enable = 1
+            raise
+        del self._hw[key]
+
+    def remove(self, key):
+        with self._lock:
+            if key in self._hw: self._remove_hw(key); return
+            sw = key in self._sw
+            self._sw.discard(key)
+        if sw: self.fallback.remove(key)
+
+    def clear(self):
+        with self._lock:
+            if self._hw:
+                try:
+                    self._set("clear_auto_send", "0".encode("utf-8"))
+                    self._hw.clear()
+                except AutoSendError as e:
+                    # 整批清除失敗時逐槽停用，仍失敗的槽保留追蹤
+                    logger.error(f"清除硬體定時發送失敗，改為逐槽停用: {e}")
+                    for key in list(self._hw):
+                        try: self._remove_hw(key)
+                        except AutoSendError as e: logger.error(f"停用硬體定時發送 {key} 失敗: {e}")
+            sw, self._sw = self._sw, set()
+        for key in sw: self.fallback.remove(key)
+
+    def keys(self):
+        with self._lock:
+            return list(self._hw) + list(self._sw)
+
+    def mode(self, key):
+        with self._lock:
+            return "HW" if key in self._hw else ("SW" if key in self._sw else None)
+
+    def stats(self):
+        with self._lock:
+            out = {k: {"mode": "HW", "slot": s[0], "period_ms": float(s[2]), "delay_ms": s[3]} for k, s in self._hw.items()}
+            sw = set(self._sw)
+        if sw:
+            for k, v in self.fallback.stats().items():
+                if k in sw: out[k] = dict(v, mode="SW")
+        return out
@@ -0,0 +1,229 @@
+"""ZLG CAN 測試工具效能基準：以模擬後端量測 RX/TX/編解碼/渲染熱路徑，結果輸出為 JSON。
+
+    python bench.py [--quick] [--out result.json]
+"""
+import os
+import sys
+import gc
+import json
+import time
+import logging
+import argparse
+import platform
+import subprocess
+from ctypes import byref
+from datetime import datetime
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "zlg"))
+
+import cantools
+import zlgcan
+from zcan_sim import SimZCAN
+from frame_store import FrameStore, DIR_TX, STATUS_OK
+from rx_worker import RxWorker
+from tx_batch import TxBatch, build_tx_frame
+from cyclic_tx import CyclicScheduler
+from msg_codec import EncoderTable, DecoderTable
+from log_view import build_log_table, MonitorView
+from hw_clock import host_now
+
+
+def _open_sim(fps=None, load=None, bus_limited=False):
+    zcanlib = SimZCAN(tx_fifo_s=3600.0)
+    if not bus_limited: zcanlib.abit = zcanlib.dbit = 10 ** 9  # 量測主機端成本時不讓虛擬匯流排成為瓶頸
+    dev = zcanlib.OpenDevice(zlgcan.ZCAN_USBCANFD_200U, 0, 0)
+    cfg = zlgcan.ZCAN_CHANNEL_INIT_CONFIG(); cfg.can_type = 1
+    chn = zcanlib.InitCAN(dev, 0, cfg); zcanlib.StartCAN(chn)
+    if fps or load: zcanlib.set_bus_load(load=load, fps=fps)
+    return zcanlib, dev, chn
+
+
+def _rate(n, wall, cpu):
+    return {"frames": n, "wall_s": round(wall, 4), "fps": round(n / wall) if wall else None,
+            "cpu_us_per_frame": round(cpu / n * 1e6, 3) if n else None}
+
+
+def synthetic_dbc(n_messages, n_signals=8):
+    from cantools.database.can import Message, Signal
+    messages = []
+    for m in range(n_messages):
+        width = 64 // n_signals
+        signals = [Signal(f"S{m}_{s}", start=s * width, length=width, minimum=0, maximum=(1 << width) - 1) for s in range(n_signals)]
+        messages.append(Message(0x100 + m, f"Msg{m}", 8, signals))
+    return cantools.database.can.Database(messages)
+
+
+# --- RX：模擬負載 -> RxWorker -> FrameStore ---
+def bench_rx(rates, duration):
+    out = []
+    for fps in rates:
+        zcanlib, dev, chn = _open_sim(fps=fps)
+        store = FrameStore(100000)
+        worker = RxWorker(zcanlib, chn, 1, store)
+        cpu0, t0 = time.process_time(), time.perf_counter()
+        worker.start(); time.sleep(duration); worker.stop()
+        wall, cpu = time.perf_counter() - t0, time.process_time() - cpu0
+        r = _rate(worker.stats.received, wall, cpu)
+        r.update(offered_fps=fps, full_batches=worker.stats.full_batches, dropped=zcanlib.bus_stats()["channels"][chn]["dropped"])
+        out.append(r)
+        zcanlib.CloseDevice(dev)
+    return out
+
+
+# --- TX：單筆 (send_can_message 路徑) 與批次 ---
+def bench_tx(n):
+    zcanlib, dev, chn = _open_sim()
+    store = FrameStore(9999)
+    payload = bytes(range(8))
+    cpu0, t0 = time.process_time(), time.perf_counter()
+    for i in range(n):
+        obj = build_tx_frame(0x123, payload, True)
+        zcanlib.TransmitFD(chn, byref(obj), 1)
+        store.append(host_now(), 0x123, DIR_TX, payload)
+    single = _rate(n, time.perf_counter() - t0, time.process_time() - cpu0)
+    batch = TxBatch(zcanlib, chn, 1, 256)
+    can_id, dlc, data = np.full(n, 0x123, np.uint32), np.full(n, 8, np.uint8), np.tile(np.arange(8, dtype=np.uint8), (n, 1))
+    cpu0, t0 = time.process_time(), time.perf_counter()
+    batch.send_arrays(can_id, dlc, data)
+    store.extend(host_now(), 0, can_id, DIR_TX, dlc, 0, STATUS_OK, data)
+    batched = _rate(n, time.perf_counter() - t0, time.process_time() - cpu0)
+    zcanlib.CloseDevice(dev)
+    return {"single": single, "batched": batched}
+
+
+# --- 週期發送抖動 (不同背景負載下) ---
+def bench_cyclic(loads, jobs, period, duration):
+    out = []
+    for load in loads:
+        zcanlib, dev, chn = _open_sim(load=load, bus_limited=True)
+        rx = RxWorker(zcanlib, chn, 1, FrameStore(100000)); rx.start()
+        sched = CyclicScheduler(zcanlib, chn, 1); sched.start()
+        for j in range(jobs): sched.add(f"J{j}", 0x200 + j, bytes(8), period)
+        time.sleep(duration)
+        stats = sched.stats()
+        sched.stop(); rx.stop(); zcanlib.CloseDevice(dev)
+        p99 = [s["p99_jitter_ms"] for s in stats.values() if "p99_jitter_ms" in s]
+        out.append({"bus_load": load, "jobs": jobs, "period_ms": period * 1e3, "rx_frames": rx.stats.received,
+                    "p99_jitter_ms": round(max(p99), 4) if p99 else None,
+                    "mean_period_ms": round(float(np.mean([s["mean_ms"] for s in stats.values() if "mean_ms" in s])), 4) if p99 else None,
+                    "overruns": sum(s["overruns"] for s in stats.values())})
+    return out
+
+
+# --- DBC 編碼/解碼 ---
+def bench_codec(sizes, n):
+    out = []
+    for size in sizes:
+        db = synthetic_dbc(size)
+        names = [m.name for m in db.messages]
+        enc = EncoderTable(db)
+        cpu0, t0 = time.process_time(), time.perf_counter()
+        for i in range(n):
+            m = names[i % size]
+            enc.encode(m, {f"S{i % size}_0": i & 0xFF})
+        encode = _rate(n, time.perf_counter() - t0, time.process_time() - cpu0)
+        msg = db.messages[0]
+        values = {s.name: 1 for s in msg.signals}
+        cpu0, t0 = time.process_time(), time.perf_counter()
+        for i in range(n // 10): values[msg.signals[0].name] = i & 0xFF; msg.encode(values)
+        baseline = _rate(n // 10, time.perf_counter() - t0, time.process_time() - cpu0)
+        dec = DecoderTable(db)
+        can_id = (0x100 + np.arange(n) % size).astype(np.uint32)
+        data = np.random.default_rng(0).integers(0, 256, (n, 8), dtype=np.uint8)
+        dlc = np.full(n, 8, np.uint8)
+        cpu0, t0 = time.process_time(), time.perf_counter()
+        dec.decode_rows(can_id, dlc, data)
+        decode = _rate(n, time.perf_counter() - t0, time.process_time() - cpu0)
+        out.append({"messages": size, "encode": encode, "cantools_encode": baseline, "decode": decode})
+    return out
+
+
+# --- 記憶體與監控表格渲染 ---
+def bench_memory(capacity=100000):
+    gc.collect()
+    store = FrameStore(capacity)
+    cols = (store.ts, store.hw_ts, store.can_id, store.direction, store.dlc, store.flags, store.status, store.data, store.chn, store.decoded)
+    return {"capacity": capacity, "bytes_per_frame": round(sum(c.nbytes for c in cols) / capacity, 1)}
+
+
+def bench_render(rows_list, history=100000, new_rows=100):
+    out = []
+    for rows in rows_list:
+        store = FrameStore(rows)
+        n = rows
+        store.extend(host_now() - np.arange(n)[::-1] * 1e-4, 0, np.full(n, 0x123, np.uint32), 0, 8, 0, STATUS_OK, np.ones((n, 8), np.uint8))
+        t0 = time.perf_counter()
+        build_log_table(store.latest(rows))
+        out.append({"rows": rows, "build_ms": round((time.perf_counter() - t0) * 1e3, 2)})
+    # 虛擬化監控視窗：大量歷史下每次刷新只格式化新進報文
+    store, view = FrameStore(history), MonitorView()
+    store.extend(host_now() - np.arange(history)[::-1] * 1e-5, 0, np.full(history, 0x123, np.uint32), 0, 8, 0, STATUS_OK, np.ones((history, 8), np.uint8))
+    view.render(store)
+    times = []
+    for _ in range(20):
+        store.extend(host_now(), 0, np.full(new_rows, 0x123, np.uint32), 0, 8, 0, STATUS_OK, np.ones((new_rows, 8), np.uint8))
+        t0 = time.perf_counter(); view.render(store); times.append(time.perf_counter() - t0)
+    out.append({"history": history, "window": view.page_rows, "new_rows": new_rows, "monitor_refresh_ms": round(float(np.median(times)) * 1e3, 2)})
+    return out
+
+
+def bench_ui_rerun(fps_list, reruns):
+    # 以 streamlit AppTest 無頭執行 main.py：連線模擬設備、開啟監控後量測每次 rerun 的耗時
+    try:
+        import streamlit as st
+        from streamlit.testing.v1 import AppTest
+    except ImportError:
+        return {"skipped": "streamlit.testing 無法使用"}
+    out = []
+    main_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "main.py")
+    for fps in fps_list:
+        os.environ["ZLG_SIM"], os.environ["ZLG_SIM_FPS"] = "1", str(fps)
+        st.cache_resource.clear()  # 讓 get_zcan_instance 以新的負載設定重建模擬後端
+        at = AppTest.from_file(main_path, default_timeout=60)
+        at.run()
+        next(b for b in at.sidebar.button if "連線" in b.label).click().run()
+        at.session_state["is_monitoring"] = True
+        times = []
+        for _ in range(reruns):
+            time.sleep(0.2)
+            t0 = time.perf_counter(); at.run(); times.append(time.perf_counter() - t0)
+        next(b for b in at.sidebar.button if "斷開" in b.label).click().run()
+        out.append({"offered_fps": fps, "rerun_ms_p50": round(float(np.median(times)) * 1e3, 1), "rerun_ms_max": round(max(times) * 1e3, 1)})
+    return out
+
+
+def _git_rev():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def run(quick=False, ui=True):
+    d = 0.5 if quick else 2.0
+    results = {
+        "rx": bench_rx([10000, 100000] if quick else [10000, 100000, 300000], d),
+        "tx": bench_tx(5000 if quick else 50000),
+        "cyclic": bench_cyclic([0.0, 0.5] if quick else [0.0, 0.5, 0.9], 8, 0.01, d),
+        "codec": bench_codec([10, 100] if quick else [10, 100, 1000], 5000 if quick else 50000),
+        "memory": bench_memory(),
+        "render": bench_render([1000, 9999]),
+    }
+    if ui: results["ui_rerun"] = bench_ui_rerun([1000] if quick else [1000, 20000], 3 if quick else 10)
+    return {"timestamp": datetime.now().isoformat(timespec="seconds"), "git": _git_rev(), "python": platform.python_version(),
+            "platform": platform.platform(), "cpu_count": os.cpu_count(), "quick": quick, "results": results}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="ZLG CAN 測試工具效能基準")
+    parser.add_argument("--quick", action="store_true", help="縮短量測時間 (CI 用)")
+    parser.add_argument("--no-ui", action="store_true", help="略過 streamlit rerun 量測")
+    parser.add_argument("--out", help="輸出 JSON 檔案路徑 (預設輸出到 stdout)")
+    args = parser.parse_args()
+    logging.getLogger("ZLG_CAN_TOOL").setLevel(logging.ERROR)
+    report = json.dumps(run(args.quick, not args.no_ui), ensure_ascii=False, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f: f.write(report)
+    else: print(report)
@@ -0,0 +1,175 @@
+import os
+import sys
+import time
+import signal
+import logging
+import argparse
+import binascii
+import threading
+
+from zlg_sdk import current_dir, zlg_env, USE_SIM, create_zcan
+
+logger = logging.getLogger("ZLG_CAN_TOOL")
+
+# --- 無頭擷取/發送 CLI ---
+# 不經 Streamlit，直接以 DeviceManager 開啟通道、錄製、依 DBC 週期發送並定時輸出各 ID 統計，適合長時間無人值守的耐久測試。
+# 頂層只匯入標準函式庫與 zlg_sdk (匯入本模組與 --help 不載入 numpy/SDK)；numpy、SDK 綁定與 DeviceManager 在 main() 解析參數後載入，
+# cantools 只在指定 --dbc 時載入 (且優先讀取解析快取)。
+# 例：python can_cli.py --model USBCANFD_200U --chn 0 1 --capture capture --dbc car.dbc --cyclic EngineData:10 --stats 1
+
+
+def parse_args(argv=None):
+    p = argparse.ArgumentParser(description="ZLG CAN 無頭擷取/發送工具")
+    p.add_argument("--model", default="USBCANFD_200U", help="設備型號 (見 channels.DEVICE_MODELS)")
+    p.add_argument("--dev", type=int, default=0, help="設備索引")
+    p.add_argument("--chn", type=int, nargs="+", default=[0], help="開啟的通道")
+    p.add_argument("--can", action="store_true", help="CAN 模式 (預設 CANFD)")
+    p.add_argument("--merged", action="store_true", help="設備合併擷取 (ReceiveData，一次呼叫取回所有通道，TX 以發送回顯的硬體時間戳記錄)")
+    p.add_argument("--tx", type=int, default=None, help="週期發送使用的通道 (預設為 --chn 第一個)")
+    p.add_argument("--dbc", help="DBC 檔案 (週期發送與統計中的報文名稱)")
+    p.add_argument("--cyclic", nargs="*", default=[], metavar="MSG[:ms]", help="週期發送的報文，未指定週期時使用 DBC 的 GenMsgCycleTime")
+    p.add_argument("--set", nargs="*", default=[], metavar="MSG.SIG=值", help="覆寫週期報文的訊號值")
+    p.add_argument("--hw-cyclic", action="store_true", help="使用硬體定時發送 (auto_send)")
+    p.add_argument("--filter-dbc", action="store_true", help="依 DBC 報文設定硬體濾波")
+    p.add_argument("--filter-slots", type=int, default=None, help="每通道硬體濾波組數 (預設依設備型號，不足的部分以軟體濾波)")
+    p.add_argument("--capture", metavar="DIR", help="錄製到此資料夾")
+    p.add_argument("--seg-mb", type=int, default=256, help="錄製分段大小 (MB)")
+    p.add_argument("--seg-min", type=int, default=60, help="錄製分段時間 (分)")
+    p.add_argument("--stats", type=float, default=1.0, metavar="秒", help="各 ID 統計輸出間隔，0 = 只在結束時輸出")
+    p.add_argument("--duration", type=float, default=0.0, metavar="秒", help="執行時間，0 = 直到 Ctrl+C")
+    p.add_argument("--store-size", type=int, default=20000, help="記憶體中保留的報文筆數")
+    p.add_argument("--sim-fps", type=float, default=None, help="模擬後端的背景報文速率")
+    p.add_argument("--log-level", default="WARNING")
+    return p.parse_args(argv)
+
+
+def load_dbc(path):
+    # 與網頁介面共用磁碟快取，重複執行時免去解析
+    from dbc_cache import DbcCache
+    try:
+        with open(path, "rb") as f: file_bytes = f.read()
+    except OSError as e: raise ValueError(f"無法讀取 DBC {path}: {e.strerror}")
+    compiled, source = DbcCache(os.path.join(current_dir, "dbc_cache")).load(file_bytes, binascii.crc32(file_bytes))
+    logger.info(f"DBC 載入成功 ({source}): {path}")
+    return compiled
+
+
+def _message(db, name):
+    try: return db.get_message_by_name(name)
+    except KeyError: raise ValueError(f"DBC 中沒有報文 {name}") from None
+
+
+def parse_cyclic(specs, db):
+    """"MSG" 或 "MSG:ms" -> [(報文名稱, 週期秒)]。"""
+    jobs = []
+    for spec in specs:
+        name, _, ms = spec.partition(":")
+        m_obj = _message(db, name)
+        period_ms = float(ms) if ms else m_obj.cycle_time
+        if not period_ms: raise ValueError(f"{name} 未指定週期且 DBC 無 GenMsgCycleTime")
+        jobs.append((name, period_ms / 1000.0))
+    return jobs
+
+
+def parse_sets(specs, db):
+    values = {}
+    for spec in specs:
+        key, _, val = spec.partition("=")
+        msg, _, sig = key.partition(".")
+        if not (msg and sig and val): raise ValueError(f"訊號設定格式錯誤: {spec}")
+        if sig not in {s.name for s in _message(db, msg).signals}: raise ValueError(f"報文 {msg} 沒有訊號 {sig}")
+        values.setdefault(msg, {})[sig] = float(val)
+    return values
+
+
+def format_stats(snap, names, chn_labels, now, prev_counts, elapsed, stale_factor=3.0, slack=0.1):
+    # 純文字版的固定 (依 ID) 檢視；速率以兩次輸出間的次數差計算
+    lines = [f"{'通道':<22}{'方向':<4}{'ID':>10}  {'報文':<20}{'次數':>10}{'fps':>9}{'週期ms':>10}{'最小':>9}{'最大':>9}  數據"]
+    counts = {}
+    for i in range(len(snap["can_id"])):
+        key = (int(snap["chn"][i]), int(snap["direction"][i]), int(snap["can_id"][i]))
+        count = int(snap["count"][i]); counts[key] = count
+        rate = (count - prev_counts.get(key, 0)) / elapsed if elapsed > 0 else 0.0
+        mean, lo, hi = (snap[k][i] * 1e3 for k in ("dt_mean", "dt_min", "dt_max"))
+        stale = mean == mean and now - snap["last_ts"][i] > mean * 1e-3 * stale_factor + slack
+        data = snap["data"][i][:snap["dlc"][i]].tobytes().hex(" ").upper()
+        lines.append(f"{chn_labels.get(key[0], f'CH{key[0]}'):<22}{('RX', 'TX')[key[1]]:<4}{hex(key[2]).upper():>10}  {names.get(key[2], '')[:19]:<20}"
+                     f"{count:>10}{rate:>9.1f}{mean:>10.3f}{lo:>9.3f}{hi:>9.3f}  {data}{'  ⚠️ 逾時' if stale else ''}")
+    prev_counts.clear(); prev_counts.update(counts)
+    return "\n".join(lines)
+
+
+def format_health(mgr):
+    parts = []
+    for label, link in mgr.links.items():
+        rs = link.rx_stats
+        parts.append(f"{label} RX {rs.received} 溢出 {rs.overruns}" + (f" 軟體濾波 {rs.filtered}" if rs.filtered else ""))
+    parts.append(f"緩衝覆寫 {mgr.store.overwritten}")
+    if mgr.capture is not None:
+        cs = mgr.capture.stats()
+        parts.append(f"錄製 {cs['frames_written']} 筆 {cs['rate_mbps']:.2f} MB/s 丟棄 {cs['dropped']} 分段 {cs['segments']}")
+    return " ｜ ".join(parts)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    logging.basicConfig(level=args.log_level.upper(), format="%(asctime)s [%(levelname)s] %(message)s", datefmt="%H:%M:%S", stream=sys.stderr)
+    with zlg_env():
+        import zlgcan
+        from device_manager import DeviceManager
+    t0 = time.perf_counter()
+    mgr = DeviceManager(create_zcan(sim_fps=args.sim_fps), zlg_env, getattr(zlgcan, "canfd_start", None), capacity=args.store_size)
+    stop_evt = threading.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM): signal.signal(sig, lambda *_: stop_evt.set())
+    try:
+        compiled = load_dbc(args.dbc) if args.dbc else None
+        if (args.cyclic or args.set) and compiled is None: raise ValueError("--cyclic/--set 需要 --dbc")
+        jobs = parse_cyclic(args.cyclic, compiled.db) if args.cyclic else []
+        sig_values = parse_sets(args.set, compiled.db) if args.set else {}
+        if args.filter_dbc:
+            if compiled is None: raise ValueError("--filter-dbc 需要 --dbc")
+            from hw_filter import plan_from_messages
+            mgr.hw_filter = plan_from_messages(compiled.db.messages)
+        errors = mgr.open_channels(args.model, args.dev, args.chn, 0 if args.can else 1, args.merged, args.filter_slots)
+        for label, err in errors.items(): print(f"{label} 連線失敗: {err}", file=sys.stderr)
+        if not mgr.connected: return 1
+        tx_chn = args.tx if args.tx is not None else args.chn[0]
+        link = next((l for l in mgr.links.values() if l.chn_index == tx_chn), None)
+        if jobs:
+            if link is None: raise ValueError(f"發送通道 CH{tx_chn} 未開啟")
+            from msg_codec import EncoderTable
+            encoders = EncoderTable(compiled.db)
+            engine = link.auto_send if args.hw_cyclic else link.scheduler
+            for name, period in jobs:
+                frame_id, payload = encoders.encode(name, sig_values.get(name))
+                engine.add(name, frame_id, payload, period)
+        if args.capture: mgr.start_capture(args.capture, max_bytes=args.seg_mb << 20, max_seconds=args.seg_min * 60)
+        print(f"已開啟 {', '.join(mgr.links)} ({'模擬後端' if USE_SIM else 'SDK'}，啟動 {(time.perf_counter() - t0) * 1e3:.0f} ms)", file=sys.stderr)
+
+        from hw_clock import host_now
+        names = {m.frame_id: m.name for m in compiled.db.messages} if compiled is not None else {}
+        tty = sys.stdout.isatty()
+        prev_counts, last = {}, host_now()
+        deadline = last + args.duration if args.duration > 0 else None
+        interval = args.stats if args.stats > 0 else 1.0
+        while not stop_evt.wait(interval if deadline is None else max(0.0, min(interval, deadline - host_now()))):
+            now = host_now()
+            if deadline is not None and now >= deadline: break
+            if args.stats > 0:
+                table = format_stats(mgr.id_stats.snapshot(), names, mgr.chn_labels, now, prev_counts, now - last)
+                print(("\x1b[H\x1b[2J" if tty else "") + table + "\n" + format_health(mgr), flush=True)
+                last = now
+        now = host_now()
+        print(format_stats(mgr.id_stats.snapshot(), names, mgr.chn_labels, now, prev_counts, now - last) + "\n" + format_health(mgr), flush=True)
+        if mgr.capture is not None:
+            paths = mgr.stop_capture().paths
+            print(f"錄製檔: {', '.join(paths)}", file=sys.stderr)
+        return 0
+    except (ValueError, OSError) as e:
+        print(f"錯誤: {e}", file=sys.stderr); return 2
+    finally:
+        mgr.shutdown()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
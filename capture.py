@@ -0,0 +1,186 @@
+import os
+import time
+import struct
+import logging
+import threading
+from collections import deque
+from datetime import datetime
+
+import numpy as np
+
+from frame_store import DIR_RX, FLAG_EFF, FLAG_RTR, FLAG_ERR, FLAG_FDF, FLAG_BRS, FLAG_ESI, MAX_PAYLOAD
+from hw_clock import to_wall
+
+logger = logging.getLogger("ZLG_CAN_TOOL")
+
+# --- 錄製檔格式 ---
+# 64 位元組檔頭 + 固定 96 位元組的記錄；記錄的 ts 為牆上時間 (epoch 秒)，hw_ts 為設備原始微秒時間戳。
+CAPTURE_MAGIC = b"CLNKCAP1"
+CAPTURE_VERSION = 1
+HEADER_SIZE = 64
+_HEADER = struct.Struct("<8sIId")  # magic, version, record_size, 開始時間 (epoch 秒)
+CAPTURE_DTYPE = np.dtype({
+    "names": ["ts", "hw_ts", "can_id", "chn", "direction", "dlc", "flags", "status", "reserved", "data", "spare"],
+    "formats": ["<f8", "<u8", "<u4", "u1", "u1", "u1", "u1", "<i2", "<u2", ("u1", MAX_PAYLOAD), ("u1", 4)],
+    "offsets": [0, 8, 16, 20, 21, 22, 23, 24, 26, 28, 92], "itemsize": 96})  # 不留隱含 padding，concatenate 後大小不變
+CAPTURE_EXT = ".clcap"
+
+
+class CaptureFormatError(Exception):
+    pass
+
+
+def write_header(fp, start_ts):
+    fp.write(_HEADER.pack(CAPTURE_MAGIC, CAPTURE_VERSION, CAPTURE_DTYPE.itemsize, start_ts).ljust(HEADER_SIZE, b"\0"))
+
+
+def read_header(fp):
+    raw = fp.read(HEADER_SIZE)
+    if len(raw) < HEADER_SIZE: raise CaptureFormatError("檔頭不完整")
+    magic, version, rec_size, start_ts = _HEADER.unpack_from(raw)
+    if magic != CAPTURE_MAGIC: raise CaptureFormatError("不是 can-link 錄製檔")
+    if rec_size != CAPTURE_DTYPE.itemsize: raise CaptureFormatError(f"不支援的記錄大小 {rec_size}")
+    return {"version": version, "record_size": rec_size, "start_ts": start_ts}
+
+
+def to_records(cols, chn=0):
+    """將 FrameStore 欄位快照轉成錄製記錄 (向量化複製)。"""
+    n = len(cols["can_id"])
+    rec = np.zeros(n, dtype=CAPTURE_DTYPE)
+    rec["ts"], rec["hw_ts"], rec["can_id"] = to_wall(cols["ts"]), cols["hw_ts"], cols["can_id"]
+    rec["chn"] = cols.get("chn", chn)
+    rec["direction"], rec["dlc"], rec["flags"], rec["status"] = cols["direction"], cols["dlc"], cols["flags"], cols["status"]
+    rec["data"][:, :cols["data"].shape[1]] = cols["data"]
+    return rec
+
+
+# --- 串流錄製執行緒 ---
+# 由 FrameStore sink 收到每批 RX/TX 報文 (已轉為固定記錄)，背景執行緒定時合併成一次大塊寫入；
+# 佇列有上限以保證記憶體有界，超出時丟棄並計數。依大小或時間切換分段檔。
+class CaptureWriter(threading.Thread):
+    def __init__(self, directory, prefix="capture", max_bytes=256 << 20, max_seconds=3600, max_queue_frames=1_000_000, flush_interval=0.25):
+        super().__init__(name="capture-writer", daemon=True)
+        self.directory, self.prefix = directory, prefix
+        self.max_bytes, self.max_seconds = max_bytes, max_seconds
+        self.max_queue_frames, self.flush_interval = max_queue_frames, flush_interval
+        self.frames_written = self.bytes_written = self.dropped = self.segments = 0
+        self.queued_frames = 0
+        self.rate_fps = self.rate_mbps = 0.0
+        self.current_path, self.paths = None, []
+        self._queue = deque()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop_evt = threading.Event()
+        self._fp, self._seg_bytes, self._seg_start = None, 0, 0.0
+
+    # FrameStore sink 介面
+    def __call__(self, cols):
+        self.push(to_records(cols))
+
+    def push(self, records):
+        n = len(records)
+        with self._lock:
+            # 停止後 (含最後一次 flush 之後) 到達的報文不再入列，計入丟棄
+            if self._stop_evt.is_set() or self.queued_frames + n > self.max_queue_frames:
+                self.dropped += n
+                return
+            self._queue.append((time.monotonic(), records))
+            self.queued_frames += n
+            wake = self.queued_frames >= 50000
+        if wake: self._wake.set()
+
+    @property
+    def lag_seconds(self):
+        with self._lock:
+            return time.monotonic() - self._queue[0][0] if self._queue else 0.0
+
+    def stats(self):
+        return {"frames_written": self.frames_written, "bytes_written": self.bytes_written, "dropped": self.dropped,
+                "queued_frames": self.queued_frames, "lag_s": self.lag_seconds, "rate_fps": self.rate_fps,
+                "rate_mbps": self.rate_mbps, "segments": self.segments, "current_path": self.current_path}
+
+    def stop(self, timeout=5.0):
+        with self._lock: self._stop_evt.set()
+        self._wake.set()
+        if self.is_alive(): self.join(timeout)
+        # 執行緒結束後若仍有停止前入列的報文，於此寫出，不留在佇列
+        if not self.is_alive() and self.queued_frames:
+            try: self._flush()
+            finally: self._close_segment()
+
+    def run(self):
+        os.makedirs(self.directory, exist_ok=True)
+        logger.info(f"開始錄製至 {self.directory}")
+        last = time.monotonic()
+        try:
+            while not self._stop_evt.is_set():
+                self._wake.wait(self.flush_interval); self._wake.clear()
+                written = self._flush()
+                now = time.monotonic()
+                dt, last = now - last, now
+                if dt > 0:
+                    self.rate_fps += 0.3 * (written / dt - self.rate_fps)
+                    self.rate_mbps += 0.3 * (written * CAPTURE_DTYPE.itemsize / dt / 1e6 - self.rate_mbps)
+            self._flush()
+        finally:
+            self._close_segment()
+            logger.info(f"錄製結束: {self.frames_written} 筆, {self.segments} 個分段, 丟棄 {self.dropped}")
+
+    def _flush(self):
+        with self._lock:
+            chunks, self._queue = list(self._queue), deque()
+            self.queued_frames = 0
+        if not chunks: return 0
+        records = np.concatenate([c[1] for c in chunks]) if len(chunks) > 1 else chunks[0][1]
+        if self._fp is None or self._seg_bytes >= self.max_bytes or time.monotonic() - self._seg_start >= self.max_seconds:
+            self._open_segment(float(records["ts"][0]))
+        buf = records.tobytes()
+        self._fp.write(buf)
+        self._seg_bytes += len(buf)
+        self.frames_written += len(records); self.bytes_written += len(buf)
+        return len(records)
+
+    def _open_segment(self, start_ts):
+        self._close_segment()
+        name = f"{self.prefix}_{datetime.fromtimestamp(start_ts).strftime('%Y%m%d_%H%M%S')}_{self.segments:03d}{CAPTURE_EXT}"
+        self.current_path = os.path.join(self.directory, name)
+        self._fp = open(self.current_path, "wb", buffering=4 << 20)
+        write_header(self._fp, start_ts)
+        self._seg_bytes, self._seg_start = HEADER_SIZE, time.monotonic()
+        self.segments += 1; self.paths.append(self.current_path)
+
+    def _close_segment(self):
+        if self._fp is not None:
+            self._fp.close(); self._fp = None
+
+
+def iter_capture(path, chunk=65536):
+    with open(path, "rb") as fp:
+        read_header(fp)
+        while True:
+            rec = np.fromfile(fp, dtype=CAPTURE_DTYPE, count=chunk)
+            if len(rec) == 0: break
+            yield rec
+
+
+def export_capture(paths, dst_path):
+    """將一或多個錄製分段轉為 Vector ASC (.asc) 或 BLF (.blf)，依副檔名決定格式 (需要 python-can)。"""
+    import can
+    ext = os.path.splitext(dst_path)[1].lower()
+    if ext not in (".asc", ".blf"): raise ValueError(f"不支援的匯出格式: {ext}")
+    writer = can.ASCWriter(dst_path) if ext == ".asc" else can.BLFWriter(dst_path)
+    count = 0
+    try:
+        for path in ([paths] if isinstance(paths, str) else paths):
+            for rec in iter_capture(path):
+                for r in rec:
+                    flags, n = int(r["flags"]), int(r["dlc"])
+                    writer.on_message_received(can.Message(
+                        timestamp=float(r["ts"]), arbitration_id=int(r["can_id"]), is_extended_id=bool(flags & FLAG_EFF),
+                        is_remote_frame=bool(flags & FLAG_RTR), is_error_frame=bool(flags & FLAG_ERR),
+                        is_fd=bool(flags & FLAG_FDF), bitrate_switch=bool(flags & FLAG_BRS), error_state_indicator=bool(flags & FLAG_ESI),
+                        is_rx=int(r["direction"]) == DIR_RX, channel=int(r["chn"]), dlc=n, data=r["data"][:n].tobytes()))
+                    count += 1
+    finally:
+        writer.stop()
+    return count
@@ -0,0 +1,180 @@
+import os
+import logging
+import threading
+from contextlib import nullcontext
+import xml.etree.ElementTree as ET
+from functools import lru_cache
+
+import zlgcan
+from hw_clock import DeviceClock
+from rx_worker import RxWorker
+from cyclic_tx import CyclicScheduler
+from auto_send import AutoSendTable
+from tx_batch import TxBatch
+from hw_filter import apply_filters, device_filter_slots, fit_plan
+
+logger = logging.getLogger("ZLG_CAN_TOOL")
+
+PROPERTY_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "zlg", "kerneldlls", "devices_property")
+
+# 設備型號 -> (ZCAN 設備類型, devices_property 描述檔)
+DEVICE_MODELS = {
+    "USBCANFD_200U": (41, "usbcanfd-200u.xml"),
+    "USBCANFD_100U": (42, "usbcanfd-100u.xml"),
+    "USBCANFD_400U": (76, "usbcanfd-400u.xml"),
+    "USBCANFD_800U": (59, "usbcanfd-800u.xml"),
+    "PCIE_CANFD_100U": (38, "pcie-canfd-100u.xml"),
+    "PCIE_CANFD_200U": (39, "pcie-canfd-200u.xml"),
+    "PCIE_CANFD_400U": (40, "pcie-canfd-400u.xml"),
+}
+
+
+@lru_cache(maxsize=None)
+def channel_count(model):
+    """由 devices_property 描述檔的通道選項數取得設備通道數 (讀取失敗時視為 1)。"""
+    try:
+        root = ET.parse(os.path.join(PROPERTY_DIR, DEVICE_MODELS[model][1])).getroot()
+        options = root.find("channel/meta/options")
+        return len(options) if options is not None and len(options) else 1
+    except (KeyError, OSError, ET.ParseError) as e:
+        logger.warning(f"無法讀取 {model} 通道數: {e}")
+        return 1
+
+
+# --- 已開啟的設備 (多個通道共用一個設備 handle) ---
+class DevicePool:
+    def __init__(self, zcanlib, env=None):
+        self.zcanlib, self.env = zcanlib, env or nullcontext
+        self._devices = {}  # (model, index) -> [handle, 使用中的通道數, 設備資訊]
+        self._lock = threading.Lock()
+
+    def acquire(self, model, index):
+        with self._lock:
+            entry = self._devices.get((model, index))
+            if entry is None:
+                with self.env(): handle = self.zcanlib.OpenDevice(DEVICE_MODELS[model][0], index, 0)
+                if handle == zlgcan.INVALID_DEVICE_HANDLE: raise RuntimeError(f"OpenDevice 失敗 ({model} #{index})，設備可能被佔用")
+                try: info = str(self.zcanlib.GetDeviceInf(handle))
+                except Exception: info = "資訊讀取失敗"
+                entry = self._devices[(model, index)] = [handle, 0, info]
+                logger.info(f"開啟設備 {model} #{index} (handle={handle})")
+            entry[1] += 1
+            return entry[0]
+
+    def release(self, model, index):
+        with self._lock:
+            entry = self._devices.get((model, index))
+            if entry is None: return
+            entry[1] -= 1
+            if entry[1] <= 0:
+                del self._devices[(model, index)]
+                with self.env(): self.zcanlib.CloseDevice(entry[0])
+                logger.info(f"關閉設備 {model} #{index}")
+
+    def info(self):
+        with self._lock:
+            return {f"{m} #{i}": e[2] for (m, i), e in self._devices.items()}
+
+
+# --- 單一通道連線 ---
+# 每個通道有獨立的 RX 擷取執行緒、設備時鐘、週期發送排程、硬體定時發送表與批次發送緩衝；
+# 報文以 chn 欄位標記來源後寫入共用的 FrameStore，監控畫面依時間戳合併顯示。
+class ChannelLink:
+    def __init__(self, pool, model, dev_index, chn_index, can_type, chn_id, filter_slots=None):
+        self.pool, self.model, self.dev_index, self.chn_index = pool, model, dev_index, chn_index
+        self.can_type, self.chn_id = can_type, chn_id
+        self.d_handle = self.c_handle = None
+        self.clock = self.rx_worker = self.scheduler = self.auto_send = self.tx_batch = None
+        self.tx_lock = threading.Lock()         # tx_batch 的緩衝區由所有 session 共用，打包到送出之間須互斥
+        self.device_rx = self._rx_stats = None  # 設備層合併擷取時共用的 DeviceRxWorker 與本通道的統計
+        self.tx_echo = False                    # 開啟發送回顯：TX 報文由擷取端以硬體時間戳記錄
+        # 硬體範圍濾波組數：預設依設備類型，可由參數覆寫 (韌體版本不同時)
+        self.filter_slots = filter_slots if filter_slots is not None else device_filter_slots(DEVICE_MODELS[model][0])
+        self.filters = []     # 要求的濾波範圍 [(mode, start, end)]，空表示全部放行
+        self.hw_filters = []  # 實際寫入硬體的範圍；與 filters 不同時其餘由軟體濾波
+
+    @property
+    def label(self):
+        return f"{self.model}#{self.dev_index}/CH{self.chn_index}"
+
+    @property
+    def rx_stats(self):
+        return self.rx_worker.stats if self.rx_worker is not None else self._rx_stats
+
+    def open(self, canfd_start=None):
+        zcanlib = self.pool.zcanlib
+        self.d_handle = self.pool.acquire(self.model, self.dev_index)
+        try:
+            with self.pool.env():
+                if self.can_type == 1 and canfd_start is not None:
+                    handle = canfd_start(zcanlib, self.d_handle, self.chn_index)
+                    if not handle: raise RuntimeError("canfd_start 失敗")
+                else:
+                    config = zlgcan.ZCAN_CHANNEL_INIT_CONFIG()
+                    config.can_type = self.can_type
+                    handle = zcanlib.InitCAN(self.d_handle, self.chn_index, config)
+                    if not handle or zcanlib.StartCAN(handle) != zlgcan.ZCAN_STATUS_OK: raise RuntimeError("通道啟動失敗")
+        except Exception:
+            self.pool.release(self.model, self.dev_index); self.d_handle = None
+            raise
+        self.c_handle = handle
+        logger.info(f"通道 {self.label} 已啟動 (handle={handle})")
+
+    def start(self, store, device_rx=None):
+        """啟動收發；device_rx 為同一設備共用的 DeviceRxWorker 時改為合併擷取並開啟發送回顯。"""
+        zcanlib = self.pool.zcanlib
+        if device_rx is None:
+            self.clock = DeviceClock()
+            self.rx_worker = RxWorker(zcanlib, self.c_handle, self.can_type, store, self.clock, chn=self.chn_id)
+            self.rx_worker.start()
+        else:
+            with self.pool.env(): ret = zcanlib.ZCAN_SetValue(self.d_handle, f"{self.chn_index}/set_device_tx_echo", "1".encode("utf-8"))
+            self.tx_echo = ret == zlgcan.ZCAN_STATUS_OK
+            if not self.tx_echo: logger.warning(f"{self.label} 發送回顯開啟失敗，TX 改以送出時間記錄")
+            self.device_rx, self.clock = device_rx, device_rx.clock
+            self._rx_stats = device_rx.attach(self.chn_index, self.c_handle, self.chn_id)
+        self.scheduler = CyclicScheduler(zcanlib, self.c_handle, self.can_type, store, chn=self.chn_id, echo=self.tx_echo)
+        self.scheduler.start()
+        self.tx_batch = TxBatch(zcanlib, self.c_handle, self.can_type)
+        self.auto_send = AutoSendTable(zcanlib, self.d_handle, self.chn_index, self.can_type, fallback=self.scheduler)
+
+    def set_filters(self, plan):
+        """設定接收濾波。槽數不足時硬體只寫入合併後較寬的範圍 (或不設硬體濾波)，精確比對改由擷取端軟體濾波。"""
+        zcanlib, plan = self.pool.zcanlib, list(plan)
+        try: hw = fit_plan(plan, self.filter_slots)
+        except ValueError: hw = []
+        # 先套用軟體濾波，切換期間硬體多放行的報文仍會被擋下
+        self._set_sw_filter(plan if hw != plan else None)
+        # 濾波在通道運作中直接以 filter_ack 生效，不需 ResetCAN/StartCAN
+        if self.filter_slots:
+            with self.pool.env():
+                try: apply_filters(zcanlib, self.d_handle, self.chn_index, hw)
+                except RuntimeError as e:
+                    if not hw: raise
+                    logger.warning(f"{self.label} 硬體濾波寫入失敗 ({e})，改以軟體濾波")
+                    hw = []
+                    self._set_sw_filter(plan)
+                    apply_filters(zcanlib, self.d_handle, self.chn_index, hw)
+        if hw != plan: logger.info(f"{self.label} 硬體濾波 {len(hw)}/{self.filter_slots} 組，{len(plan)} 組範圍由軟體濾波比對")
+        self.filters, self.hw_filters = plan, hw
+
+    def _set_sw_filter(self, plan):
+        if self.rx_worker is not None: self.rx_worker.sw_filter = plan
+        elif self.device_rx is not None: self.device_rx.set_filter(self.chn_index, plan)
+
+    def close(self):
+        if self.auto_send is not None:
+            # 硬體定時發送在主機端停止後仍會持續，斷線前必須清除
+            try: self.auto_send.clear()
+            except Exception as e: logger.error(f"清除硬體定時發送異常 ({self.label}): {e}")
+        if self.scheduler is not None: self.scheduler.stop()
+        if self.rx_worker is not None: self.rx_worker.stop()
+        if self.device_rx is not None and self.device_rx.detach(self.chn_index):
+            self.device_rx.stop()  # 設備上最後一個通道，須在關閉設備前停止合併擷取
+        self.auto_send = self.scheduler = self.rx_worker = self.tx_batch = self.device_rx = None
+        if self.c_handle:
+            try: self.pool.zcanlib.ResetCAN(self.c_handle)
+            except Exception as e: logger.error(f"ResetCAN 異常 ({self.label}): {e}")
+        if self.d_handle is not None: self.pool.release(self.model, self.dev_index)
+        self.d_handle = self.c_handle = None
+        logger.info(f"通道 {self.label} 已關閉")
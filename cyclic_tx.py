@@ -0,0 +1,186 @@
+import heapq
+import logging
+import platform
+import threading
+import numpy as np
+
+from frame_store import DIR_TX, FLAG_EFF, FLAG_FDF, FLAG_BRS, STATUS_OK, STATUS_TX_FAIL, STATUS_EXCP
+from hw_clock import host_now
+from tx_batch import TxBatch, build_tx_frame
+
+logger = logging.getLogger("ZLG_CAN_TOOL")
+
+SPIN_WINDOW = 0.001  # 截止時間前最後 1 ms 改為忙等，避開 OS 排程誤差
+
+
+# --- 週期統計 ---
+class PeriodStats:
+    def __init__(self, period, window=1000):
+        self.period = period
+        self.count = 0      # 已發送次數
+        self.overruns = 0   # 因延誤而跳過的週期數
+        self.errors = 0     # 發送失敗次數
+        self._samples = np.zeros(window, dtype=np.float64)
+        self._n = 0
+
+    def record(self, measured):
+        self._samples[self._n % len(self._samples)] = measured
+        self._n += 1
+
+    def summary(self):
+        s = self._samples[:min(self._n, len(self._samples))]
+        if len(s) == 0:
+            return {"period_ms": self.period * 1e3, "count": self.count, "overruns": self.overruns, "errors": self.errors}
+        jitter = np.abs(s - self.period)
+        return {"period_ms": self.period * 1e3, "count": self.count, "overruns": self.overruns, "errors": self.errors,
+                "mean_ms": float(s.mean() * 1e3), "min_ms": float(s.min() * 1e3), "max_ms": float(s.max() * 1e3),
+                "p99_jitter_ms": float(np.percentile(jitter, 99) * 1e3)}
+
+
+class _Job:
+    __slots__ = ("key", "can_id", "data", "flags", "period", "due", "last_sent", "tx_obj", "stats", "gen")
+
+
+# --- 週期發送排程執行緒 ---
+# 以單調時鐘上的絕對截止時間排程 (next = due + period)，不會因單次延遲累積漂移；
+# 若已落後超過一個週期則跳過錯過的週期並記為 overrun，而非補發一串報文。
+# 同一時刻到期的多個任務合併為一次 TransmitFD/Transmit 呼叫。
+class CyclicScheduler(threading.Thread):
+    def __init__(self, zcanlib, chn_handle, can_type, store=None, chn=0, echo=False, clock=host_now):
+        super().__init__(name=f"cyclic-{chn_handle}", daemon=True)
+        self.zcanlib, self.chn_handle, self.fd, self.store, self.chn = zcanlib, chn_handle, can_type == 1, store, chn
+        self.clock = clock  # 單調時鐘 (秒)；預設 host_now，可替換以便測試控制時間
+        self.echo = echo  # 通道開啟發送回顯時，成功送出的報文由擷取端以硬體時間戳記錄
+        self._batch = TxBatch(zcanlib, chn_handle, can_type, capacity=64)
+        self._jobs, self._heap = {}, []
+        self._cond = threading.Condition()
+        self._running = True
+
+    def add(self, key, can_id, data, period):
+        """新增或更新週期任務；週期不變時只替換報文內容並保留相位。"""
+        data = bytes(data)
+        with self._cond:
+            job = self._jobs.get(key)
+            if job is not None and job.period == period and job.can_id == can_id:
+                if job.data != data: self._set_payload(job, data)
+                return
+            job = _Job()
+            job.key, job.can_id, job.period = key, can_id, period
+            job.gen = (self._jobs[key].gen + 1) if key in self._jobs else 0
+            job.last_sent, job.stats = None, PeriodStats(period)
+            self._set_payload(job, data)
+            job.due = self.clock()
+            self._jobs[key] = job
+            heapq.heappush(self._heap, (job.due, key, job.gen))
+            self._cond.notify()
+
+    def update(self, key, data):
+        with self._cond:
+            job = self._jobs.get(key)
+            if job is not None and job.data != bytes(data): self._set_payload(job, bytes(data))
+
+    def remove(self, key):
+        with self._cond:
+            self._jobs.pop(key, None)
+            self._cond.notify()
+
+    def clear(self):
+        with self._cond:
+            self._jobs.clear(); self._heap.clear()
+            self._cond.notify()
+
+    def keys(self):
+        with self._cond:
+            return list(self._jobs)
+
+    def stats(self):
+        with self._cond:
+            return {k: j.stats.summary() for k, j in self._jobs.items()}
+
+    def stop(self, timeout=1.0):
+        with self._cond:
+            self._running = False
+            self._cond.notify()
+        if self.is_alive(): self.join(timeout)
+
+    def _set_payload(self, job, data):
+        job.data = data
+        job.flags = (FLAG_EFF if job.can_id > 0x7FF else 0) | (FLAG_FDF | FLAG_BRS if self.fd else 0)
+        job.tx_obj = build_tx_frame(job.can_id, data, self.fd)
+
+    def run(self):
+        logger.info(f"週期發送排程啟動 (handle={self.chn_handle})")
+        clock = self.clock
+        with _fine_timer():
+            while True:
+                with self._cond:
+                    job = self._next_job()
+                    if not self._running: break
+                    if job is None:
+                        self._cond.wait(); continue
+                    remaining = job.due - clock()
+                    if remaining > SPIN_WINDOW:
+                        self._cond.wait(remaining - SPIN_WINDOW); continue
+                    heapq.heappop(self._heap)
+                    due_jobs = [job]
+                    while len(due_jobs) < self._batch.capacity:
+                        nxt = self._next_job()
+                        if nxt is None or nxt.due > job.due + SPIN_WINDOW: break
+                        heapq.heappop(self._heap); due_jobs.append(nxt)
+                while clock() < job.due: pass
+                self._fire(due_jobs)
+        logger.info(f"週期發送排程結束 (handle={self.chn_handle})")
+
+    def _next_job(self):
+        # 丟棄已移除或已重新排程的舊項目
+        while self._heap:
+            due, key, gen = self._heap[0]
+            job = self._jobs.get(key)
+            if job is not None and job.gen == gen and job.due == due: return job
+            heapq.heappop(self._heap)
+        return None
+
+    def _fire(self, jobs):
+        batch = self._batch
+        for job in jobs: batch.add_frame(job.tx_obj)
+        try:
+            accepted, failed = batch.submit(), STATUS_TX_FAIL
+        except Exception as e:
+            logger.error(f"週期發送異常 ({len(jobs)} 筆): {e}")
+            accepted, failed = 0, STATUS_EXCP
+        now = self.clock()
+        for i, job in enumerate(jobs):
+            stats, status = job.stats, (STATUS_OK if i < accepted else failed)
+            if status != STATUS_OK: stats.errors += 1
+            else: stats.count += 1
+            if job.last_sent is not None: stats.record(now - job.last_sent)
+            job.last_sent = now
+            if self.store is not None and not (self.echo and status == STATUS_OK):
+                self.store.append(now, job.can_id, DIR_TX, job.data, job.flags, status, chn=self.chn)
+        with self._cond:
+            for job in jobs:
+                if self._jobs.get(job.key) is not job: continue
+                due = job.due + job.period
+                if due < now:
+                    missed = int((now - due) // job.period) + 1
+                    job.stats.overruns += missed
+                    due += missed * job.period
+                job.due = due
+                heapq.heappush(self._heap, (due, job.key, job.gen))
+
+
+class _fine_timer:
+    # Windows 預設排程粒度約 15.6 ms，排程期間將系統計時器解析度提升到 1 ms
+    def __enter__(self):
+        self._winmm = None
+        if platform.system() == "Windows":
+            try:
+                from ctypes import windll
+                self._winmm = windll.winmm
+                self._winmm.timeBeginPeriod(1)
+            except Exception:
+                self._winmm = None
+        return self
+
+    def __exit__(self, *exc):
+        if self._winmm is not None: self._winmm.timeEndPeriod(1)
@@ -0,0 +1,103 @@
+import os
+import pickle
+import logging
+import threading
+from collections import OrderedDict
+
+import cantools
+
+from msg_codec import signal_meta
+
+logger = logging.getLogger("ZLG_CAN_TOOL")
+
+CACHE_FORMAT = 1  # 快取內容結構改變時遞增，舊檔自動失效
+CACHE_EXT = ".dbcpkl"
+
+
+class CompiledDbc:
+    """解析後的 DBC 與由它推導、各 session 共用的唯讀資料。"""
+    __slots__ = ("db", "by_id", "sig_meta", "display_map", "file_hash")
+
+    def __init__(self, db, file_hash):
+        self.db, self.file_hash = db, file_hash
+        self.by_id = {m.frame_id: m for m in db.messages}
+        self.sig_meta = {m.name: signal_meta(m) for m in db.messages}
+        self.display_map = {f"{m.name} [0x{m.frame_id:03X}] ({m.frame_id})": m.name for m in db.messages}
+
+
+# --- DBC 解析快取 ---
+# 以檔案內容的 crc32 (加上長度與 cantools 版本) 為鍵：行程內以 LRU 保留最近的解析結果，跨 session 直接共用；
+# 磁碟上以 pickle 保存，重新啟動後免去數秒的解析。磁碟總量超過 max_bytes 時依最後使用時間淘汰。
+class DbcCache:
+    def __init__(self, directory, max_bytes=256 << 20, max_memory=8):
+        self.directory, self.max_bytes, self.max_memory = directory, max_bytes, max_memory
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = {"memory": 0, "disk": 0, "parsed": 0}
+
+    @staticmethod
+    def key(file_hash, size):
+        return f"{file_hash:08x}_{size}_cantools{cantools.__version__}_v{CACHE_FORMAT}"
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + CACHE_EXT)
+
+    def load(self, file_bytes, file_hash):
+        """回傳 (CompiledDbc, 來源)；來源為 "memory"、"disk" 或 "parsed"。解析失敗時拋出例外。"""
+        key = self.key(file_hash, len(file_bytes))
+        with self._lock:
+            compiled = self._memory.get(key)
+            if compiled is not None:
+                self._memory.move_to_end(key); self.hits["memory"] += 1
+                return compiled, "memory"
+        compiled, source = self._load_disk(key), "disk"
+        if compiled is None:
+            compiled, source = CompiledDbc(cantools.database.load_string(file_bytes.decode("utf-8")), file_hash), "parsed"
+            self._store_disk(key, compiled)
+        with self._lock:
+            self._memory[key] = compiled
+            while len(self._memory) > self.max_memory: self._memory.popitem(last=False)
+            self.hits[source] += 1
+        return compiled, source
+
+    def _load_disk(self, key):
+        path = self._path(key)
+        if not os.path.exists(path): return None
+        try:
+            with open(path, "rb") as f: compiled = pickle.load(f)
+            os.utime(path)  # 更新最後使用時間 (LRU 依據)
+            return compiled
+        except Exception as e:
+            logger.warning(f"DBC 快取讀取失敗，改為重新解析: {e}")
+            try: os.remove(path)
+            except OSError: pass
+            return None
+
+    def _store_disk(self, key, compiled):
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            tmp = self._path(key) + ".tmp"
+            with open(tmp, "wb") as f: pickle.dump(compiled, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, self._path(key))
+        except Exception as e:
+            logger.warning(f"DBC 快取寫入失敗: {e}"); return
+        self._evict()
+
+    def _evict(self):
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(CACHE_EXT): continue
+            path = os.path.join(self.directory, name)
+            try: stat = os.stat(path)
+            except OSError: continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        total = sum(e[1] for e in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes: break
+            try: os.remove(path); total -= size
+            except OSError: pass
+
+    def disk_usage(self):
+        if not os.path.isdir(self.directory): return 0, 0
+        sizes = [os.path.getsize(os.path.join(self.directory, n)) for n in os.listdir(self.directory) if n.endswith(CACHE_EXT)]
+        return len(sizes), sum(sizes)
@@ -0,0 +1,207 @@
+import logging
+import threading
+from ctypes import byref
+from contextlib import nullcontext
+
+import numpy as np
+
+from frame_store import FrameStore, DIR_TX, FLAG_EFF, FLAG_FDF, FLAG_BRS, STATUS_OK, STATUS_OFFLINE, STATUS_EXCP, STATUS_TX_FAIL
+from hw_clock import host_now
+from id_stats import IdStats
+from signal_series import SignalSeries
+from msg_codec import DecoderTable, DecodeWorker
+
+logger = logging.getLogger("ZLG_CAN_TOOL")
+
+
+# --- 行程共用的設備管理器 ---
+# 擁有 ZCAN handle、各通道的 RX/TX 執行緒、共用 FrameStore 與其上的統計/解碼/錄製/回放；
+# 所有瀏覽器分頁 (以及無頭模式) 共用同一份，各 session 只保留自己的畫面狀態與游標。
+# 依賴 zlgcan 的模組在第一次開啟通道時才匯入，沒有 SDK 時仍可檢視 FrameStore 與 DBC。
+class DeviceManager:
+    def __init__(self, zcanlib, env=None, canfd_start=None, capacity=100000):
+        self.zcanlib, self.env, self.canfd_start = zcanlib, env or nullcontext, canfd_start
+        self.pool = None
+        self.store = FrameStore(capacity)
+        self.id_stats = IdStats()
+        self.store.add_sink(self.id_stats)
+        self.series = SignalSeries()
+        self.links = {}       # 標籤 -> ChannelLink
+        self._dev_rx = {}     # (型號, 設備索引) -> DeviceRxWorker (設備層合併擷取)
+        self.chn_labels = {}  # 通道編號 -> 標籤 (斷線後保留，舊報文仍能顯示來源)
+        self.hw_filter = []
+        self.decoder = self.decode_worker = None
+        self.capture = self.replay = None
+        self.capture_paths = []
+        self._lock = threading.RLock()
+
+    @property
+    def connected(self):
+        return bool(self.links)
+
+    def info(self):
+        return self.pool.info() if self.pool is not None else {}
+
+    # --- 連線 ---
+    def open_channels(self, model, dev_index, chn_indices, can_type, merged=False, filter_slots=None):
+        """開啟所選通道 (已開啟的略過)，回傳 {標籤: 錯誤訊息} (成功者不列入)。
+
+        merged 時同一設備的通道以一次 ReceiveData 合併擷取；擷取模式由設備上第一個開啟的通道決定。
+        filter_slots 覆寫每通道硬體濾波組數 (預設依設備型號)。
+        """
+        from channels import DEVICE_MODELS, DevicePool, ChannelLink
+        errors = {}
+        with self._lock:
+            if self.pool is None: self.pool = DevicePool(self.zcanlib, self.env)
+            for chn_index in chn_indices:
+                link = ChannelLink(self.pool, model, dev_index, chn_index, can_type, len(self.chn_labels), filter_slots)
+                if link.label in self.links: continue
+                try:
+                    logger.info(f"啟動硬體連線 {link.label} (Type: {DEVICE_MODELS[model][0]})...")
+                    link.open(self.canfd_start)
+                    link.start(self.store, self._device_rx(link, merged))
+                    if self.hw_filter: link.set_filters(self.hw_filter)
+                except Exception as e:
+                    logger.error(f"連線異常 {link.label}: {e}")
+                    errors[link.label] = str(e)
+                    worker = self._dev_rx.get((model, dev_index))
+                    if worker is not None and worker.detach(chn_index): worker.stop()
+                    link.close()
+                    continue
+                self.links[link.label] = link
+                self.chn_labels[link.chn_id] = link.label
+        return errors
+
+    def _device_rx(self, link, merged):
+        from rx_worker import DeviceRxWorker
+        key = (link.model, link.dev_index)
+        worker = self._dev_rx.get(key)
+        if worker is not None and worker.active: return worker
+        if not merged: return None
+        if any((l.model, l.dev_index) == key for l in self.links.values()):
+            logger.warning(f"{link.label}: 設備已以單通道模式擷取，不切換為合併擷取")
+            return None
+        worker = self._dev_rx[key] = DeviceRxWorker(self.zcanlib, link.d_handle, self.store)
+        worker.start()
+        return worker
+
+    def close_all(self):
+        with self._lock:
+            self.stop_replay()
+            for link in self.links.values(): link.close()
+            self.links, self._dev_rx = {}, {}
+
+    def set_filters(self, plan):
+        errors = {}
+        with self._lock:
+            self.hw_filter = list(plan)
+            for label, link in self.links.items():
+                try: link.set_filters(plan)
+                except Exception as e:
+                    logger.error(f"硬體濾波設定失敗 {label}: {e}"); errors[label] = str(e)
+        return errors
+
+    # --- 發送 ---
+    def send(self, label, msg_id, data):
+        """單筆發送並寫入 FrameStore，回傳狀態碼。"""
+        link = self.links.get(label)
+        status = STATUS_OFFLINE
+        if link is not None and link.c_handle is not None:
+            from tx_batch import build_tx_frame
+            try:
+                with self.env():
+                    obj = build_tx_frame(msg_id, data, link.can_type == 1)
+                    ret = (self.zcanlib.TransmitFD if link.can_type == 1 else self.zcanlib.Transmit)(link.c_handle, byref(obj), 1)
+                status = STATUS_OK if ret == 1 else (STATUS_TX_FAIL if ret == 0 else ret)
+            except Exception as e:
+                logger.error(f"發送異常 ID {hex(msg_id)}: {e}"); status = STATUS_EXCP
+            if link.tx_echo and status == STATUS_OK: return status  # 由發送回顯以硬體時間戳記錄
+        fd = link.can_type == 1 if link is not None else False
+        flags = (FLAG_EFF if msg_id > 0x7FF else 0) | (FLAG_FDF | FLAG_BRS if fd else 0)
+        self.store.append(host_now(), msg_id, DIR_TX, data, flags, status, chn=link.chn_id if link is not None else 0)
+        return status
+
+    def send_batch(self, label, frames):
+        """多筆報文以批次 DLL 呼叫送出，回傳每批被接受的筆數。"""
+        n = len(frames)
+        if n == 0: return []
+        link = self.links.get(label)
+        can_id = np.fromiter((f[0] for f in frames), dtype=np.uint32, count=n)
+        dlc = np.fromiter((len(f[1]) for f in frames), dtype=np.uint8, count=n)
+        data = np.zeros((n, 64), dtype=np.uint8)
+        for i, (_, payload) in enumerate(frames): data[i, :len(payload)] = np.frombuffer(bytes(payload), dtype=np.uint8)
+        status = np.full(n, STATUS_OFFLINE, dtype=np.int16)
+        accepted = []
+        batch = link.tx_batch if link is not None else None
+        if batch is not None:
+            try:
+                with link.tx_lock: accepted = batch.send_arrays(can_id, dlc, data)
+                cap = batch.capacity
+                ok = np.concatenate([np.arange(min(cap, n - b * cap)) < a for b, a in enumerate(accepted)])
+                status = np.where(ok, STATUS_OK, STATUS_TX_FAIL).astype(np.int16)
+            except Exception as e:
+                logger.error(f"批次發送異常: {e}")
+                status[:] = STATUS_EXCP
+        if link is not None and link.tx_echo:
+            keep = status != STATUS_OK  # 送出的報文由發送回顯記錄，這裡只記錄失敗
+            can_id, dlc, data, status = can_id[keep], dlc[keep], data[keep], status[keep]
+        fd = link.can_type == 1 if link is not None else False
+        flags = np.where(can_id > 0x7FF, FLAG_EFF, 0).astype(np.uint8) | (FLAG_FDF | FLAG_BRS if fd else 0)
+        self.store.extend(host_now(), 0, can_id, DIR_TX, dlc, flags, status, data, link.chn_id if link is not None else 0)
+        return accepted
+
+    # --- DBC 解碼 ---
+    def set_dbc(self, db, by_id=None):
+        """更換解碼用的 DBC；共用的 decoded 欄位與訊號曲線以最後載入的 DBC 為準。"""
+        with self._lock:
+            self.decoder = DecoderTable(db, by_id=by_id) if db is not None else None
+            if self.decode_worker is None:
+                self.decode_worker = DecodeWorker(self.store, self.decoder, series=self.series)
+                self.decode_worker.start()
+            else: self.decode_worker.table = self.decoder
+        return self.decoder
+
+    # --- 錄製與回放 ---
+    def start_capture(self, directory, max_bytes=256 << 20, max_seconds=3600):
+        from capture import CaptureWriter
+        with self._lock:
+            if self.capture is not None: return self.capture
+            writer = CaptureWriter(directory, max_bytes=max_bytes, max_seconds=max_seconds)
+            writer.start()
+            self.store.add_sink(writer)
+            self.capture = writer
+        return writer
+
+    def stop_capture(self):
+        with self._lock:
+            writer = self.capture
+            if writer is not None:
+                # remove_sink 需取得 store 鎖，返回後已無進行中的 sink 呼叫；之後再停止寫入執行緒
+                self.store.remove_sink(writer)
+                writer.stop()
+                self.capture, self.capture_paths = None, writer.paths
+        return writer
+
+    def start_replay(self, label, paths, **kwargs):
+        from replay import ReplayEngine
+        with self._lock:
+            link = self.links[label]
+            self.stop_replay()
+            self.replay = ReplayEngine(self.zcanlib, link.c_handle, link.can_type, paths, store=self.store, chn=link.chn_id, echo=link.tx_echo, **kwargs)
+            self.replay.start()
+        return self.replay
+
+    def stop_replay(self):
+        with self._lock:
+            if self.replay is not None:
+                self.replay.stop()
+                self.replay = None
+
+    def clear(self):
+        self.store.clear(); self.id_stats.clear(); self.series.clear()
+
+    def shutdown(self):
+        """行程結束時呼叫：停止錄製/回放、清除硬體定時發送並關閉所有設備。"""
+        self.stop_capture()
+        self.close_all()
+        if self.decode_worker is not None: self.decode_worker.stop()
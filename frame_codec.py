@@ -0,0 +1,104 @@
+from ctypes import sizeof
+
+import numpy as np
+
+import zlgcan
+from frame_store import FLAG_EFF, FLAG_RTR, FLAG_ERR, FLAG_FDF, FLAG_BRS, FLAG_ESI
+
+# --- 與 zlgcan ctypes 結構一一對應的 NumPy 結構化 dtype ---
+# can_id 欄位為 32-bit 字組中的位元欄：bit0-28 ID、bit29 err、bit30 rtr、bit31 eff；
+# CANFD 第 6 個位元組為 brs(bit0)/esi(bit1)。
+CAN_FRAME_DTYPE = np.dtype({
+    "names": ["id_word", "len", "pad", "res0", "res1", "data"],
+    "formats": ["<u4", "u1", "u1", "u1", "u1", ("u1", 8)],
+    "offsets": [0, 4, 5, 6, 7, 8], "itemsize": 16})
+CANFD_FRAME_DTYPE = np.dtype({
+    "names": ["id_word", "len", "pad", "res0", "res1", "data"],
+    "formats": ["<u4", "u1", "u1", "u1", "u1", ("u1", 64)],
+    "offsets": [0, 4, 5, 6, 7, 8], "itemsize": 72})
+RX_CAN_DTYPE = np.dtype({"names": ["frame", "timestamp"], "formats": [CAN_FRAME_DTYPE, "<u8"], "offsets": [0, 16], "itemsize": 24})
+RX_CANFD_DTYPE = np.dtype({"names": ["frame", "timestamp"], "formats": [CANFD_FRAME_DTYPE, "<u8"], "offsets": [0, 72], "itemsize": 80})
+TX_CAN_DTYPE = np.dtype({"names": ["frame", "transmit_type"], "formats": [CAN_FRAME_DTYPE, "<u4"], "offsets": [0, 16], "itemsize": 20})
+TX_CANFD_DTYPE = np.dtype({"names": ["frame", "transmit_type"], "formats": [CANFD_FRAME_DTYPE, "<u4"], "offsets": [0, 72], "itemsize": 76})
+
+assert RX_CAN_DTYPE.itemsize == sizeof(zlgcan.ZCAN_Receive_Data)
+assert RX_CANFD_DTYPE.itemsize == sizeof(zlgcan.ZCAN_ReceiveFD_Data)
+assert TX_CAN_DTYPE.itemsize == sizeof(zlgcan.ZCAN_Transmit_Data)
+assert TX_CANFD_DTYPE.itemsize == sizeof(zlgcan.ZCAN_TransmitFD_Data)
+
+# ZCANDataObj (ReceiveData/TransmitData 合併收發)：dataType、chnl 之後為 ZCANFDData，
+# 其中 flag 為位元欄字組 (由低位起 frameType 2、txDelay 2、transmitType 4、txEchoRequest 1、txEchoed 1)，frame 一律為 CANFD 版面。
+DATAOBJ_DTYPE = np.dtype({
+    "names": ["data_type", "chnl", "obj_flag", "timestamp", "flag", "frame"],
+    "formats": ["u1", "u1", "<u2", "<u8", "<u4", CANFD_FRAME_DTYPE],
+    "offsets": [0, 1, 2, 8, 16, 24], "itemsize": 100})
+assert DATAOBJ_DTYPE.itemsize == sizeof(zlgcan.ZCANDataObj)
+assert DATAOBJ_DTYPE.fields["frame"][1] == zlgcan.ZCANDataObj.zcanfddata.offset + zlgcan.ZCANFDData.frame.offset
+
+DT_CAN_CANFD = 1             # dataType：CAN/CANFD 報文 (其餘為錯誤/GPS/LIN 等)
+DATA_FRAME_FD = 1            # flag.frameType：CANFD
+DATA_ECHO_REQUEST = 1 << 8   # flag.txEchoRequest：發送時要求回顯
+DATA_ECHOED = 1 << 9         # flag.txEchoed：此筆為本通道發送的回顯 (時間戳為實際上匯流排時間)
+TX_ECHO_FLAG = 0x20          # 單通道介面的回顯標記 (frame.__pad bit5)
+
+ID_MASK = 0x1FFFFFFF
+
+
+def rx_view(msgs, count, fd):
+    """將 Receive/ReceiveFD 回傳的 ctypes 陣列零複製地解讀為結構化陣列。"""
+    return np.frombuffer(msgs, dtype=RX_CANFD_DTYPE if fd else RX_CAN_DTYPE, count=count)
+
+
+# id_word 最高 3 位元 (err/rtr/eff) 與 CANFD pad 位元組 -> FrameStore flags 的查表
+_TOP_FLAGS = np.array([(k >> 2 & 1) * FLAG_EFF | (k >> 1 & 1) * FLAG_RTR | (k & 1) * FLAG_ERR for k in range(8)], dtype=np.uint8)
+_PAD_FLAGS = np.array([FLAG_FDF | (k & 1) * FLAG_BRS | (k >> 1 & 1) * FLAG_ESI for k in range(256)], dtype=np.uint8)
+
+
+def decode_buffers(n):
+    """decode_batch 的輸出欄位 (可預先配置後重複使用)。"""
+    return {"can_id": np.empty(n, np.uint32), "flags": np.empty(n, np.uint8), "top": np.empty(n, np.uint32),
+            "pad": np.empty(n, np.uint8), "ts": np.empty(n, np.float64),
+            "fd": np.empty(n, np.bool_), "echoed": np.empty(n, np.bool_), "valid": np.empty(n, np.bool_)}
+
+
+def decode_batch(view, fd, out=None):
+    """向量化拆解一批報文，回傳 FrameStore 欄位 (data 為對接收緩衝區的檢視，未複製)。
+
+    out 為 decode_buffers 配置的欄位時結果寫入其中，不配置新陣列。
+    """
+    n = len(view)
+    if out is None: out = decode_buffers(n)
+    frame = view["frame"]
+    word = frame["id_word"]
+    can_id, flags, top = out["can_id"][:n], out["flags"][:n], out["top"][:n]
+    np.bitwise_and(word, ID_MASK, out=can_id)
+    np.right_shift(word, 29, out=top)
+    np.take(_TOP_FLAGS, top, out=flags, mode="clip")
+    if fd:
+        pad = out["pad"][:n]
+        np.take(_PAD_FLAGS, frame["pad"], out=pad, mode="clip")
+        flags |= pad
+    return {"can_id": can_id, "dlc": frame["len"], "flags": flags,
+            "data": frame["data"], "hw_ts": view["timestamp"]}
+
+
+def decode_data_batch(view, out=None):
+    """拆解一批 ZCANDataObj：除 decode_batch 的欄位外另回傳 chnl、echoed (發送回顯) 與 valid (是否為 CAN/CANFD 報文)。"""
+    n = len(view)
+    if out is None: out = decode_buffers(n)
+    frame = view["frame"]
+    word, flag = frame["id_word"], view["flag"]
+    can_id, flags, top, pad = out["can_id"][:n], out["flags"][:n], out["top"][:n], out["pad"][:n]
+    fd, echoed, valid = out["fd"][:n], out["echoed"][:n], out["valid"][:n]
+    np.bitwise_and(word, ID_MASK, out=can_id)
+    np.right_shift(word, 29, out=top)
+    np.take(_TOP_FLAGS, top, out=flags, mode="clip")
+    np.bitwise_and(flag, 3, out=top)
+    np.equal(top, DATA_FRAME_FD, out=fd)
+    np.take(_PAD_FLAGS, frame["pad"], out=pad, mode="clip")
+    np.bitwise_or(flags, pad, out=flags, where=fd)
+    np.bitwise_and(flag, DATA_ECHOED, out=top)
+    np.not_equal(top, 0, out=echoed)
+    np.equal(view["data_type"], DT_CAN_CANFD, out=valid)
+    return {"can_id": can_id, "dlc": frame["len"], "flags": flags, "data": frame["data"], "hw_ts": view["timestamp"],
+            "chnl": view["chnl"], "echoed": echoed, "valid": valid}
@@ -0,0 +1,181 @@
+import time
+import logging
+import threading
+
+import numpy as np
+
+logger = logging.getLogger("ZLG_CAN_TOOL")
+
+# --- 欄位編碼 ---
+DIR_RX, DIR_TX = 0, 1
+DIR_LABELS = ("RX", "TX")
+
+FLAG_EFF, FLAG_RTR, FLAG_ERR, FLAG_FDF, FLAG_BRS, FLAG_ESI = 0x01, 0x02, 0x04, 0x08, 0x10, 0x20
+
+STATUS_OK, STATUS_OFFLINE, STATUS_EXCP, STATUS_TX_FAIL = 0, -1, -2, -3
+STATUS_LABELS = {STATUS_OK: "OK", STATUS_OFFLINE: "OFFLINE", STATUS_EXCP: "EXCP", STATUS_TX_FAIL: "Err:0"}
+
+MAX_PAYLOAD = 64
+
+
+def hex_rows(data, dlc):
+    # 只對實際要顯示的列做十六進位格式化
+    return [bytes(row[:n]).hex(" ").upper() for row, n in zip(data, dlc)]
+
+
+def status_label(code):
+    return STATUS_LABELS.get(int(code), f"Err:{int(code)}")
+
+
+# --- 欄式 (columnar) 報文儲存區 ---
+# 以預先配置的 NumPy 陣列做環形寫入，append 為 O(1)；讀取時依游標切出新到舊的欄位快照，
+# 渲染與匯出皆直接使用欄位陣列，不再為每筆報文配置 dict。
+class FrameStore:
+    def __init__(self, capacity=9999):
+        self.capacity = capacity
+        self.seq = 0     # 累計寫入筆數，亦作為讀取游標的基準
+        self._floor = 0  # 清空時的 seq，之前的報文視為不存在
+        self.ts = np.zeros(capacity, dtype=np.float64)     # 主機 perf_counter 秒 (已由設備時間對齊)
+        self.hw_ts = np.zeros(capacity, dtype=np.uint64)   # 設備原始微秒時間戳，TX 未回顯時為 0
+        self.can_id = np.zeros(capacity, dtype=np.uint32)
+        self.direction = np.zeros(capacity, dtype=np.uint8)
+        self.dlc = np.zeros(capacity, dtype=np.uint8)
+        self.flags = np.zeros(capacity, dtype=np.uint8)
+        self.status = np.zeros(capacity, dtype=np.int16)
+        self.data = np.zeros((capacity, MAX_PAYLOAD), dtype=np.uint8)
+        self.chn = np.zeros(capacity, dtype=np.uint8)       # 通道編號 (多設備/多通道時區分來源)
+        self.decoded = np.full(capacity, None, dtype=object)  # DBC 解碼後的訊號值 (由 DecodeWorker 回填)
+        self._sinks = []  # 寫入後以批次欄位呼叫的接收者 (錄製、統計等)；於鎖內依 seq 順序呼叫
+        self.sink_errors = 0
+        self._sink_err_logged = 0.0
+        self._lock = threading.Lock()
+
+    def add_sink(self, sink):
+        with self._lock: self._sinks = self._sinks + [sink]
+
+    def remove_sink(self, sink):
+        with self._lock: self._sinks = [s for s in self._sinks if s is not sink]
+
+    def _emit(self, cols):
+        # 呼叫端持有 self._lock；sink 異常不影響寫入，計數並每 5 秒最多記錄一次
+        for sink in self._sinks:
+            try: sink(cols)
+            except Exception as e:
+                self.sink_errors += 1
+                now = time.monotonic()
+                if now - self._sink_err_logged >= 5.0:
+                    self._sink_err_logged = now
+                    logger.error(f"FrameStore sink 異常 (累計 {self.sink_errors} 次): {e}")
+
+    @property
+    def overwritten(self):
+        return max(0, self.seq - self.capacity)
+
+    def __len__(self):
+        return min(self.seq - self._floor, self.capacity)
+
+    def _columns(self):
+        return (self.ts, self.hw_ts, self.can_id, self.direction, self.dlc, self.flags, self.status, self.data, self.chn)
+
+    def append(self, ts, can_id, direction, data, flags=0, status=STATUS_OK, hw_ts=0, chn=0):
+        n = len(data)
+        with self._lock:
+            i = self.seq % self.capacity
+            self.ts[i], self.hw_ts[i], self.can_id[i], self.direction[i] = ts, hw_ts, can_id, direction
+            self.dlc[i], self.flags[i], self.status[i], self.chn[i] = n, flags, status, chn
+            row = self.data[i]
+            row[:n] = np.frombuffer(bytes(data), dtype=np.uint8)
+            row[n:] = 0
+            self.decoded[i] = None
+            self.seq += 1
+            if self._sinks:
+                self._emit({"ts": self.ts[i:i + 1], "hw_ts": self.hw_ts[i:i + 1], "can_id": self.can_id[i:i + 1], "direction": self.direction[i:i + 1],
+                            "dlc": self.dlc[i:i + 1], "flags": self.flags[i:i + 1], "status": self.status[i:i + 1], "data": self.data[i:i + 1], "chn": self.chn[i:i + 1]})
+
+    def extend(self, ts, hw_ts, can_id, direction, dlc, flags, status, data, chn=0):
+        # 批次寫入；data 為 (n, w) 陣列 (w <= 64，其餘補 0)，其餘欄位可為等長陣列或純量
+        n = len(data)
+        if n == 0: return
+        values = [ts, hw_ts, can_id, direction, dlc, flags, status, data, chn]
+        with self._lock:
+            if n > self.capacity:
+                skip = n - self.capacity
+                values = [v[skip:] if np.ndim(v) else v for v in values]
+                self.seq, n = self.seq + skip, self.capacity
+            start = self.seq % self.capacity
+            first = min(n, self.capacity - start)
+            self.decoded[start:start + first] = None
+            if first < n: self.decoded[:n - first] = None
+            for dst, src in zip(self._columns(), values):
+                if dst.ndim == 2 and src.shape[1] < dst.shape[1]:
+                    dst[start:start + first, src.shape[1]:] = 0
+                    if first < n: dst[:n - first, src.shape[1]:] = 0
+                    dst = dst[:, :src.shape[1]]
+                if np.ndim(src) == 0:
+                    dst[start:start + first] = src
+                    if first < n: dst[:n - first] = src
+                else:
+                    dst[start:start + first] = src[:first]
+                    if first < n: dst[:n - first] = src[first:n]
+            self.seq += n
+            if self._sinks:
+                # 寫入後再通知，sink 看到的順序與 seq 一致，超出容量而略過的前段也不會送出
+                self._emit(dict(zip(("ts", "hw_ts", "can_id", "direction", "dlc", "flags", "status", "data", "chn"),
+                                    (np.broadcast_to(v, (n,)) if np.ndim(v) == 0 else v for v in values))))
+
+    def _snapshot(self, idx):
+        return {"ts": self.ts[idx], "hw_ts": self.hw_ts[idx], "can_id": self.can_id[idx], "direction": self.direction[idx], "dlc": self.dlc[idx],
+                "flags": self.flags[idx], "status": self.status[idx], "data": self.data[idx], "chn": self.chn[idx], "decoded": self.decoded[idx]}
+
+    def since(self, cursor, limit=None):
+        """回傳 (游標之後的欄位快照 [新到舊], 新游標, 因覆寫而遺失的筆數)。"""
+        with self._lock:
+            seq, cap = self.seq, self.capacity
+            start = max(cursor, seq - cap, self._floor)
+            if limit is not None: start = max(start, seq - limit)
+            cols = self._snapshot(np.arange(seq - 1, start - 1, -1) % cap)
+        return cols, seq, max(0, seq - cap - cursor)
+
+    def bounds(self):
+        """目前仍保留的 seq 範圍 [first, end)。"""
+        with self._lock: return max(self.seq - self.capacity, self._floor), self.seq
+
+    def window(self, start, end):
+        """回傳 seq 在 [start, end) 內仍保留的報文快照 [新到舊] 與實際起點 (已覆寫的部分略過)。"""
+        with self._lock:
+            start, end = max(start, self.seq - self.capacity, self._floor), min(end, self.seq)
+            return self._snapshot(np.arange(end - 1, start - 1, -1) % self.capacity), start
+
+    def take(self, seqs):
+        """回傳指定 seq (依傳入順序) 中仍保留者的欄位快照。"""
+        seqs = np.asarray(seqs, dtype=np.int64)
+        with self._lock:
+            seqs = seqs[seqs >= max(self.seq - self.capacity, self._floor)]
+            return self._snapshot(seqs % self.capacity)
+
+    def read(self, cursor, limit=None):
+        """依時間順序 (舊到新) 讀取游標之後的報文，回傳 (欄位快照, 第一筆的 seq, 新游標)。"""
+        with self._lock:
+            seq, cap = self.seq, self.capacity
+            start = max(cursor, seq - cap, self._floor)
+            end = seq if limit is None else min(seq, start + limit)
+            idx = np.arange(start, end) % cap
+            cols = {"ts": self.ts[idx], "hw_ts": self.hw_ts[idx], "can_id": self.can_id[idx], "direction": self.direction[idx],
+                    "dlc": self.dlc[idx], "flags": self.flags[idx], "status": self.status[idx], "data": self.data[idx], "chn": self.chn[idx]}
+        return cols, start, end
+
+    def set_decoded(self, start_seq, values):
+        # 回填解碼結果；已被覆寫的列略過
+        with self._lock:
+            lo = max(start_seq, self.seq - self.capacity)
+            hi = min(start_seq + len(values), self.seq)
+            if hi <= lo: return
+            self.decoded[np.arange(lo, hi) % self.capacity] = values[lo - start_seq:hi - start_seq]
+
+    def latest(self, limit=None):
+        """回傳最新 limit 筆的欄位快照 [新到舊]。"""
+        return self.since(0, limit)[0]
+
+    def clear(self):
+        with self._lock:
+            self._floor = self.seq
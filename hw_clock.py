@@ -0,0 +1,62 @@
+import time
+import threading
+from collections import deque
+
+import numpy as np
+
+# --- 主機時間基準 ---
+# 全部報文時間戳統一使用 perf_counter (單調、高解析度)；顯示時再以啟動時的錨點換算為牆上時間。
+host_now = time.perf_counter
+_MONO0, _WALL0 = time.perf_counter(), time.time()
+
+
+def to_wall(mono):
+    return _WALL0 + (mono - _MONO0)
+
+
+# --- 設備時間 → 主機單調時間的映射 ---
+# 每個接收批次只取一組 (最後一筆的設備時間戳, 接收返回時的主機時間)。主機時間必定晚於實際收到時間，
+# 因此以視窗內的下包絡 (最小延遲) 決定偏移，並以最小平方估計兩個時鐘的頻率差 (漂移)。
+class DeviceClock:
+    MAX_SKEW_PPM = 1000.0
+
+    def __init__(self, window=256, min_span=2.0, skew_alpha=0.2):
+        self.window, self.min_span, self.skew_alpha = window, min_span, skew_alpha
+        self.skew = 1.0     # 主機秒 / 設備秒
+        self.offset = None  # host = offset + skew * dev
+        self.resets = 0
+        self._pairs = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    @property
+    def synced(self):
+        return self.offset is not None
+
+    @property
+    def drift_ppm(self):
+        return (self.skew - 1.0) * 1e6
+
+    def observe(self, dev_us, host_s):
+        dev_s = float(dev_us) * 1e-6
+        with self._lock:
+            if self._pairs and dev_s < self._pairs[-1][0] - 1.0:
+                # 設備時間倒退 (重新上電/計數器歸零)，重新同步
+                self._pairs.clear(); self.skew, self.resets = 1.0, self.resets + 1
+            self._pairs.append((dev_s, host_s))
+            pairs = np.array(self._pairs)
+            dev, host = pairs[:, 0], pairs[:, 1]
+            span = dev[-1] - dev[0]
+            if len(pairs) >= 8 and span >= self.min_span:
+                d, h = dev - dev.mean(), host - host.mean()
+                slope = float((d * h).sum() / (d * d).sum())
+                limit = self.MAX_SKEW_PPM * 1e-6
+                slope = min(max(slope, 1.0 - limit), 1.0 + limit)
+                self.skew += self.skew_alpha * (slope - self.skew)
+            self.offset = float((host - self.skew * dev).min())
+
+    def to_host(self, dev_us, out=None):
+        """設備微秒時間戳 (純量或陣列) → 主機 perf_counter 秒；out 為預先配置的 float64 陣列時寫入其中。"""
+        if out is None: return self.offset + self.skew * (np.asarray(dev_us, dtype=np.float64) * 1e-6)
+        np.multiply(dev_us, 1e-6, out=out)
+        out *= self.skew; out += self.offset
+        return out
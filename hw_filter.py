@@ -0,0 +1,101 @@
+import logging
+
+import numpy as np
+
+import zlgcan
+from frame_store import FLAG_EFF, FLAG_ERR
+
+logger = logging.getLogger("ZLG_CAN_TOOL")
+
+FILTER_STD, FILTER_EXT = 0, 1   # filter_mode：標準幀 / 擴展幀範圍
+MAX_FILTER_SLOTS = 64           # 規劃濾波時的預設槽數上限
+
+# ZCAN 設備類型 -> 每通道可設定的範圍濾波組數；未列出的設備視為沒有硬體範圍濾波，全部改由軟體濾波
+FILTER_SLOTS = {
+    41: 64, 42: 64, 76: 64, 59: 64,   # USBCANFD-200U/100U/400U/800U
+    38: 64, 39: 64, 40: 64,           # PCIE-CANFD-100U/200U/400U
+}
+
+
+def device_filter_slots(dev_type):
+    """設備類型每通道的硬體範圍濾波組數 (未知設備為 0)。"""
+    return FILTER_SLOTS.get(dev_type, 0)
+
+
+def _merge_ranges(kinds, max_slots):
+    # kinds：[(mode, 起點陣列, 終點陣列)]，各自已排序且不重疊；保留最大的間隔作為分界
+    kinds = [k for k in kinds if len(k[1])]
+    if not kinds: return []
+    budget = max_slots - len(kinds)
+    if budget < 0: raise ValueError(f"濾波槽數不足 ({max_slots})")
+    steps = [starts[1:] - ends[:-1] for _, starts, ends in kinds]
+    gaps = [np.nonzero(step > 1)[0] for step in steps]
+    sizes = np.concatenate([step[g] for step, g in zip(steps, gaps)])
+    owner = np.concatenate([np.full(len(g), k) for k, g in enumerate(gaps)])
+    keep = np.zeros(len(sizes), dtype=bool)
+    keep[np.argsort(-sizes, kind="stable")[:budget]] = True
+    plan = []
+    for k, ((mode, starts, ends), g) in enumerate(zip(kinds, gaps)):
+        split = np.sort(g[keep[owner == k]])
+        first = starts[np.concatenate(([0], split + 1))]
+        last = ends[np.concatenate((split, [len(ends) - 1]))]
+        plan += [(mode, int(s), int(e)) for s, e in zip(first, last)]
+    return plan
+
+
+def plan_filters(std_ids=(), ext_ids=(), max_slots=MAX_FILTER_SLOTS):
+    """把 ID 集合合併成不超過 max_slots 組的 [(mode, start, end)] 範圍。
+
+    連續 ID 先併為一組；仍超出槽數時保留最大的間隔作為分界，其餘間隔併入範圍，
+    多放行的 ID 數因此最少 (標準幀與擴展幀共用槽數)。
+    """
+    kinds = []
+    for mode, ids in ((FILTER_STD, std_ids), (FILTER_EXT, ext_ids)):
+        ids = np.unique(np.asarray(ids, dtype=np.int64))
+        kinds.append((mode, ids, ids))
+    return _merge_ranges(kinds, max_slots)
+
+
+def fit_plan(plan, max_slots):
+    """把既有範圍再合併到不超過 max_slots 組 (槽數較少的設備用)，放行範圍只會擴大。"""
+    if len(plan) <= max_slots: return list(plan)
+    kinds = []
+    for mode in (FILTER_STD, FILTER_EXT):
+        ranges = np.array(sorted((s, e) for m, s, e in plan if m == mode), dtype=np.int64).reshape(-1, 2)
+        kinds.append((mode, ranges[:, 0], np.maximum.accumulate(ranges[:, 1]) if len(ranges) else ranges[:, 1]))
+    return _merge_ranges(kinds, max_slots)
+
+
+def plan_mask(plan, can_id, flags, out):
+    """逐筆判斷報文是否通過 plan (軟體濾波)，結果寫入 out；錯誤幀與硬體濾波相同一律放行。"""
+    eff = (flags & FLAG_EFF) != 0
+    np.not_equal(flags & FLAG_ERR, 0, out=out)
+    for mode, start, end in plan: out |= (eff == (mode == FILTER_EXT)) & (can_id >= start) & (can_id <= end)
+    return out
+
+
+def plan_from_messages(messages, max_slots=MAX_FILTER_SLOTS):
+    """由 cantools Message 列表計算濾波範圍。"""
+    std = [m.frame_id for m in messages if not m.is_extended_frame]
+    ext = [m.frame_id for m in messages if m.is_extended_frame]
+    return plan_filters(std, ext, max_slots)
+
+
+def plan_coverage(plan):
+    """範圍實際放行的 ID 數 (含為合併而多放行的 ID)。"""
+    return sum(e - s + 1 for _, s, e in plan)
+
+
+def apply_filters(zcanlib, d_handle, chn_index, plan):
+    """以 filter_clear/mode/start/end/ack 寫入通道濾波；plan 為空時清除濾波 (全部放行)。通道不需重啟。"""
+    def set_value(prop, value):
+        ret = zcanlib.ZCAN_SetValue(d_handle, f"{chn_index}/{prop}", value.encode("utf-8"))
+        if ret != zlgcan.ZCAN_STATUS_OK: raise RuntimeError(f"設定 {prop}={value} 失敗")
+
+    set_value("filter_clear", "0")
+    for mode, start, end in plan:
+        set_value("filter_mode", str(mode))
+        set_value("filter_start", hex(start))
+        set_value("filter_end", hex(end))
+    set_value("filter_ack", "0")
+    logger.info(f"CH{chn_index} 硬體濾波: {len(plan)} 組範圍，放行 {plan_coverage(plan) if plan else '全部'} 個 ID")
@@ -0,0 +1,114 @@
+import threading
+
+import numpy as np
+
+from frame_store import MAX_PAYLOAD
+
+
+# --- 依 (通道, ID, 方向) 聚合的固定位置統計 ---
+# 作為 FrameStore 的 sink 在擷取路徑上以批次向量化更新：每批依鍵排序後以 reduceat 求各組的
+# 筆數、週期 (相鄰兩筆時間差) 總和/最小/最大、最後一筆內容與內容最後變化時間。
+# 週期優先以設備時間戳 hw_ts 計算 (單調且不受主機時鐘校正影響)，TX 等沒有設備時間戳的報文改用主機時間；
+# 渲染只需讀取 O(ID 數) 的列，與累積的報文數無關。
+class IdStats:
+    def __init__(self, capacity=1024):
+        self._index = {}  # 鍵 -> 列號
+        self._lock = threading.Lock()
+        self._alloc(capacity)
+
+    def _alloc(self, capacity):
+        self.capacity = capacity
+        self.key = np.zeros(capacity, dtype=np.uint64)
+        self.count = np.zeros(capacity, dtype=np.int64)
+        self.first_ts = np.zeros(capacity, dtype=np.float64)
+        self.last_ts = np.zeros(capacity, dtype=np.float64)
+        self.last_cyc = np.zeros(capacity, dtype=np.float64)    # 計算週期用的時間 (秒)
+        self.changed_ts = np.zeros(capacity, dtype=np.float64)  # 內容 (dlc + 數據) 最後一次改變的時間
+        self.dt_sum = np.zeros(capacity, dtype=np.float64)
+        self.dt_n = np.zeros(capacity, dtype=np.int64)
+        self.dt_min = np.full(capacity, np.inf)
+        self.dt_max = np.zeros(capacity, dtype=np.float64)
+        self.dlc = np.zeros(capacity, dtype=np.uint8)
+        self.flags = np.zeros(capacity, dtype=np.uint8)
+        self.status = np.zeros(capacity, dtype=np.int16)
+        self.data = np.zeros((capacity, MAX_PAYLOAD), dtype=np.uint8)
+
+    def _grow(self):
+        old = {name: getattr(self, name) for name in ("key", "count", "first_ts", "last_ts", "last_cyc", "changed_ts", "dt_sum", "dt_n", "dt_min", "dt_max", "dlc", "flags", "status", "data")}
+        self._alloc(self.capacity * 2)
+        for name, arr in old.items(): getattr(self, name)[:len(arr)] = arr
+
+    def __len__(self):
+        return len(self._index)
+
+    def clear(self):
+        with self._lock:
+            self._index = {}
+            self._alloc(self.capacity)
+
+    @staticmethod
+    def make_key(chn, can_id, direction):
+        return (np.asarray(chn, dtype=np.uint64) << np.uint64(31)) | (np.asarray(direction, dtype=np.uint64) << np.uint64(29)) | np.asarray(can_id, dtype=np.uint64)
+
+    def __call__(self, cols):
+        # FrameStore sink：cols 中的純量欄位已展開為等長陣列
+        n = len(cols["can_id"])
+        if n == 0: return
+        keys = self.make_key(cols["chn"], cols["can_id"], cols["direction"])
+        order = np.argsort(keys, kind="stable")
+        k, t = keys[order], np.asarray(cols["ts"], dtype=np.float64)[order]
+        hw = np.asarray(cols["hw_ts"])[order]
+        cyc = np.where(hw > 0, hw * 1e-6, t)
+        dlc = np.asarray(cols["dlc"])[order]
+        src = np.asarray(cols["data"])[order]
+        data = np.zeros((n, MAX_PAYLOAD), dtype=np.uint8); data[:, :src.shape[1]] = src
+        uniq, start, counts = np.unique(k, return_index=True, return_counts=True)
+        last = start + counts - 1
+        with self._lock:
+            rows = np.empty(len(uniq), dtype=np.int64)
+            for i, key in enumerate(uniq.tolist()):
+                row = self._index.get(key)
+                if row is None:
+                    row = len(self._index)
+                    if row >= self.capacity: self._grow()
+                    self._index[key] = row
+                    self.key[row] = key
+                rows[i] = row
+            seen = self.count[rows] > 0
+            # 每筆的前一筆：組內為前一列，組首為上一批的最後一筆 (新鍵則無)
+            prev_t = np.empty(n); prev_t[1:] = cyc[:-1]
+            prev_data = np.empty_like(data); prev_data[1:] = data[:-1]
+            prev_dlc = np.empty_like(dlc); prev_dlc[1:] = dlc[:-1]
+            prev_t[start] = np.where(seen, self.last_cyc[rows], np.nan)
+            prev_data[start], prev_dlc[start] = self.data[rows], self.dlc[rows]
+            dt = cyc - prev_t
+            has_prev = ~np.isnan(dt)
+            self.dt_sum[rows] += np.add.reduceat(np.where(has_prev, dt, 0.0), start)
+            self.dt_n[rows] += np.add.reduceat(has_prev.astype(np.int64), start)
+            self.dt_min[rows] = np.fmin(self.dt_min[rows], np.fmin.reduceat(np.where(has_prev, dt, np.inf), start))
+            self.dt_max[rows] = np.fmax(self.dt_max[rows], np.fmax.reduceat(np.where(has_prev, dt, 0.0), start))
+            changed = (dlc != prev_dlc) | (data != prev_data).any(axis=1)
+            changed[start[~seen]] = True
+            change_t = np.fmax.reduceat(np.where(changed, t, np.nan), start)
+            self.changed_ts[rows] = np.where(np.isnan(change_t), self.changed_ts[rows], change_t)
+            self.first_ts[rows[~seen]] = t[start[~seen]]
+            self.count[rows] += counts
+            self.last_ts[rows], self.last_cyc[rows] = t[last], cyc[last]
+            self.dlc[rows], self.data[rows] = dlc[last], data[last]
+            self.flags[rows] = np.asarray(cols["flags"])[order][last]
+            self.status[rows] = np.asarray(cols["status"])[order][last]
+
+    def snapshot(self):
+        """回傳依 (通道, ID, 方向) 排序的欄位快照。"""
+        with self._lock:
+            n = len(self._index)
+            key = self.key[:n]
+            order = np.lexsort((key >> np.uint64(29) & np.uint64(3), key & np.uint64(0x1FFFFFFF), key >> np.uint64(31)))
+            dt_n = self.dt_n[:n][order]
+            with np.errstate(invalid="ignore", divide="ignore"):
+                mean = np.where(dt_n > 0, self.dt_sum[:n][order] / dt_n, np.nan)
+            return {"chn": (key[order] >> np.uint64(31)).astype(np.uint8), "can_id": (key[order] & np.uint64(0x1FFFFFFF)).astype(np.uint32),
+                    "direction": (key[order] >> np.uint64(29) & np.uint64(3)).astype(np.uint8),
+                    "count": self.count[:n][order], "first_ts": self.first_ts[:n][order], "last_ts": self.last_ts[:n][order], "changed_ts": self.changed_ts[:n][order],
+                    "dt_mean": mean, "dt_min": np.where(dt_n > 0, self.dt_min[:n][order], np.nan), "dt_max": np.where(dt_n > 0, self.dt_max[:n][order], np.nan),
+                    "dlc": self.dlc[:n][order], "flags": self.flags[:n][order], "status": self.status[:n][order], "data": self.data[:n][order]}
@@ -0,0 +1,138 @@
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from frame_store import DIR_LABELS, hex_rows, status_label
+from hw_clock import to_wall, host_now
+from msg_codec import format_signals
+
+
+def build_log_table(cols, chn_labels=None):
+    # 由欄位快照組出顯示用表格，十六進位字串只對這些列產生
+    table = {
+        "方向": [DIR_LABELS[d] for d in cols["direction"]],
+        "時間": [datetime.fromtimestamp(t).strftime("%H:%M:%S.%f") for t in to_wall(cols["ts"]).tolist()],
+        "ID": [hex(i).upper() for i in cols["can_id"].tolist()],
+        "數據": hex_rows(cols["data"], cols["dlc"]),
+        "訊號": [format_signals(v) for v in cols["decoded"]],
+        "狀態": [status_label(c) for c in cols["status"]],
+    }
+    if chn_labels: table = {"通道": [chn_labels.get(c, f"CH{c}") for c in cols["chn"].tolist()], **table}
+    return pd.DataFrame(table)
+
+
+def build_id_table(snap, names=None, chn_labels=None, now=None, stale_factor=3.0, slack=0.1):
+    # 固定位置檢視：每個 (通道, ID, 方向) 一列；超過平均週期 stale_factor 倍 (另加 slack 秒擷取延遲) 未收到時標記逾時
+    def clock(ts): return [datetime.fromtimestamp(t).strftime("%H:%M:%S.%f")[:-3] for t in to_wall(ts).tolist()]
+    names = names or {}
+    age = (host_now() if now is None else now) - snap["last_ts"]
+    with np.errstate(invalid="ignore"): stale = age > snap["dt_mean"] * stale_factor + slack
+    table = {
+        "方向": [DIR_LABELS[d] for d in snap["direction"]],
+        "ID": [hex(i).upper() for i in snap["can_id"].tolist()],
+        "報文": [names.get(i, "") for i in snap["can_id"].tolist()],
+        "數據": hex_rows(snap["data"], snap["dlc"]),
+        "次數": snap["count"],
+        "週期 ms": np.round(snap["dt_mean"] * 1e3, 3),
+        "最小 ms": np.round(snap["dt_min"] * 1e3, 3),
+        "最大 ms": np.round(snap["dt_max"] * 1e3, 3),
+        "最後變化": clock(snap["changed_ts"]),
+        "最後接收": clock(snap["last_ts"]),
+        "狀態": ["⚠️ 逾時" if s else status_label(c) for s, c in zip(stale.tolist(), snap["status"])],
+    }
+    if chn_labels: table = {"通道": [chn_labels.get(c, f"CH{c}") for c in snap["chn"].tolist()], **table}
+    return pd.DataFrame(table)
+
+
+# --- 虛擬化監控視窗 ---
+# 只把可見的 page_rows 筆轉成表格；跟隨最新時每次只格式化上次之後的新報文 (以及當時尚未解碼完成的列)，
+# 再與快取表格合併並截斷到視窗大小，渲染成本與 FrameStore 保留多少歷史無關。
+# 快取表格依 seq 新到舊排列；多通道時輸出前再依時間戳排序 (各 RX 執行緒以批次寫入，seq 順序不等於時間順序)。
+class MonitorView:
+    def __init__(self, page_rows=200):
+        self.page_rows = page_rows
+        self.paused = False
+        self.offset = 0              # 由最新往前捲動的筆數，0 表示跟隨最新
+        self._table, self._ts = None, np.zeros(0)
+        self._start = self._end = 0  # 快取表格對應的 seq 範圍 [start, end)
+        self._stale = 0              # 此 seq 之後的列在上次渲染時尚未解碼，需重新格式化
+        self._key = None
+        # 本 session 的篩選：以自己的游標增量掃描新報文，只保留符合者的 seq
+        self.ids = self.chns = None
+        self._match, self._cursor, self._fend = np.zeros(0, dtype=np.int64), 0, 0
+
+    @property
+    def following(self):
+        return not self.paused and self.offset == 0
+
+    def follow(self):
+        self.paused, self.offset = False, 0
+
+    @property
+    def filtered(self):
+        return self.ids is not None or self.chns is not None
+
+    def set_filter(self, ids=None, chns=None):
+        """ids/chns 為 None 表示不篩選；條件改變時重新掃描仍保留的報文。"""
+        ids = None if ids is None else np.asarray(sorted(ids), dtype=np.uint32)
+        chns = None if chns is None else np.asarray(sorted(chns), dtype=np.uint8)
+        same = lambda a, b: (a is None and b is None) or (a is not None and b is not None and np.array_equal(a, b))
+        if same(ids, self.ids) and same(chns, self.chns): return
+        self.ids, self.chns = ids, chns
+        self._match, self._cursor, self._table = np.zeros(0, dtype=np.int64), 0, None
+        self.follow()
+
+    def _scan(self, store, first, seq):
+        if seq < self._cursor: self._match, self._cursor = self._match[:0], 0  # 換了 FrameStore
+        cols, start, end = store.read(max(self._cursor, first))
+        self._cursor = end
+        mask = np.ones(end - start, dtype=bool)
+        if self.ids is not None: mask &= np.isin(cols["can_id"], self.ids)
+        if self.chns is not None: mask &= np.isin(cols["chn"], self.chns)
+        self._match = self._match[np.searchsorted(self._match, first):]
+        if mask.any(): self._match = np.concatenate((self._match, start + np.flatnonzero(mask)))
+
+    def _render_filtered(self, store, chn_labels, decoded_upto):
+        # 篩選後的列在 seq 上不連續，以符合者的索引分頁；每次只格式化可見的 page_rows 筆
+        first, seq = store.bounds()
+        self._scan(store, first, seq)
+        total = len(self._match)
+        end = int(np.searchsorted(self._match, self._fend)) if self.paused and self._table is not None else total - self.offset
+        end = min(max(end, 0), total)
+        start = max(0, end - self.page_rows)
+        page = self._match[start:end]
+        key = ("filtered", page[0] if len(page) else None, page[-1] if len(page) else None, len(page), tuple(chn_labels.items()) if chn_labels else None)
+        if self._table is None or key != self._key or self._stale < (page[-1] + 1 if len(page) else 0):
+            cols = store.take(page[::-1])
+            self._table, self._ts, self._key = build_log_table(cols, chn_labels), cols["ts"], key
+            self._stale = seq if decoded_upto is None else decoded_upto
+        self._fend = int(self._match[end - 1]) + 1 if end else 0
+        table = self._table
+        if chn_labels and len(table) > 1: table = table.iloc[np.argsort(-self._ts, kind="stable")]
+        return table, start, end, total
+
+    def render(self, store, chn_labels=None, decoded_upto=None):
+        """回傳 (表格, 視窗起點, 視窗終點, 保留的總筆數)；篩選時以符合的筆數計。"""
+        if self.filtered: return self._render_filtered(store, chn_labels, decoded_upto)
+        first, seq = store.bounds()
+        end = self._end if self.paused and self._table is not None else seq - self.offset
+        end = min(max(end, first), seq)
+        start = max(first, end - self.page_rows)
+        key = (id(store), tuple(chn_labels.items()) if chn_labels else None)
+        rebuild = self._table is None or key != self._key or start < self._start or end < self._end or start >= self._end
+        # 跳離快取範圍 (捲動、清空、切換通道顯示) 時整個視窗重建
+        fresh = start if rebuild else min(self._end, max(self._stale, start))
+        if rebuild or fresh < end or (start, end) != (self._start, self._end):
+            cols, fresh = store.window(fresh, end)
+            table, ts = build_log_table(cols, chn_labels), cols["ts"]
+            keep = fresh - start  # 快取中仍在視窗內且不需重新格式化的列 (seq 較舊，接在新資料之後)
+            if keep > 0:
+                lo = self._end - fresh
+                table = pd.concat((table, self._table.iloc[lo:lo + keep]), ignore_index=True)
+                ts = np.concatenate((ts, self._ts[lo:lo + keep]))
+            self._table, self._ts, self._start, self._end, self._key = table, ts, start, end, key
+            self._stale = end if decoded_upto is None else max(start, min(decoded_upto, end))
+        table = self._table
+        if chn_labels and len(table) > 1: table = table.iloc[np.argsort(-self._ts, kind="stable")]
+        return table, self._start, self._end, seq - first
@@ -1,64 +1,47 @@
 import os
-import sys
 import time
-import platform
 import logging
 import binascii
 import traceback
 import atexit
+import uuid
 from datetime import datetime
 from ctypes import *
-from contextlib import contextmanager
 import streamlit as st
-import cantools
+import numpy as np
 import pandas as pd
+import altair as alt
+from hw_clock import to_wall
+from msg_codec import EncoderTable, default_signal_values, signal_meta
+from dbc_cache import DbcCache
+from log_view import MonitorView, build_id_table
+from capture import CAPTURE_EXT, export_capture
+from frame_store import STATUS_OK
+from device_manager import DeviceManager
 
 # --- 1. 全局路徑與環境初始化 ---
-current_dir = os.path.dirname(os.path.abspath(__file__))
-zlg_folder_path = os.path.normpath(os.path.join(current_dir, "zlg"))
-if os.path.exists(zlg_folder_path):
-    if zlg_folder_path not in sys.path:
-        sys.path.insert(0, zlg_folder_path)
-    if platform.system() == "Windows":
-        try:
-            os.add_dll_directory(zlg_folder_path)
-        except:
-            pass
-
-# --- 2. 核心環境保護器 ---
-@contextmanager
-def zlg_env():
-    _old_cwd = os.getcwd()
-    try:
-        os.chdir(zlg_folder_path)
-        yield
-    finally:
-        os.chdir(_old_cwd)
+# zlg 路徑、zlg_env 與 SDK 實例的建立放在 zlg_sdk (無頭 CLI 共用)
+from zlg_sdk import current_dir, zlg_env, USE_SIM, create_zcan
 
-# --- 3. 頂層導入 ZLG SDK ---
+# --- 2. 頂層導入 ZLG SDK ---
 ZLG_SDK_AVAILABLE = False
 try:
     with zlg_env():
         import zlgcan
-        ZCAN = zlgcan.ZCAN
-        ZCAN_Transmit_Data = zlgcan.ZCAN_Transmit_Data
-        ZCAN_TransmitFD_Data = getattr(zlgcan, 'ZCAN_TransmitFD_Data', None)
-        ZCAN_Receive_Data = getattr(zlgcan, 'ZCAN_Receive_Data', None)
-        ZCAN_ReceiveFD_Data = getattr(zlgcan, 'ZCAN_ReceiveFD_Data', None)
-        ZCAN_CHANNEL_INIT_CONFIG = zlgcan.ZCAN_CHANNEL_INIT_CONFIG
-        INVALID_DEVICE_HANDLE = getattr(zlgcan, 'INVALID_DEVICE_HANDLE', 0)
         CANFD_START_FUNC = getattr(zlgcan, 'canfd_start', None)
-        ZCAN_TYPE_CAN, ZCAN_TYPE_CANFD = 0, 1
-        ZCAN_USBCANFD_200U, ZCAN_USBCANFD_100U = 41, 42
+        from channels import DEVICE_MODELS, channel_count
+        from auto_send import AutoSendError
+        from hw_filter import MAX_FILTER_SLOTS, plan_from_messages, plan_coverage
         ZLG_SDK_AVAILABLE = True
 except Exception as e:
     print(f"[警告] SDK 導入失敗: {e}")
 
-# --- 4. 日誌機制配置 (重要：保留 Logger) ---
+# --- 3. 日誌機制配置 (重要：保留 Logger) ---
 log_dir = os.path.join(current_dir, "log")
 if not os.path.exists(log_dir): os.makedirs(log_dir)
 log_filename = datetime.now().strftime("%Y-%m-%d") + ".log"
 log_filepath = os.path.join(log_dir, log_filename)
+capture_dir = os.path.join(current_dir, "capture")
 logger = logging.getLogger("ZLG_CAN_TOOL")
 if not logger.handlers:
     logger.setLevel(logging.INFO)
@@ -66,12 +49,12 @@ if not logger.handlers:
     fh.setFormatter(logging.Formatter('%(asctime)s [%(levelname)s] %(message)s', datefmt='%H:%M:%S'))
     logger.addHandler(fh)
 
-def cleanup_resources():
+def cleanup_resources(manager):
     logger.info("系統正在釋放 ZLG 硬體資源...")
     print("\n[系統] 正在釋放 ZLG 硬體資源...")
-atexit.register(cleanup_resources)
+    manager.shutdown()
 
-# --- 5. 頁面配置與樣式 ---
+# --- 4. 頁面配置與樣式 ---
 st.set_page_config(page_title="ZLG CAN 測試工具", layout="wide", initial_sidebar_state="expanded")
 st.markdown("""
 <style>
@@ -93,143 +76,261 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-# --- 6. 輔助功能 ---
+# --- 5. 輔助功能 ---
 @st.cache_resource
 def get_zcan_instance():
     if not ZLG_SDK_AVAILABLE: return None
-    logger.info("建立 ZCAN SDK 實例...")
-    with zlg_env(): return ZCAN()
+    return create_zcan()
+
+@st.cache_resource
+def get_device_manager():
+    # 行程內唯一：所有瀏覽器分頁共用設備 handle、RX/TX 執行緒與 FrameStore，新增檢視者不會重複輪詢 SDK
+    manager = DeviceManager(get_zcan_instance(), zlg_env, CANFD_START_FUNC if ZLG_SDK_AVAILABLE else None)
+    atexit.register(cleanup_resources, manager)  # 行程結束時清除硬體定時發送並關閉設備
+    return manager
 
-def safe_float(val, default=0.0):
-    if val is None: return float(default)
-    try: return float(val.value) if hasattr(val, 'value') else float(val)
-    except: return float(default)
+@st.cache_resource
+def get_dbc_cache():
+    # 行程內所有 session 共用；磁碟快取放在程式目錄下，重新啟動後仍有效
+    return DbcCache(os.path.join(current_dir, "dbc_cache"))
 
-# --- 7. 初始化 Session State ---
+# --- 6. 初始化 Session State ---
+# 設備、報文緩衝與錄製/回放由 get_device_manager() 在行程內共用；session 只保留自己的畫面、發送清單與週期任務
+mgr = get_device_manager()
 default_states = {
-    'connected': False, 'log_data': [], 'db': None, 'last_dbc_hash': None,
+    'db': None, 'encoders': None, 'last_dbc_hash': None, 'dbc_display_map': None,
     'added_messages': [], 'focused_msg_idx': None, 'sig_values': {}, 'sig_meta': {},
-    'is_monitoring': False, 'is_cyclic': False, 'cycle_ms': 100,
-    'd_handle': None, 'c_handle': None, 'can_type': 1, 'hw_info_str': ""
+    'is_monitoring': False, 'is_cyclic': False, 'cycle_ms': 100, 'can_type': 1, 'merged_rx': False,
+    'tx_link': None, 'cyclic_engine': None,
+    'use_hw_cyclic': False, 'cyclic_all': False, 'hw_stagger_ms': 0,
+    'capture_seg_mb': 256, 'capture_seg_min': 60
 }
 for k, v in default_states.items():
     if k not in st.session_state: st.session_state[k] = v
+# 週期任務鍵加上 session 標記，多個分頁共用同一通道的排程器時互不清除對方的任務
+if 'session_tag' not in st.session_state: st.session_state.session_tag = uuid.uuid4().hex[:6]
+# 監控表格只渲染可見視窗，保留的歷史筆數不再影響刷新成本
+if 'monitor_view' not in st.session_state: st.session_state.monitor_view = MonitorView()
 
-def toggle_connection(hw_type_name):
-    if not st.session_state.connected:
-        if ZLG_SDK_AVAILABLE:
-            temp_handle = INVALID_DEVICE_HANDLE
-            try:
-                zcanlib = get_zcan_instance()
-                dev_type = ZCAN_USBCANFD_200U if "200U" in hw_type_name else ZCAN_USBCANFD_100U
-                with zlg_env():
-                    logger.info(f"啟動硬體連線 (Type: {dev_type})...")
-                    temp_handle = zcanlib.OpenDevice(dev_type, 0, 0)
-                    if temp_handle == INVALID_DEVICE_HANDLE:
-                        logger.error("OpenDevice 失敗"); st.error("❌ 設備可能被佔用"); return
-                    if st.session_state.can_type == 1 and CANFD_START_FUNC:
-                        chn_handle = CANFD_START_FUNC(zcanlib, temp_handle, 0)
-                        if chn_handle == 0: raise Exception("canfd_start 失敗")
-                        st.session_state.c_handle = chn_handle
-                    else:
-                        config = ZCAN_CHANNEL_INIT_CONFIG()
-                        config.can_type = 0
-                        chn_handle = zcanlib.InitCAN(temp_handle, 0, config)
-                        if chn_handle == 0 or zcanlib.StartCAN(chn_handle) != 1: raise Exception("啟動失敗")
-                        st.session_state.c_handle = chn_handle
-                    try:
-                        st.session_state.hw_info_str = str(zcanlib.GetDeviceInf(temp_handle))
-                    except: st.session_state.hw_info_str = "資訊讀取失敗"
-                    st.session_state.d_handle, st.session_state.connected = temp_handle, True
-                    st.toast("✅ 連線成功")
-            except Exception as e:
-                logger.error(f"連線異常: {e}"); st.error(f"連線失敗: {e}")
-                if temp_handle != INVALID_DEVICE_HANDLE:
-                    with zlg_env(): zcanlib.CloseDevice(temp_handle)
-    else:
-        if st.session_state.d_handle:
-            with zlg_env(): get_zcan_instance().CloseDevice(st.session_state.d_handle)
-        st.session_state.connected, st.session_state.d_handle, st.session_state.c_handle = False, None, None
-        st.session_state.is_monitoring = st.session_state.is_cyclic = False; st.toast("🔌 已中斷連線")
+def cyclic_key(m_name):
+    return f"{m_name}@{st.session_state.session_tag}"
+
+def clear_own_cyclic(engine):
+    # 硬體槽停用失敗時槽仍由 AutoSendTable 保留追蹤；記錄並提示，不中斷本次重跑
+    tag = "@" + st.session_state.session_tag
+    for key in engine.keys():
+        if not key.endswith(tag): continue
+        try: engine.remove(key)
+        except AutoSendError as e:
+            logger.error(f"停止週期發送 {key} 失敗: {e}"); st.error(f"停止週期發送失敗: {e}")
+
+def tx_link():
+    return mgr.links.get(st.session_state.tx_link)
+
+def select_tx_link(label):
+    # 切換發送通道時先清掉本 session 在舊通道上的週期任務
+    prev = st.session_state.cyclic_engine
+    if prev is not None: clear_own_cyclic(prev)
+    st.session_state.tx_link = label if label in mgr.links else None
+    st.session_state.cyclic_engine = None
+
+# 其他分頁斷線或加開通道後，本 session 的發送通道可能已不存在
+if st.session_state.tx_link not in mgr.links:
+    st.session_state.is_cyclic = False
+    st.session_state.cyclic_engine = None
+    st.session_state.tx_link = next(iter(mgr.links), None)
+
+def hw_info_str():
+    return "\n".join(f"[{k}]\n{v}" for k, v in mgr.info().items())
+
+def open_channels(model, dev_index, chn_indices, can_type, merged=False):
+    if not ZLG_SDK_AVAILABLE: return
+    for label, err in mgr.open_channels(model, dev_index, chn_indices, can_type, merged).items(): st.error(f"{label} 連線失敗: {err}")
+    if mgr.connected:
+        if st.session_state.tx_link not in mgr.links: select_tx_link(next(iter(mgr.links)))
+        st.toast("✅ 連線成功")
+
+def apply_hw_filter(plan):
+    # 套用到所有已開啟通道，之後新開的通道也會沿用
+    for label, err in mgr.set_filters(plan).items(): st.error(f"{label} 濾波設定失敗: {err}")
+
+def close_all_channels():
+    # 共用設備：斷線會影響所有分頁
+    select_tx_link(None)
+    mgr.close_all()
+    st.session_state.is_monitoring = st.session_state.is_cyclic = False; st.toast("🔌 已中斷連線")
 
 def send_can_message(msg_id, data):
-    success, status_code = True, "1"
-    if st.session_state.connected and st.session_state.c_handle is not None and ZLG_SDK_AVAILABLE:
-        try:
-            zcanlib = get_zcan_instance()
-            with zlg_env():
-                if st.session_state.can_type == 1:
-                    t_data = ZCAN_TransmitFD_Data()
-                    t_data.frame.can_id, t_data.frame.len = msg_id, len(data)
-                    t_data.frame.eff, t_data.frame.fdf, t_data.frame.brs = (1 if msg_id > 0x7FF else 0), 1, 1
-                    for i, b in enumerate(data): t_data.frame.data[i] = b
-                    ret = zcanlib.TransmitFD(st.session_state.c_handle, t_data, 1)
-                else:
-                    t_data = ZCAN_Transmit_Data()
-                    t_data.frame.can_id, t_data.frame.can_dlc = msg_id, len(data)
-                    t_data.frame.eff = 1 if msg_id > 0x7FF else 0
-                    for i, b in enumerate(data): t_data.frame.data[i] = b
-                    ret = zcanlib.Transmit(st.session_state.c_handle, t_data, 1)
-                if ret != 1: success, status_code = False, f"Err:{ret}"
-        except Exception as e:
-            logger.error(f"發送異常 ID {hex(msg_id)}: {e}")
-            success, status_code = False, "EXCP"
-    else: success, status_code = False, "OFFLINE"
-    timestamp = datetime.now().strftime("%H:%M:%S.%f")[:-3]
-    hex_data = " ".join(f"{b:02X}" for b in data)
-    st.session_state.log_data.insert(0, {"方向": "TX", "時間": timestamp, "ID": hex(msg_id).upper(), "數據": hex_data, "狀態": "OK" if success else status_code})
-    if len(st.session_state.log_data) > 9999: st.session_state.log_data = st.session_state.log_data[:9999]
-    return success
-
-def poll_reception():
-    if not st.session_state.connected or st.session_state.c_handle is None: return
-    zcanlib = get_zcan_instance()
-    with zlg_env():
-        rcv_type = ZCAN_TYPE_CANFD if st.session_state.can_type == 1 else ZCAN_TYPE_CAN
-        rcv_num = zcanlib.GetReceiveNum(st.session_state.c_handle, rcv_type)
-        if rcv_num > 0:
-            if st.session_state.can_type == 1:
-                msgs, actual = zcanlib.ReceiveFD(st.session_state.c_handle, rcv_num)
-                for i in range(actual):
-                    hex_data = " ".join(f"{msgs[i].frame.data[j]:02X}" for j in range(msgs[i].frame.len))
-                    st.session_state.log_data.insert(0, {"方向": "RX", "時間": datetime.now().strftime("%H:%M:%S.%f")[:-3], "ID": hex(msgs[i].frame.can_id).upper(), "數據": hex_data, "狀態": "OK"})
-            else:
-                msgs, actual = zcanlib.Receive(st.session_state.c_handle, rcv_num)
-                for i in range(actual):
-                    hex_data = " ".join(f"{msgs[i].frame.data[j]:02X}" for j in range(msgs[i].frame.data_dlc))
-                    st.session_state.log_data.insert(0, {"方向": "RX", "時間": datetime.now().strftime("%H:%M:%S.%f")[:-3], "ID": hex(msgs[i].frame.can_id).upper(), "數據": hex_data, "狀態": "OK"})
-            if len(st.session_state.log_data) > 9999: st.session_state.log_data = st.session_state.log_data[:9999]
+    return mgr.send(st.session_state.tx_link, msg_id, data) == STATUS_OK
+
+def send_can_batch(frames):
+    # 多筆報文一次 DLL 呼叫送出 (如報文清單的 restbus 啟動)；回傳每批被接受的筆數
+    return mgr.send_batch(st.session_state.tx_link, frames)
+
+def encode_message(m_name):
+    # 由 DBC 編碼器表取得快取或增量更新後的 payload
+    if st.session_state.encoders is None or st.session_state.encoders.db is not st.session_state.db:
+        st.session_state.encoders = EncoderTable(st.session_state.db)
+    return st.session_state.encoders.encode(m_name, st.session_state.sig_values.get(m_name))
+
+def sync_cyclic_engine(m_name):
+    # 將 UI 狀態同步到發送排程執行緒或硬體定時發送表；實際週期發送不依賴 Streamlit 重跑
+    # 通道的排程器由所有 session 共用，只增刪本 session 標記的任務
+    link = tx_link()
+    if link is None or link.scheduler is None: return
+    sched, auto = link.scheduler, link.auto_send
+    engine = auto if (st.session_state.use_hw_cyclic and auto is not None) else sched
+    prev = st.session_state.cyclic_engine
+    if prev is not None and prev is not engine: clear_own_cyclic(prev)
+    st.session_state.cyclic_engine = engine
+    targets = list(st.session_state.added_messages) if st.session_state.cyclic_all else ([m_name] if m_name else [])
+    if not (st.session_state.is_cyclic and targets):
+        clear_own_cyclic(engine); return
+    try:
+        keys = {cyclic_key(name) for name in targets}
+        tag = "@" + st.session_state.session_tag
+        for key in engine.keys():
+            if key.endswith(tag) and key not in keys: engine.remove(key)
+        for idx, name in enumerate(targets):
+            frame_id, payload = encode_message(name)
+            if engine is auto: engine.add(cyclic_key(name), frame_id, payload, st.session_state.cycle_ms / 1000.0, delay_ms=idx * st.session_state.hw_stagger_ms)
+            else: engine.add(cyclic_key(name), frame_id, payload, st.session_state.cycle_ms / 1000.0)
+    except Exception as e:
+        logger.error(f"週期發送設定失敗: {e}"); st.error(f"週期發送失敗: {e}")
+        st.session_state.is_cyclic = False; clear_own_cyclic(engine)
 
-# --- 8. UI 渲染 ---
+# --- 7. UI 渲染 ---
 with st.sidebar:
     st.subheader("🛠️ 硬體設定")
-    hw_choice = st.selectbox("設備型號", ["USBCANFD_200U", "USBCANFD_100U"])
+    models = list(DEVICE_MODELS) if ZLG_SDK_AVAILABLE else ["USBCANFD_200U", "USBCANFD_100U"]
+    hw_cols = st.columns([3, 1])
+    hw_choice = hw_cols[0].selectbox("設備型號", models)
+    dev_index = hw_cols[1].number_input("設備索引", 0, 15, 0)
+    chn_choice = st.multiselect("通道", list(range(channel_count(hw_choice) if ZLG_SDK_AVAILABLE else 1)), default=[0], format_func=lambda c: f"CH{c}")
     st.session_state.can_type = st.radio("模式", [0, 1], format_func=lambda x: "CAN" if x == 0 else "CANFD", index=1, horizontal=True)
-    conn_btn_label = "🔌 斷開連線" if st.session_state.connected else "⚡ 啟動硬體連線"
-    if st.button(conn_btn_label, use_container_width=True, type="primary" if st.session_state.connected else "secondary"):
-        toggle_connection(hw_choice); st.rerun()
+    st.session_state.merged_rx = st.checkbox("設備合併擷取 (ReceiveData)", value=st.session_state.merged_rx,
+                                             help="同一設備的所有通道以一次 SDK 呼叫擷取，TX 以發送回顯的硬體時間戳記錄；於設備第一次開啟通道時生效")
+    if mgr.connected:
+        conn_cols = st.columns(2)
+        if conn_cols[0].button("➕ 加開所選通道", use_container_width=True, disabled=not chn_choice):
+            open_channels(hw_choice, dev_index, chn_choice, st.session_state.can_type, st.session_state.merged_rx); st.rerun()
+        if conn_cols[1].button("🔌 斷開連線", use_container_width=True, type="primary"):
+            close_all_channels(); st.rerun()
+        labels = list(mgr.links)
+        tx_label = st.selectbox("發送通道", labels, index=labels.index(st.session_state.tx_link) if st.session_state.tx_link in labels else 0)
+        if tx_label != st.session_state.tx_link:
+            st.session_state.is_cyclic = False; select_tx_link(tx_label); st.rerun()
+    elif st.button("⚡ 啟動硬體連線", use_container_width=True, disabled=not chn_choice):
+        open_channels(hw_choice, dev_index, chn_choice, st.session_state.can_type, st.session_state.merged_rx); st.rerun()
     st.divider()
-    if st.session_state.connected:
+    if mgr.connected:
         with st.expander("🗂️ 設備資訊詳情"):
-            st.code(st.session_state.hw_info_str or "正在讀取...", language="text")
+            st.code(hw_info_str() or "正在讀取...", language="text")
     st.divider()
-    st.session_state.is_monitoring = st.toggle("📡 匯流排監控", value=st.session_state.is_monitoring, disabled=not st.session_state.connected)
+    st.session_state.is_monitoring = st.toggle("📡 匯流排監控", value=st.session_state.is_monitoring, disabled=not mgr.connected)
+    if USE_SIM and ZLG_SDK_AVAILABLE:
+        with st.expander("🧪 模擬匯流排"):
+            sim = get_zcan_instance()
+            sim_cols = st.columns(2)
+            sim_load = sim_cols[0].number_input("背景負載 (%)", 0, 95, 0, 5)
+            sim_err = sim_cols[1].number_input("錯誤幀比例 (%)", 0.0, 100.0, 0.0, 0.1)
+            if st.button("套用負載", use_container_width=True):
+                sim.set_bus_load(load=sim_load / 100.0, error_rate=sim_err / 100.0)
+            bus = sim.bus_stats()
+            st.caption(f"負載 {bus['load'] * 100:.0f}% ｜ {bus['fps']:.0f} fps")
+    if ZLG_SDK_AVAILABLE:
+        with st.expander("🩺 SDK 呼叫診斷"):
+            zcanlib = get_zcan_instance()
+            metrics_on = st.toggle("記錄呼叫延遲", value=zcanlib.enabled, help="停用時不包裝 SDK 呼叫，無額外開銷")
+            if metrics_on != zcanlib.enabled: zcanlib.set_enabled(metrics_on)
+            snap = zcanlib.snapshot()
+            if snap["calls"]:
+                st.dataframe(pd.DataFrame([{"函式": r["func"], "handle": r["handle"], "次數": r["count"], "錯誤": r["errors"], "報文/次": r["frames_per_call"],
+                                            "p50 µs": r["p50_us"], "p99 µs": r["p99_us"], "max µs": r["max_us"]} for r in snap["calls"]]),
+                             use_container_width=True, hide_index=True)
+                err_codes = {f"{r['func']}@{r['handle']}": r["error_codes"] for r in snap["calls"] if r["error_codes"]}
+                if err_codes: st.caption(f"錯誤碼: {err_codes}")
+            diag_cols = st.columns(2)
+            if diag_cols[0].button("重設統計", use_container_width=True): zcanlib.reset(); st.rerun()
+            diag_cols[1].download_button("下載 JSON", zcanlib.dump_json(), file_name=f"zcan_metrics_{datetime.now():%Y%m%d_%H%M%S}.json", mime="application/json", use_container_width=True)
+    with st.expander("🔁 週期發送設定"):
+        st.session_state.cyclic_all = st.checkbox("發送清單內全部報文", value=st.session_state.cyclic_all)
+        st.session_state.use_hw_cyclic = st.checkbox("硬體定時發送 (auto_send)", value=st.session_state.use_hw_cyclic, help="槽位不足時自動改用軟體排程")
+        st.session_state.hw_stagger_ms = st.number_input("硬體槽錯開延遲 (ms)", 0, 1000, st.session_state.hw_stagger_ms, 1, disabled=not st.session_state.use_hw_cyclic)
+    with st.expander("💾 錄製"):
+        recording = mgr.capture is not None
+        seg_cols = st.columns(2)
+        st.session_state.capture_seg_mb = seg_cols[0].number_input("分段大小 (MB)", 1, 4096, st.session_state.capture_seg_mb, disabled=recording)
+        st.session_state.capture_seg_min = seg_cols[1].number_input("分段時間 (分)", 1, 1440, st.session_state.capture_seg_min, disabled=recording)
+        if st.button("⏹️ 停止錄製" if recording else "⏺️ 開始錄製", use_container_width=True, type="primary" if recording else "secondary"):
+            if recording: mgr.stop_capture()
+            else: mgr.start_capture(capture_dir, max_bytes=st.session_state.capture_seg_mb << 20, max_seconds=st.session_state.capture_seg_min * 60)
+            st.rerun()
+        if mgr.capture_paths:
+            fmt = st.radio("匯出格式", [".asc", ".blf"], horizontal=True)
+            if st.button("📤 匯出上次錄製", use_container_width=True):
+                paths = mgr.capture_paths
+                dst = os.path.splitext(paths[0])[0] + fmt
+                try:
+                    n = export_capture(paths, dst)
+                    st.success(f"已匯出 {n} 筆至 {os.path.basename(dst)}"); logger.info(f"錄製匯出: {dst} ({n} 筆)")
+                except Exception as e:
+                    logger.error(f"錄製匯出失敗: {e}"); st.error(f"匯出失敗: {e}")
+    with st.expander("⏯️ 回放"):
+        files = sorted(f for f in os.listdir(capture_dir) if f.endswith(CAPTURE_EXT)) if os.path.isdir(capture_dir) else []
+        replaying = mgr.replay is not None and not mgr.replay.finished
+        rp_files = st.multiselect("錄製檔", files, default=files[-1:], disabled=replaying)
+        rp_cols = st.columns(2)
+        rp_speed = rp_cols[0].number_input("速度倍率", 0.0, 100.0, 1.0, 0.5, help="0 = 不控時，全速送出", disabled=replaying)
+        rp_loop = rp_cols[1].checkbox("循環", disabled=replaying)
+        rp_ids = st.text_input("ID 篩選 (十六進位，逗號分隔)", "", disabled=replaying)
+        if st.button("⏹️ 停止回放" if replaying else "▶️ 開始回放", use_container_width=True, disabled=not (mgr.connected and (replaying or rp_files))):
+            if replaying: mgr.stop_replay()
+            else:
+                try:
+                    ids = [int(x, 16) for x in rp_ids.replace(" ", "").split(",") if x] or None
+                    mgr.start_replay(st.session_state.tx_link, [os.path.join(capture_dir, f) for f in rp_files], speed=rp_speed, ids=ids, loop=rp_loop)
+                except ValueError as e: st.error(f"ID 格式錯誤: {e}")
+            st.rerun()
     uploaded_dbc = st.file_uploader("載入 DBC", type=["dbc"], label_visibility="collapsed")
     if uploaded_dbc:
         file_bytes = uploaded_dbc.getvalue()
         file_hash = binascii.crc32(file_bytes)
         if st.session_state.last_dbc_hash != file_hash:
             try:
-                st.session_state.db = cantools.database.load_string(file_bytes.decode('utf-8'))
-                st.session_state.last_dbc_hash, st.session_state.sig_meta = file_hash, {}
-                st.success("DBC 載入成功"); logger.info("DBC 檔案載入成功")
+                t0 = time.perf_counter()
+                compiled, source = get_dbc_cache().load(file_bytes, file_hash)
+                st.session_state.db, st.session_state.dbc_display_map = compiled.db, compiled.display_map
+                st.session_state.encoders = EncoderTable(compiled.db)
+                # 解碼欄位與訊號曲線為共用資料，以最後載入的 DBC 為準
+                mgr.set_dbc(compiled.db, by_id=compiled.by_id)
+                st.session_state.last_dbc_hash, st.session_state.sig_meta = file_hash, dict(compiled.sig_meta)
+                source_str = {"memory": "行程快取", "disk": "磁碟快取", "parsed": "重新解析"}[source]
+                st.success(f"DBC 載入成功 ({source_str}, {(time.perf_counter() - t0) * 1e3:.0f} ms)"); logger.info(f"DBC 檔案載入成功 ({source_str})")
             except Exception as e:
                 logger.error(f"DBC 解析失敗: {e}")
                 st.error("解析失敗")
+    if st.session_state.db is not None and ZLG_SDK_AVAILABLE:
+        with st.expander("🎯 硬體濾波"):
+            names = [m.name for m in st.session_state.db.messages]
+            flt_names = st.multiselect("放行報文", names, default=[n for n in st.session_state.added_messages if n in names], help="依所選報文 ID 計算範圍，寫入設備驗收濾波")
+            flt_slots = st.number_input("濾波槽數", 1, MAX_FILTER_SLOTS, MAX_FILTER_SLOTS)
+            plan = plan_from_messages([st.session_state.db.get_message_by_name(n) for n in flt_names], flt_slots)
+            if plan: st.caption(f"{len(plan)} 組範圍 ｜ 放行 {plan_coverage(plan)} 個 ID (所選 {len(flt_names)} 個報文)")
+            flt_cols = st.columns(2)
+            if flt_cols[0].button("套用濾波", use_container_width=True, disabled=not plan):
+                apply_hw_filter(plan); st.rerun()
+            if flt_cols[1].button("全部放行", use_container_width=True, disabled=not mgr.hw_filter):
+                apply_hw_filter([]); st.rerun()
+            if mgr.hw_filter:
+                active = ", ".join(f"{'EXT' if m else 'STD'} 0x{a:X}-0x{b:X}" for m, a, b in mgr.hw_filter[:8])
+                st.caption(f"生效中: {active}{' …' if len(mgr.hw_filter) > 8 else ''}")
+                sw_links = [label for label, link in mgr.links.items() if link.hw_filters != link.filters]
+                if sw_links: st.caption(f"硬體濾波槽數不足，改以軟體濾波: {', '.join(sw_links)}")
 
 # 主畫面標頭
-status_dot = "dot-active" if st.session_state.is_cyclic else ("dot-online" if st.session_state.connected else "dot-offline")
-status_text = ("CYCLIC SENDING" if st.session_state.is_cyclic else "ONLINE") if st.session_state.connected else "OFFLINE"
+status_dot = "dot-active" if st.session_state.is_cyclic else ("dot-online" if mgr.connected else "dot-offline")
+status_text = ("CYCLIC SENDING" if st.session_state.is_cyclic else "ONLINE") if mgr.connected else "OFFLINE"
 st.markdown(f'<div class="app-header"><div>🚗 ZLG CAN 測試工具 v1.9.5</div><div class="status-indicator"><span class="dot {status_dot}"></span>{status_text}</div></div>', unsafe_allow_html=True)
 
 if st.session_state.db is None:
@@ -246,22 +347,24 @@ else:
         if main_cols[1].button("🛑 停止發送", use_container_width=True, type="primary"):
             st.session_state.is_cyclic = False; st.rerun()
     else:
-        if main_cols[1].button(f"🚀 單次發送" if not m_obj else f"🚀 [0x{m_obj.frame_id:03X}]", use_container_width=True, type="primary", disabled=not st.session_state.connected or m_obj is None):
-            current_payload = st.session_state.sig_values.get(m_name, {})
-            try:
-                full_sigs = {s.name: safe_float(s.initial, safe_float(s.minimum, 0.0)) for s in m_obj.signals}
-                full_sigs.update(current_payload); send_can_message(m_obj.frame_id, m_obj.encode(full_sigs))
+        if main_cols[1].button(f"🚀 單次發送" if not m_obj else f"🚀 [0x{m_obj.frame_id:03X}]", use_container_width=True, type="primary", disabled=not mgr.connected or m_obj is None):
+            try: send_can_message(*encode_message(m_name))
             except Exception as e: st.error(f"發送失敗: {e}")
-    st.session_state.is_cyclic = main_cols[2].toggle("🔁 週期模式", value=st.session_state.is_cyclic, disabled=not st.session_state.connected or m_obj is None)
+    st.session_state.is_cyclic = main_cols[2].toggle("🔁 週期模式", value=st.session_state.is_cyclic, disabled=not mgr.connected or m_obj is None)
     st.session_state.cycle_ms = main_cols[3].number_input("ms", 10, 5000, st.session_state.cycle_ms, 10, label_visibility="collapsed")
 
     # --- 2. 報文管理 ---
     item_cols = st.columns([3, 1, 2])
-    all_msgs_map = {f"{m.name} [0x{m.frame_id:03X}] ({m.frame_id})": m.name for m in st.session_state.db.messages}
+    all_msgs_map = st.session_state.dbc_display_map or {f"{m.name} [0x{m.frame_id:03X}] ({m.frame_id})": m.name for m in st.session_state.db.messages}
     target_display = item_cols[0].selectbox("選取報文", list(all_msgs_map.keys()), label_visibility="collapsed")
     if item_cols[1].button("➕ 添加", use_container_width=True):
         if all_msgs_map[target_display] not in st.session_state.added_messages:
             st.session_state.added_messages.append(all_msgs_map[target_display]); st.rerun()
+    if item_cols[2].button("📦 清單批次發送", use_container_width=True, disabled=not mgr.connected or not st.session_state.added_messages):
+        try:
+            accepted = send_can_batch([encode_message(name) for name in st.session_state.added_messages])
+            st.toast(f"批次發送: {sum(accepted)}/{len(st.session_state.added_messages)} 筆被接受")
+        except Exception as e: st.error(f"批次發送失敗: {e}")
     with st.container(border=True):
         if not st.session_state.added_messages:
             st.info("清單為空，請從上方選取報文。")
@@ -275,17 +378,8 @@ else:
                 st.session_state.added_messages, st.session_state.focused_msg_idx = [], None; st.rerun()
     st.divider()
 
-    # --- 3. 週期發送引擎 ---
-    @st.fragment(run_every=st.session_state.cycle_ms/1000.0 if st.session_state.is_cyclic else None)
-    def render_cyclic_engine(m_name_local):
-        if st.session_state.is_cyclic and m_name_local:
-            m_obj_cyclic = st.session_state.db.get_message_by_name(m_name_local)
-            payload = st.session_state.sig_values.get(m_name_local, {})
-            try:
-                full_sigs = {s.name: safe_float(s.initial, safe_float(s.minimum, 0.0)) for s in m_obj_cyclic.signals}
-                full_sigs.update(payload)
-                send_can_message(m_obj_cyclic.frame_id, m_obj_cyclic.encode(full_sigs))
-            except: pass
+    # --- 3. 週期發送引擎 (由 CyclicScheduler 執行緒負責) ---
+    sync_cyclic_engine(m_name)
 
     # --- 4. 訊號控制局部片段 ---
     @st.fragment
@@ -293,15 +387,12 @@ else:
         focused_obj = st.session_state.db.get_message_by_name(focused_name)
         st.markdown(f'<p class="section-title">詳細訊號控制: {focused_name} [0x{focused_obj.frame_id:03X}]</p>', unsafe_allow_html=True)
         if focused_name not in st.session_state.sig_values:
-            st.session_state.sig_values[focused_name] = {s.name: safe_float(s.initial, safe_float(s.minimum, 0.0)) for s in focused_obj.signals}
+            st.session_state.sig_values[focused_name] = default_signal_values(focused_obj)
         if focused_name not in st.session_state.sig_meta:
-            st.session_state.sig_meta[focused_name] = {}
-            for s in focused_obj.signals:
-                is_int = (not s.is_float) and (s.scale == 1) and (float(s.offset).is_integer())
-                min_v, max_v = safe_float(s.minimum, 0), safe_float(s.maximum, 100)
-                st.session_state.sig_meta[focused_name][s.name] = {"is_int": is_int, "min": int(min_v) if is_int else float(min_v), "max": int(max_v) if is_int else float(max_v), "step": 1 if is_int else None}
+            st.session_state.sig_meta[focused_name] = signal_meta(focused_obj)
         def sync_val(key, m_name, s_name):
             if key in st.session_state: st.session_state.sig_values[m_name][s_name] = st.session_state[key]
+            sync_cyclic_engine(m_name)
         col_ratios = [0.5, 3, 1.5, 3.5, 0.5]
         h_cols = st.columns(col_ratios)
         h_cols[0].caption("No."); h_cols[1].caption("訊號名稱"); h_cols[2].caption("數值輸入"); h_cols[3].caption("列舉選擇"); h_cols[4].caption("註釋")
@@ -327,16 +418,103 @@ else:
 
     if st.session_state.focused_msg_idx is not None:
         render_signal_console(m_name)
-        render_cyclic_engine(m_name)
 
     # --- 5. 監控日誌 ---
     @st.fragment(run_every=0.3 if (st.session_state.is_monitoring or st.session_state.is_cyclic) else None)
     def render_monitor_log():
-        if st.session_state.is_monitoring: poll_reception()
         with st.expander("📊 匯流排監控日誌", expanded=True):
-            st.dataframe(pd.DataFrame(st.session_state.log_data), use_container_width=True, hide_index=True, height=250)
-            if st.button("🗑️ 清空日誌", use_container_width=True):
-                st.session_state.log_data = []; st.rerun()
+            link = tx_link()
+            if link is not None and link.scheduler is not None:
+                engine = st.session_state.cyclic_engine or link.scheduler
+                for key, ps in engine.stats().items():
+                    if ps.get("mode") == "HW": st.caption(f"週期 {key}: 硬體槽 #{ps['slot']} ｜ 週期 {ps['period_ms']:.0f} ms ｜ 延遲 {ps['delay_ms']} ms")
+                    elif "mean_ms" in ps: st.caption(f"週期 {key}: 平均 {ps['mean_ms']:.3f} ms ｜ 最小 {ps['min_ms']:.3f} ｜ 最大 {ps['max_ms']:.3f} ｜ p99 抖動 {ps['p99_jitter_ms']:.3f} ｜ 跳過 {ps['overruns']} ｜ 失敗 {ps['errors']}")
+            for label, link in mgr.links.items():
+                rx_stats, clock = link.rx_stats, link.clock
+                if rx_stats is None: continue
+                clock_str = f"時鐘漂移: {clock.drift_ppm:+.1f} ppm" if clock.synced else "時鐘: 未同步"
+                st.caption(f"{label} RX 接收: {rx_stats.received} ｜ 驅動溢出: {rx_stats.overruns} ｜ 滿批次: {rx_stats.full_batches} ｜ {clock_str}")
+            if mgr.links: st.caption(f"緩衝覆寫: {mgr.store.overwritten}")
+            if mgr.capture is not None:
+                cs = mgr.capture.stats()
+                st.caption(f"錄製: {cs['frames_written']} 筆 ｜ {cs['rate_fps']:.0f} fps ｜ {cs['rate_mbps']:.2f} MB/s ｜ 延遲 {cs['lag_s'] * 1e3:.0f} ms ｜ 佇列 {cs['queued_frames']} ｜ 丟棄 {cs['dropped']} ｜ 分段 {cs['segments']}")
+            if mgr.replay is not None:
+                rp = mgr.replay
+                rs = rp.stats.as_dict()
+                err_str = f" ｜ 時間誤差 平均 {rs['mean_err_ms']:+.3f} ms ｜ p99 {rs['p99_err_ms']:.3f} ｜ 最大 {rs['max_err_ms']:.3f}" if "mean_err_ms" in rs else ""
+                st.caption(f"回放{'中' if not rp.finished else '結束'}: {rp.position:.1f}/{rp.duration:.1f} s ｜ 已送 {rs['sent']} ｜ 失敗 {rs['failed']} ｜ 略過 {rs['skipped']} ｜ 循環 {rs['loops']}{err_str}")
+            if mgr.decoder is not None:
+                dec = mgr.decoder
+                st.caption(f"DBC 解碼: {dec.decoded} ｜ 記憶命中: {dec.memo_hits} ｜ 未知 ID: {dec.unknown} ｜ 失敗: {dec.errors}")
+            chn_labels = mgr.chn_labels if len(mgr.links) > 1 else None
+            mode_cols = st.columns([2, 2, 2])
+            mode = mode_cols[0].radio("檢視", ["時間軸", "固定 (依 ID)"], horizontal=True, label_visibility="collapsed", key="monitor_mode")
+            # 篩選只影響本分頁的顯示，不改變共用的擷取與硬體濾波
+            flt_ids = mode_cols[1].text_input("ID 篩選", "", placeholder="ID 篩選 (十六進位，逗號分隔)", label_visibility="collapsed", key="monitor_ids")
+            flt_chns = mode_cols[2].multiselect("通道篩選", list(mgr.chn_labels), format_func=lambda c: mgr.chn_labels[c], placeholder="全部通道", label_visibility="collapsed", key="monitor_chns") if chn_labels else []
+            try: ids = [int(x, 16) for x in flt_ids.replace(" ", "").split(",") if x] or None
+            except ValueError: ids = None; st.caption("⚠️ ID 篩選格式錯誤，已忽略")
+            chns = flt_chns or None
+            if mode == "時間軸":
+                view = st.session_state.monitor_view
+                view.set_filter(ids, chns)
+                nav = st.columns([1, 1, 1, 1, 1.2])
+                if nav[0].button("▶️ 繼續" if view.paused else "⏸️ 暫停", use_container_width=True): view.paused = not view.paused
+                if nav[1].button("⏫ 往前", use_container_width=True): view.paused, view.offset = False, view.offset + view.page_rows
+                if nav[2].button("⏬ 往後", use_container_width=True, disabled=view.offset == 0): view.paused, view.offset = False, max(0, view.offset - view.page_rows)
+                if nav[3].button("⤓ 最新", use_container_width=True, disabled=view.following): view.follow()
+                view.page_rows = nav[4].selectbox("顯示筆數", [100, 200, 500, 1000], index=1, label_visibility="collapsed")
+                decoded_upto = mgr.decode_worker.cursor if mgr.decode_worker is not None else None
+                table, v_start, v_end, total = view.render(mgr.store, chn_labels, decoded_upto)
+                view.offset = min(view.offset, max(0, total - (v_end - v_start)))
+                st.caption(f"{'跟隨最新' if view.following else ('已暫停' if view.paused else '回看中')} ｜ 顯示 {v_end - v_start} 筆，距最新 {view.offset} 筆 ｜ {'符合' if view.filtered else '保留'} {total} 筆")
+            else:
+                names = {m.frame_id: m.name for m in mgr.decoder.by_id.values()} if mgr.decoder is not None else None
+                snap = mgr.id_stats.snapshot()
+                if ids is not None or chns is not None:
+                    keep = (np.isin(snap["can_id"], ids) if ids is not None else True) & (np.isin(snap["chn"], chns) if chns is not None else True)
+                    snap = {k: v[keep] for k, v in snap.items()}
+                table = build_id_table(snap, names, chn_labels)
+                st.caption(f"{len(table)} 個 (通道, ID, 方向) ｜ 逾時 = 超過平均週期 3 倍未收到")
+            st.dataframe(table, use_container_width=True, hide_index=True, height=250)
+            if st.button("🗑️ 清空日誌", use_container_width=True, help="共用緩衝：所有分頁的日誌、統計與曲線都會清空"):
+                mgr.clear(); st.session_state.monitor_view.follow(); st.rerun()
     render_monitor_log()
 
-st.markdown(f'<div class="status-bar"><span>📦 Version: v1.9.5 (Optimized)</span><span style="margin-left:auto;">📂 Log: {log_filename}</span></div>', unsafe_allow_html=True)
\ No newline at end of file
+    # --- 6. 訊號曲線 ---
+    @st.fragment(run_every=1.0 if st.session_state.is_monitoring else None)
+    def render_signal_plot():
+        with st.expander("📈 訊號曲線"):
+            series = mgr.series
+            multi = len(mgr.links) > 1
+            keys = series.keys()
+            fmt = lambda k: f"{mgr.chn_labels.get(k[0], f'CH{k[0]}')} {k[1]}.{k[2]}" if multi else f"{k[1]}.{k[2]}"
+            picked = st.multiselect("訊號", keys, format_func=fmt, key="plot_signals", max_selections=16)
+            ctl = st.columns([1, 1, 1, 1])
+            window_s = ctl[0].number_input("時間窗 (s)", 1.0, 86400.0, 60.0, 10.0)
+            width = ctl[1].number_input("降採樣格數", 100, 4000, 800, 100, help="約為圖表像素寬度")
+            method = ctl[2].radio("方法", ["minmax", "lttb"], horizontal=True, format_func=lambda m: "最小/最大" if m == "minmax" else "LTTB")
+            follow = ctl[3].toggle("跟隨最新", value=True)
+            span = series.span(picked) if picked else None
+            if span is None:
+                st.caption("尚無資料：載入 DBC 並接收報文後可選擇訊號"); return
+            t_end = span[1]
+            if not follow and span[1] - span[0] > window_s:
+                # 平移：滑桿選擇時間窗的結束位置 (相對最新的秒數)
+                back = st.slider("往前平移 (s)", 0.0, float(span[1] - span[0] - window_s), 0.0, max(window_s / 10, 0.1))
+                t_end = span[1] - back
+            t0, t1 = max(span[0], t_end - window_s), t_end
+            q0 = time.perf_counter()
+            frames, raw = [], 0
+            for k in picked:
+                ts, val = series.query(k, t0, t1, width, method)
+                raw += len(ts)
+                frames.append(pd.DataFrame({"時間": pd.to_datetime(to_wall(ts), unit="s"), "值": val, "訊號": fmt(k)}))
+            q_ms = (time.perf_counter() - q0) * 1e3
+            df = pd.concat(frames, ignore_index=True)
+            chart = alt.Chart(df).mark_line(interpolate="linear").encode(x=alt.X("時間:T", title=None), y=alt.Y("值:Q", title=None), color="訊號:N")
+            st.altair_chart(chart, use_container_width=True)
+            st.caption(f"時間窗 {t1 - t0:.1f} s ｜ 送出 {raw} 點 ｜ 查詢+降採樣 {q_ms:.1f} ms")
+    render_signal_plot()
+
+st.markdown(f'<div class="status-bar"><span>📦 Version: v1.9.5 (Optimized){" ｜ 🧪 模擬後端" if USE_SIM else ""}</span><span style="margin-left:auto;">📂 Log: {log_filename}</span></div>', unsafe_allow_html=True)
\ No newline at end of file
@@ -0,0 +1,186 @@
+import threading
+
+import numpy as np
+
+
+def safe_float(val, default=0.0):
+    if val is None: return float(default)
+    try: return float(val.value) if hasattr(val, 'value') else float(val)
+    except: return float(default)
+
+
+def default_signal_values(m_obj):
+    return {s.name: safe_float(s.initial, safe_float(s.minimum, 0.0)) for s in m_obj.signals}
+
+
+def signal_meta(m_obj):
+    # 訊號控制元件所需的型別與範圍：整數訊號以 1 為步進
+    meta = {}
+    for s in m_obj.signals:
+        is_int = (not s.is_float) and (s.scale == 1) and (float(s.offset).is_integer())
+        min_v, max_v = safe_float(s.minimum, 0), safe_float(s.maximum, 100)
+        meta[s.name] = {"is_int": is_int, "min": int(min_v) if is_int else float(min_v), "max": int(max_v) if is_int else float(max_v), "step": 1 if is_int else None}
+    return meta
+
+
+def _scaled_to_raw(sig, value):
+    conv = getattr(sig, "conversion", None)
+    if conv is not None: return conv.numeric_scaled_to_raw(value)
+    raw = (value - sig.offset) / sig.scale
+    return raw if sig.is_float else round(raw)
+
+
+# --- 單一報文編碼器 ---
+# 保存預設訊號向量與上次編碼結果；訊號值沒變時直接回傳快取，只有少數訊號改變時
+# 僅改寫這些訊號的位元區段，其餘情況 (浮點/多工訊號、超出範圍) 才交給 cantools 完整編碼。
+class MessageEncoder:
+    def __init__(self, m_obj):
+        self.message, self.length = m_obj, m_obj.length
+        self.defaults = default_signal_values(m_obj)
+        self.full_encodes = self.patch_encodes = self.cache_hits = 0
+        self._values, self._payload = None, None
+        self._patchable = {}
+        if not m_obj.is_multiplexed() and not getattr(m_obj, "is_container", False):
+            total_bits = 8 * m_obj.length
+            for s in m_obj.signals:
+                if s.is_float: continue
+                mask = (1 << s.length) - 1
+                if s.byte_order == "little_endian":
+                    self._patchable[s.name] = (s, False, s.start, mask)
+                else:
+                    msb = (s.start // 8) * 8 + (7 - s.start % 8)
+                    self._patchable[s.name] = (s, True, total_bits - (msb + s.length), mask)
+        self._lock = threading.Lock()
+
+    def encode(self, sig_values=None):
+        with self._lock:
+            values = dict(self.defaults)
+            if sig_values: values.update(sig_values)
+            if self._payload is not None:
+                changed = [k for k, v in values.items() if self._values.get(k) != v]
+                if not changed:
+                    self.cache_hits += 1
+                    return self._payload
+                payload = self._patch(changed, values)
+                if payload is not None:
+                    self._values, self._payload = values, payload
+                    self.patch_encodes += 1
+                    return payload
+            payload = self.message.encode(values)
+            self._values, self._payload = values, payload
+            self.full_encodes += 1
+            return payload
+
+    def _patch(self, changed, values):
+        payload = self._payload
+        for name in changed:
+            entry = self._patchable.get(name)
+            if entry is None: return None
+            sig, big_endian, shift, mask = entry
+            value = values[name]
+            if not isinstance(value, (int, float)): return None
+            if sig.minimum is not None and value < sig.minimum: return None
+            if sig.maximum is not None and value > sig.maximum: return None
+            raw = int(_scaled_to_raw(sig, value))
+            lo, hi = (-(1 << (sig.length - 1)), (1 << (sig.length - 1)) - 1) if sig.is_signed else (0, mask)
+            if not lo <= raw <= hi: return None
+            order = "big" if big_endian else "little"
+            word = int.from_bytes(payload, order)
+            word = (word & ~(mask << shift)) | ((raw & mask) << shift)
+            payload = word.to_bytes(self.length, order)
+        return payload
+
+
+# --- 依 DBC 建立的編碼器表 ---
+class EncoderTable:
+    def __init__(self, db):
+        self.db = db
+        self._encoders = {}
+        self._lock = threading.Lock()
+
+    def get(self, m_name):
+        enc = self._encoders.get(m_name)
+        if enc is None:
+            with self._lock:
+                enc = self._encoders.get(m_name)
+                if enc is None:
+                    enc = self._encoders[m_name] = MessageEncoder(self.db.get_message_by_name(m_name))
+        return enc
+
+    def encode(self, m_name, sig_values=None):
+        enc = self.get(m_name)
+        return enc.message.frame_id, enc.encode(sig_values)
+
+
+# --- 依 DBC 建立的解碼表 ---
+# frame_id -> message 於 DBC 載入時建立一次；解碼結果以 (frame_id, payload) 記憶，
+# 週期報文內容大多重複，命中時直接共用同一個 dict。未知 ID 以向量化遮罩先行排除。
+class DecoderTable:
+    def __init__(self, db, memo_size=65536, by_id=None):
+        self.db = db
+        self.by_id = by_id if by_id is not None else {m.frame_id: m for m in db.messages}
+        self.known_ids = np.fromiter(self.by_id, dtype=np.uint32, count=len(self.by_id))
+        self.memo_size = memo_size
+        self.decoded = self.memo_hits = self.unknown = self.errors = 0
+        self._memo = {}
+
+    def decode(self, frame_id, payload):
+        key = (frame_id, payload)
+        values = self._memo.get(key)
+        if values is not None:
+            self.memo_hits += 1
+            return values
+        m_obj = self.by_id.get(frame_id)
+        if m_obj is None: return None
+        try:
+            values = m_obj.decode(payload, decode_choices=False)
+        except Exception:
+            self.errors += 1
+            return None
+        if len(self._memo) >= self.memo_size: self._memo.clear()
+        self._memo[key] = values
+        return values
+
+    def decode_rows(self, can_id, dlc, data):
+        """解碼一批報文，回傳與輸入等長的 object 陣列 (未知 ID 或解碼失敗為 None)。"""
+        out = np.full(len(can_id), None, dtype=object)
+        known = np.flatnonzero(np.isin(can_id, self.known_ids))
+        self.unknown += len(can_id) - len(known)
+        decode = self.decode
+        for i, fid, n in zip(known.tolist(), can_id[known].tolist(), dlc[known].tolist()):
+            out[i] = decode(fid, data[i, :n].tobytes())
+        self.decoded += len(known)
+        return out
+
+
+def format_signals(values, limit=6):
+    if not values: return ""
+    items = [f"{k}={v:g}" if isinstance(v, float) else f"{k}={v}" for k, v in list(values.items())[:limit]]
+    return ", ".join(items) + (" …" if len(values) > limit else "")
+
+
+# --- 背景解碼執行緒 ---
+# 以游標追蹤 FrameStore，將新報文整批解碼後回填 decoded 欄位，不佔用擷取與 UI 執行緒。
+class DecodeWorker(threading.Thread):
+    def __init__(self, store, table=None, interval=0.05, batch=5000, series=None):
+        super().__init__(name="dbc-decode", daemon=True)
+        self.store, self.table, self.interval, self.batch = store, table, interval, batch
+        self.series = series  # SignalSeries：解碼結果同時寫入訊號時間序列
+        self.cursor = store.seq
+        self._stop_evt = threading.Event()
+
+    def stop(self, timeout=1.0):
+        self._stop_evt.set()
+        if self.is_alive(): self.join(timeout)
+
+    def run(self):
+        while not self._stop_evt.wait(self.interval):
+            while True:
+                table = self.table
+                cols, start, end = self.store.read(self.cursor, self.batch)
+                self.cursor = end
+                if end == start: break
+                if table is not None:
+                    values = table.decode_rows(cols["can_id"], cols["dlc"], cols["data"])
+                    self.store.set_decoded(start, values)
+                    if self.series is not None: self.series.add(cols["ts"], cols["can_id"], cols["chn"], values, table.by_id)
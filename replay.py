@@ -0,0 +1,170 @@
+import os
+import logging
+import threading
+
+import numpy as np
+
+from capture import CAPTURE_DTYPE, HEADER_SIZE, read_header
+from cyclic_tx import SPIN_WINDOW, _fine_timer
+from frame_store import DIR_TX, FLAG_ERR, FLAG_EFF, FLAG_RTR, FLAG_FDF, FLAG_BRS, STATUS_OK, STATUS_TX_FAIL, STATUS_EXCP
+from hw_clock import host_now
+from tx_batch import TxBatch
+
+logger = logging.getLogger("ZLG_CAN_TOOL")
+
+
+# --- 記憶體映射的錄製檔讀取器 ---
+# 以 np.memmap 映射整個檔案，記錄只有在被切片存取時才由 OS 分頁載入，開檔不需讀取內容，
+# 多 GB 的錄製檔也能立即開始迭代且常駐記憶體維持平穩。
+class TraceReader:
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as fp: self.header = read_header(fp)
+        n = (os.path.getsize(path) - HEADER_SIZE) // CAPTURE_DTYPE.itemsize
+        self.records = np.memmap(path, dtype=CAPTURE_DTYPE, mode="r", offset=HEADER_SIZE, shape=(n,)) if n else np.zeros(0, dtype=CAPTURE_DTYPE)
+
+    def __len__(self):
+        return len(self.records)
+
+    @property
+    def start_ts(self):
+        return float(self.records["ts"][0]) if len(self.records) else self.header["start_ts"]
+
+    @property
+    def duration(self):
+        return float(self.records["ts"][-1] - self.records["ts"][0]) if len(self.records) > 1 else 0.0
+
+    def chunks(self, size=8192, ids=None):
+        """依序產生記錄區塊 (每塊只複製符合 ID 篩選的列)。"""
+        for start in range(0, len(self.records), size):
+            rec = self.records[start:start + size]
+            if ids is not None: rec = rec[np.isin(rec["can_id"], ids)]
+            if len(rec): yield rec
+
+
+class ReplayStats:
+    __slots__ = ("frames", "sent", "failed", "skipped", "loops", "_err", "_n")
+
+    def __init__(self, window=10000):
+        self.frames = self.sent = self.failed = self.skipped = self.loops = 0
+        self._err = np.zeros(window, dtype=np.float64)
+        self._n = 0
+
+    def record(self, errors):
+        # errors: 實際送出時間 - 依錄製時間戳推得的目標時間 (秒)
+        w = len(self._err)
+        idx = np.arange(self._n, self._n + len(errors)) % w
+        self._err[idx] = errors[-w:] if len(errors) > w else errors
+        self._n += len(errors)
+
+    def as_dict(self):
+        out = {"frames": self.frames, "sent": self.sent, "failed": self.failed, "skipped": self.skipped, "loops": self.loops}
+        e = self._err[:min(self._n, len(self._err))]
+        if len(e):
+            out.update(mean_err_ms=float(e.mean() * 1e3), p99_err_ms=float(np.percentile(np.abs(e), 99) * 1e3), max_err_ms=float(np.abs(e).max() * 1e3))
+        return out
+
+
+# --- 離線回放執行緒 ---
+# 以錄製時間戳換算主機端絕對截止時間 (t0 + Δts / speed)，到期的報文合併為一次 TransmitFD/Transmit；
+# 等待方式與 CyclicScheduler 相同 (先睡眠，最後 SPIN_WINDOW 忙等)。speed <= 0 時不控時，全速送出。
+class ReplayEngine(threading.Thread):
+    def __init__(self, zcanlib, chn_handle, can_type, paths, speed=1.0, ids=None, loop=False, store=None, batch_size=64, chn=0, echo=False):
+        super().__init__(name="replay", daemon=True)
+        self.fd, self.store, self.chn, self.echo = can_type == 1, store, chn, echo
+        self.paths = [paths] if isinstance(paths, str) else list(paths)
+        self.speed, self.loop = speed, loop
+        self.ids = None if ids is None else np.asarray(sorted(ids), dtype=np.uint32)
+        self.stats = ReplayStats()
+        self.position = 0.0  # 目前回放到的錄製時間 (相對第一筆，秒)
+        self.duration = 0.0
+        self._batch = TxBatch(zcanlib, chn_handle, can_type, capacity=batch_size)
+        # CANFD 通道上錄製為傳統 CAN (無 FDF) 的報文改以 Transmit 送出
+        self._classic = TxBatch(zcanlib, chn_handle, 0, capacity=batch_size) if self.fd else None
+        self._stop_evt = threading.Event()
+
+    @property
+    def finished(self):
+        return not self.is_alive()
+
+    def stop(self, timeout=1.0):
+        self._stop_evt.set()
+        if self.is_alive(): self.join(timeout)
+
+    def run(self):
+        readers = [TraceReader(p) for p in self.paths]
+        readers = [r for r in readers if len(r)]
+        if not readers:
+            logger.warning("回放檔案沒有任何報文"); return
+        rec_t0 = readers[0].start_ts
+        self.duration = float(readers[-1].records["ts"][-1]) - rec_t0
+        logger.info(f"開始回放 {len(self.paths)} 個檔案 (x{self.speed}, 篩選 {0 if self.ids is None else len(self.ids)} 個 ID, 循環={self.loop})")
+        with _fine_timer():
+            while not self._stop_evt.is_set():
+                host_t0 = host_now()
+                for reader in readers:
+                    for rec in reader.chunks(ids=self.ids):
+                        if not self._play_chunk(rec, rec_t0, host_t0): break
+                    if self._stop_evt.is_set(): break
+                if not self.loop or self._stop_evt.is_set(): break
+                self.stats.loops += 1
+        self._stop_evt.set()
+        logger.info(f"回放結束: {self.stats.as_dict()}")
+
+    def _play_chunk(self, rec, rec_t0, host_t0):
+        stats = self.stats
+        stats.frames += len(rec)
+        keep = (rec["flags"] & FLAG_ERR) == 0
+        if not self.fd: keep &= rec["dlc"] <= 8
+        stats.skipped += int(len(rec) - keep.sum())
+        rec = rec[keep]
+        if len(rec) == 0: return True
+        rel = rec["ts"] - rec_t0
+        target = host_t0 + rel / self.speed if self.speed > 0 else None
+        i, n, cap = 0, len(rec), self._batch.capacity
+        while i < n:
+            if self._stop_evt.is_set(): return False
+            if target is None: j = min(n, i + cap)
+            else:
+                due = target[i]
+                remaining = due - host_now()
+                if remaining > SPIN_WINDOW:
+                    if self._stop_evt.wait(min(remaining - SPIN_WINDOW, 0.5)): return False
+                    continue
+                while host_now() < due: pass
+                j = min(n, i + cap, int(np.searchsorted(target, due + SPIN_WINDOW, side="right")))
+                j = max(j, i + 1)
+            self._send(rec[i:j], None if target is None else target[i:j])
+            self.position = float(rel[j - 1])
+            i = j
+        return True
+
+    def _send(self, rec, target):
+        # 依錄製的旗標送出 (EFF/RTR、CANFD 的 FDF/BRS)；CANFD 通道上 FDF 有無交替時分段，依序各送一次
+        n = len(rec)
+        status = np.full(n, STATUS_OK, dtype=np.int16)
+        if self.fd:
+            fdf = (rec["flags"] & FLAG_FDF) != 0
+            cuts = np.flatnonzero(np.diff(fdf)) + 1
+            runs = zip(np.r_[0, cuts], np.r_[cuts, n])
+        else: fdf, runs = None, [(0, n)]
+        for lo, hi in runs:
+            batch = self._batch if fdf is None or fdf[lo] else self._classic
+            batch.pack(rec["can_id"][lo:hi], rec["dlc"][lo:hi], rec["data"][lo:hi], rec["flags"][lo:hi])
+            try:
+                k = batch.submit()
+                if k < hi - lo: status[lo + k:] = STATUS_TX_FAIL
+            except Exception as e:
+                logger.error(f"回放發送異常 ({hi - lo} 筆): {e}")
+                k = 0; status[lo:hi], status[hi:] = STATUS_EXCP, STATUS_TX_FAIL
+            if k < hi - lo: break  # 之後的分段不再送出，維持報文順序
+        now = host_now()
+        accepted = int((status == STATUS_OK).sum())
+        self.stats.sent += accepted; self.stats.failed += n - accepted
+        if target is not None: self.stats.record(now - target)
+        if self.store is not None:
+            flags = rec["flags"] & (FLAG_EFF | FLAG_RTR | FLAG_FDF | FLAG_BRS if self.fd else FLAG_EFF | FLAG_RTR)
+            if self.echo:  # 送出的報文由發送回顯記錄，這裡只記錄失敗
+                keep = status != STATUS_OK
+                rec, status, flags = rec[keep], status[keep], flags[keep]
+            self.store.extend(now, 0, rec["can_id"], DIR_TX, rec["dlc"], flags, status, rec["data"], self.chn)
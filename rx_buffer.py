@@ -0,0 +1,33 @@
+import numpy as np
+
+import zlgcan
+from frame_codec import RX_CAN_DTYPE, RX_CANFD_DTYPE, DATAOBJ_DTYPE, decode_buffers
+
+
+# --- 擷取執行緒專用的接收緩衝區 ---
+# ctypes 陣列、對應的 NumPy 結構化檢視與解碼輸出欄位在建立時一次配置，每個擷取執行緒一份；
+# FrameStore.extend 與其 sink 在同一迴圈內同步複製完畢，下一次 Receive*Into 直接覆寫，
+# 每批只對既有陣列取 [:n] 切片，不再配置報文大小的記憶體。
+class RxBuffer:
+    __slots__ = ("array", "view", "cols", "count")
+
+    def __init__(self, fd, capacity=1000, merged=False):
+        # merged：設備層 ReceiveData 使用的 ZCANDataObj 陣列，另配置分流用的 chn/hit 欄位；keep 供篩選 (分流/軟體濾波)
+        if merged: ctype, dtype = zlgcan.ZCANDataObj, DATAOBJ_DTYPE
+        elif fd: ctype, dtype = zlgcan.ZCAN_ReceiveFD_Data, RX_CANFD_DTYPE
+        else: ctype, dtype = zlgcan.ZCAN_Receive_Data, RX_CAN_DTYPE
+        self.array = (ctype * capacity)()
+        self.view = np.frombuffer(self.array, dtype=dtype)
+        self.cols = decode_buffers(capacity)
+        self.cols["keep"] = np.empty(capacity, np.bool_)
+        if merged: self.cols.update(chn=np.empty(capacity, np.uint8), hit=np.empty(capacity, np.bool_))
+        self.count = 0
+
+    @property
+    def capacity(self):
+        return len(self.view)
+
+    @property
+    def frames(self):
+        """本批收到的報文 (結構化檢視，與 array 共用記憶體)。"""
+        return self.view[:self.count]
@@ -0,0 +1,227 @@
+import time
+import logging
+import threading
+from ctypes import c_int
+
+import numpy as np
+
+import zlgcan
+from frame_store import DIR_RX, STATUS_OK
+from frame_codec import decode_batch, decode_data_batch
+from rx_buffer import RxBuffer
+from hw_clock import DeviceClock, host_now
+from hw_filter import plan_mask
+
+logger = logging.getLogger("ZLG_CAN_TOOL")
+
+OVERRUN_MASK = zlgcan.ZCAN_ERROR_CAN_OVERFLOW | zlgcan.ZCAN_ERROR_CAN_BUFFER_OVERFLOW
+
+
+# --- 擷取統計 ---
+class RxStats:
+    __slots__ = ("received", "batches", "full_batches", "overruns", "errors", "filtered")
+
+    def __init__(self):
+        self.received = 0      # 自驅動讀出的報文總數
+        self.batches = 0       # 有資料的 Receive 呼叫次數
+        self.full_batches = 0  # 讀滿 batch_size 的次數 (代表主機端跟不上)
+        self.overruns = 0      # 驅動/控制器回報的溢出次數
+        self.errors = 0        # SDK 呼叫異常次數
+        self.filtered = 0      # 硬體濾波槽數不足時由軟體濾波丟棄的報文數
+
+    def as_dict(self):
+        return {k: getattr(self, k) for k in self.__slots__}
+
+
+# --- 單通道擷取執行緒 ---
+# 以 wait_time 阻塞式讀取取代 GetReceiveNum 輪詢，讀到的報文批次寫入 FrameStore。
+# 報文直接讀進執行緒自有的預先配置陣列 (Receive*Into)，解碼欄位也寫入緩衝區自帶的陣列；
+# FrameStore 與其 sink 同步複製完畢後下一批即覆寫，穩定狀態下每批不再配置報文大小的記憶體。
+class RxWorker(threading.Thread):
+    def __init__(self, zcanlib, chn_handle, can_type, store, clock=None, batch_size=1000, wait_ms=50, errinfo_interval=0.5, chn=0):
+        super().__init__(name=f"rx-{chn_handle}", daemon=True)
+        self.zcanlib, self.chn_handle, self.can_type, self.store, self.chn = zcanlib, chn_handle, can_type, store, chn
+        self.clock = clock if clock is not None else DeviceClock()
+        self.batch_size, self.wait_time = batch_size, c_int(wait_ms)
+        self.buffer = RxBuffer(can_type == 1, batch_size)
+        self.errinfo_interval = errinfo_interval
+        self.stats = RxStats()
+        self.sw_filter = None  # 軟體濾波範圍 [(mode, start, end)]，None 為全部放行
+        self._stop_evt = threading.Event()
+
+    def stop(self, timeout=1.0):
+        self._stop_evt.set()
+        if self.is_alive(): self.join(timeout)
+
+    def run(self):
+        logger.info(f"RX 擷取執行緒啟動 (handle={self.chn_handle})")
+        zcanlib, handle, fd = self.zcanlib, self.chn_handle, self.can_type == 1
+        stats, next_errinfo, buf = self.stats, time.monotonic() + self.errinfo_interval, self.buffer
+        while not self._stop_evt.is_set():
+            try:
+                if fd:
+                    actual = zcanlib.ReceiveFDInto(handle, buf.array, buf.capacity, self.wait_time)
+                else:
+                    actual = zcanlib.ReceiveInto(handle, buf.array, buf.capacity, self.wait_time)
+            except Exception as e:
+                stats.errors += 1
+                logger.error(f"RX 擷取異常: {e}")
+                self._stop_evt.wait(self.wait_time.value / 1000.0)
+                continue
+            if actual > 0:
+                buf.count = actual
+                self._store_batch(buf, fd)
+                stats.received += actual; stats.batches += 1
+                if actual >= buf.capacity: stats.full_batches += 1
+            now = time.monotonic()
+            if now >= next_errinfo:
+                next_errinfo = now + self.errinfo_interval
+                self._check_overrun()
+        logger.info(f"RX 擷取執行緒結束 (handle={self.chn_handle}, {self.stats.as_dict()})")
+
+    def _store_batch(self, buf, fd):
+        # 整批以結構化檢視拆欄，無逐筆 Python 迴圈；每批只讀一次主機時鐘用於時鐘對齊
+        host_ts = host_now()
+        cols = buf.cols
+        batch = decode_batch(buf.frames, fd, cols)
+        hw_ts = batch["hw_ts"]
+        self.clock.observe(hw_ts[-1], host_ts)
+        ts = self.clock.to_host(hw_ts, cols["ts"][:buf.count])
+        values = [ts, hw_ts, batch["can_id"], batch["dlc"], batch["flags"], batch["data"]]
+        plan = self.sw_filter
+        if plan is not None:
+            keep = plan_mask(plan, batch["can_id"], batch["flags"], cols["keep"][:buf.count])
+            if not keep.all():
+                self.stats.filtered += int(buf.count - keep.sum())
+                values = [v[keep] for v in values]
+        ts, hw_ts, can_id, dlc, flags, data = values
+        if len(ts): self.store.extend(ts, hw_ts, can_id, DIR_RX, dlc, flags, STATUS_OK, data, self.chn)
+
+    def _check_overrun(self):
+        try:
+            err = self.zcanlib.ReadChannelErrInfo(self.chn_handle)
+        except Exception:
+            return
+        if err is not None and err.error_code & OVERRUN_MASK:
+            self.stats.overruns += 1
+            logger.warning(f"驅動緩衝區溢出 (handle={self.chn_handle}, code=0x{err.error_code:04X})")
+
+
+# --- 設備層合併擷取執行緒 ---
+# 一次 ReceiveData 取回設備上所有通道依時間排序的報文，依 chnl 分流到各通道的 FrameStore 編號與統計，
+# 取代每通道各自的 ReceiveFD 執行緒。發送回顯 (txEchoed) 以 TX 方向寫入，時間戳為報文實際上匯流排的硬體時間，
+# 發送端因此不再以送出當下的主機時間記錄成功的報文。
+class DeviceRxWorker(threading.Thread):
+    def __init__(self, zcanlib, dev_handle, store, clock=None, batch_size=1000, wait_ms=50, errinfo_interval=0.5):
+        super().__init__(name=f"rx-dev-{dev_handle}", daemon=True)
+        self.zcanlib, self.dev_handle, self.store = zcanlib, dev_handle, store
+        self.clock = clock if clock is not None else DeviceClock()
+        self.batch_size, self.wait_time = batch_size, c_int(wait_ms)
+        self.errinfo_interval = errinfo_interval
+        self.buffer = RxBuffer(True, batch_size, merged=True)
+        self.stats = RxStats()  # 設備合計；各通道另有自己的 RxStats
+        self.unrouted = 0       # 未開啟通道的報文與非 CAN/CANFD 資料
+        self._routes = {}       # 設備通道索引 -> (通道 handle, RxStats)
+        self._chn_map = np.zeros(256, dtype=np.uint8)  # 設備通道索引 -> FrameStore chn
+        self._open = np.zeros(256, dtype=np.bool_)
+        self._sw_filters = {}   # 設備通道索引 -> 軟體濾波範圍
+        self._lock = threading.Lock()
+        self._stop_evt = threading.Event()
+
+    @property
+    def active(self):
+        return not self._stop_evt.is_set()
+
+    def attach(self, chn_index, chn_handle, chn=0):
+        """開始分流此通道的報文，回傳該通道的 RxStats。"""
+        stats = RxStats()
+        with self._lock:
+            self._routes[chn_index] = (chn_handle, stats)
+            self._chn_map[chn_index], self._open[chn_index] = chn, True
+        return stats
+
+    def set_filter(self, chn_index, plan):
+        """設定此通道的軟體濾波範圍，None 為全部放行。"""
+        with self._lock:
+            if plan is None: self._sw_filters.pop(chn_index, None)
+            else: self._sw_filters[chn_index] = plan
+
+    def detach(self, chn_index):
+        """停止分流此通道，回傳設備上是否已無通道。"""
+        with self._lock:
+            self._routes.pop(chn_index, None)
+            self._sw_filters.pop(chn_index, None)
+            self._open[chn_index] = False
+            return not self._routes
+
+    def stop(self, timeout=1.0):
+        self._stop_evt.set()
+        if self.is_alive(): self.join(timeout)
+
+    def run(self):
+        logger.info(f"設備合併擷取執行緒啟動 (handle={self.dev_handle})")
+        zcanlib, handle, stats, buf = self.zcanlib, self.dev_handle, self.stats, self.buffer
+        next_errinfo = time.monotonic() + self.errinfo_interval
+        while not self._stop_evt.is_set():
+            try:
+                actual = zcanlib.ReceiveDataInto(handle, buf.array, buf.capacity, self.wait_time)
+            except Exception as e:
+                stats.errors += 1
+                logger.error(f"設備合併擷取異常: {e}")
+                self._stop_evt.wait(self.wait_time.value / 1000.0)
+                continue
+            if actual > 0:
+                buf.count = actual
+                self._store_batch(buf)
+                stats.received += actual; stats.batches += 1
+                if actual >= buf.capacity: stats.full_batches += 1
+            now = time.monotonic()
+            if now >= next_errinfo:
+                next_errinfo = now + self.errinfo_interval
+                self._check_overrun()
+        logger.info(f"設備合併擷取執行緒結束 (handle={self.dev_handle}, {self.stats.as_dict()}, 未分流 {self.unrouted})")
+
+    def _store_batch(self, buf):
+        host_ts = host_now()
+        n, cols = buf.count, buf.cols
+        batch = decode_data_batch(buf.frames, cols)
+        chnl, hw_ts = batch["chnl"], batch["hw_ts"]
+        self.clock.observe(hw_ts[-1], host_ts)
+        ts = self.clock.to_host(hw_ts, cols["ts"][:n])
+        keep, chn = cols["keep"][:n], cols["chn"][:n]
+        with self._lock:
+            routes = dict(self._routes)
+            filters = list(self._sw_filters.items())
+            np.take(self._open, chnl, out=keep)
+            np.take(self._chn_map, chnl, out=chn)
+        keep &= batch["valid"]
+        hit, filtered = cols["hit"][:n], 0
+        for index, plan in filters:
+            # 軟體濾波只作用於該通道收到的報文，發送回顯不經濾波
+            drop = np.equal(chnl, index) & keep & ~batch["echoed"] & ~plan_mask(plan, batch["can_id"], batch["flags"], hit)
+            k = int(np.count_nonzero(drop))
+            if k:
+                keep &= ~drop; filtered += k
+                if index in routes: routes[index][1].filtered += k; routes[index][1].received += k
+        direction = batch["echoed"].view(np.uint8)  # DIR_RX = 0、DIR_TX = 1
+        values = [ts, hw_ts, batch["can_id"], direction, batch["dlc"], batch["flags"], batch["data"], chn, chnl]
+        if not keep.all():  # 只有出現未分流或被軟體濾波的報文時才複製篩選
+            self.unrouted += int(n - keep.sum()) - filtered
+            values = [v[keep] for v in values]
+        ts, hw_ts, can_id, direction, dlc, flags, data, chn, chnl = values
+        if len(ts): self.store.extend(ts, hw_ts, can_id, direction, dlc, flags, STATUS_OK, data, chn)
+        hit = cols["hit"][:len(chnl)]
+        for index, (_, stats) in routes.items():
+            k = int(np.count_nonzero(np.equal(chnl, index, out=hit)))
+            if k: stats.received += k; stats.batches += 1
+
+    def _check_overrun(self):
+        with self._lock: routes = list(self._routes.values())
+        for chn_handle, stats in routes:
+            try:
+                err = self.zcanlib.ReadChannelErrInfo(chn_handle)
+            except Exception:
+                continue
+            if err is not None and err.error_code & OVERRUN_MASK:
+                stats.overruns += 1; self.stats.overruns += 1
+                logger.warning(f"驅動緩衝區溢出 (handle={chn_handle}, code=0x{err.error_code:04X})")
@@ -0,0 +1,143 @@
+import threading
+
+import numpy as np
+
+
+def minmax_downsample(ts, val, t0, t1, width):
+    """把 [t0, t1] 切成 width 格，每格保留最小與最大值 (依格內走勢決定先後)，峰值不會被抹掉。"""
+    if len(ts) <= 2 * width: return ts, val
+    edges = np.linspace(t0, t1, width + 1)[1:-1]
+    starts = np.unique(np.concatenate(([0], np.searchsorted(ts, edges))))
+    starts = starts[starts < len(ts)]
+    ends = np.append(starts[1:], len(ts)) - 1
+    vmin, vmax = np.minimum.reduceat(val, starts), np.maximum.reduceat(val, starts)
+    rising = val[starts] <= val[ends]
+    out_t = np.empty(2 * len(starts)); out_v = np.empty(2 * len(starts))
+    out_t[0::2], out_t[1::2] = ts[starts], ts[ends]
+    out_v[0::2], out_v[1::2] = np.where(rising, vmin, vmax), np.where(rising, vmax, vmin)
+    return out_t, out_v
+
+
+def lttb_downsample(ts, val, n_out):
+    """Largest-Triangle-Three-Buckets 降採樣到 n_out 點 (含首尾)。
+
+    標準 LTTB 以前一格「已選出的點」為錨點，必須逐格迴圈；這裡改以前一格的平均點為錨點，
+    所有格可一次向量化計算，形狀與標準 LTTB 幾乎相同。
+    """
+    n = len(ts)
+    if n <= n_out or n_out < 3: return ts, val
+    bounds = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    starts = bounds[:-1]
+    counts = np.diff(bounds)
+    keep = counts > 0
+    starts, counts = starts[keep], counts[keep]
+    # 各格平均點，前後各補上首尾點作為第一格/最後一格的錨點
+    avg_t = np.add.reduceat(ts[1:n - 1], starts - 1) / counts
+    avg_v = np.add.reduceat(val[1:n - 1], starts - 1) / counts
+    prev_t, prev_v = np.concatenate(([ts[0]], avg_t[:-1])), np.concatenate(([val[0]], avg_v[:-1]))
+    next_t, next_v = np.concatenate((avg_t[1:], [ts[-1]])), np.concatenate((avg_v[1:], [val[-1]]))
+    # 三角形面積 |α·v + β·t + γ|，係數每格一組，展開到各點
+    alpha, beta = prev_t - next_t, next_v - prev_v
+    gamma = -alpha * prev_v - prev_t * beta
+    t, v = ts[1:n - 1], val[1:n - 1]
+    area = np.abs(np.repeat(alpha, counts) * v + np.repeat(beta, counts) * t + np.repeat(gamma, counts))
+    best = np.repeat(np.maximum.reduceat(area, starts - 1), counts)
+    pick = np.minimum.reduceat(np.where(area == best, np.arange(n - 2), n), starts - 1) + 1
+    out = np.concatenate(([0], pick, [n - 1]))
+    return ts[out], val[out]
+
+
+class _Series:
+    __slots__ = ("ts", "val", "head", "n")
+
+    def __init__(self, capacity=4096):
+        self.ts, self.val = np.empty(capacity), np.empty(capacity)
+        self.head = self.n = 0  # 有效資料為 [head, n)
+
+    def append(self, ts, val, max_points):
+        k = len(ts)
+        if self.n + k > len(self.ts):
+            live = self.n - self.head
+            keep = min(live, max_points - min(k, max_points))
+            if keep + k > len(self.ts) // 2:
+                size = len(self.ts)
+                while size < keep + k: size *= 2
+                self.ts, self.val = np.resize(self.ts, size), np.resize(self.val, size)
+            # 前段已淘汰的空間回收：有效資料移到開頭
+            self.ts[:keep], self.val[:keep] = self.ts[self.n - keep:self.n].copy(), self.val[self.n - keep:self.n].copy()
+            self.head, self.n = 0, keep
+        k = min(k, max_points)
+        self.ts[self.n:self.n + k], self.val[self.n:self.n + k] = ts[-k:], val[-k:]
+        self.n += k
+        self.head = max(self.head, self.n - max_points)
+
+    def view(self):
+        return self.ts[self.head:self.n], self.val[self.head:self.n]
+
+
+# --- 訊號時間序列 ---
+# 由 DecodeWorker 在解碼後批次餵入，每個 (通道, 報文, 訊號) 一組欄式 (時間, 值) 陣列，超過 max_points 時淘汰最舊的點。
+# 查詢時只切出時間窗內的點並在伺服端降採樣到畫面寬度，送到瀏覽器的點數與時間窗長度無關。
+class SignalSeries:
+    def __init__(self, max_points=1_000_000):
+        self.max_points = max_points
+        self._series = {}
+        self._lock = threading.Lock()
+        self._cache = {}
+
+    def keys(self):
+        with self._lock: return sorted(self._series)
+
+    def clear(self):
+        with self._lock: self._series, self._cache = {}, {}
+
+    def add(self, ts, can_id, chn, values, by_id):
+        """values 為 decode_rows 的結果 (與 ts 等長，None 表示未解碼)。"""
+        ok = np.fromiter((v is not None for v in values), dtype=bool, count=len(values))
+        if not ok.any(): return
+        idx = np.flatnonzero(ok)
+        group = (chn[idx].astype(np.uint64) << np.uint64(32)) | can_id[idx].astype(np.uint64)
+        order = np.argsort(group, kind="stable")
+        idx, group = idx[order], group[order]
+        uniq, starts = np.unique(group, return_index=True)
+        bounds = np.append(starts, len(idx))
+        with self._lock:
+            for g, lo, hi in zip(uniq.tolist(), bounds[:-1].tolist(), bounds[1:].tolist()):
+                m_obj = by_id.get(g & 0xFFFFFFFF)
+                if m_obj is None: continue
+                rows = idx[lo:hi]
+                vals = [values[i] for i in rows.tolist()]
+                t = ts[rows]
+                for name in vals[0]:
+                    try: v = np.array([d[name] for d in vals], dtype=np.float64)
+                    except (TypeError, ValueError, KeyError): continue  # 非數值 (如列舉字串) 不繪圖
+                    key = (g >> 32, m_obj.name, name)
+                    s = self._series.get(key)
+                    if s is None: s = self._series[key] = _Series()
+                    s.append(t, v, self.max_points)
+
+    def span(self, keys=None):
+        """所選訊號的時間範圍 (主機 perf_counter 秒)，沒有資料時回傳 None。"""
+        with self._lock:
+            views = [self._series[k].view()[0] for k in (keys or self._series) if k in self._series]
+        views = [t for t in views if len(t)]
+        if not views: return None
+        return min(float(t[0]) for t in views), max(float(t[-1]) for t in views)
+
+    def query(self, key, t0, t1, width=800, method="minmax"):
+        """回傳 [t0, t1] 內降採樣到約 width 格的 (時間, 值)；同一範圍且沒有新資料時直接回傳快取。"""
+        with self._lock:
+            s = self._series.get(key)
+            if s is None: return np.empty(0), np.empty(0)
+            ts, val = s.view()
+            i0, i1 = int(np.searchsorted(ts, t0, side="left")), int(np.searchsorted(ts, t1, side="right"))
+            # 陣列在擴容或淘汰時會搬移，快取以首尾時間戳而非索引辨識
+            ck = (key, width, method, t0, t1, i1 - i0, float(ts[i0]) if i1 > i0 else None, float(ts[i1 - 1]) if i1 > i0 else None)
+            hit = self._cache.get(key)
+            if hit is not None and hit[0] == ck: return hit[1]
+            # 在鎖內直接對視窗切片降採樣 (避免複製整段資料；輸出為新陣列，不受之後寫入影響)
+            ts, val = ts[i0:i1], val[i0:i1]
+            out = minmax_downsample(ts, val, t0, t1, width) if method == "minmax" else lttb_downsample(ts, val, 2 * width)
+            if len(out[0]) == i1 - i0: out = (out[0].copy(), out[1].copy())
+            self._cache[key] = (ck, out)
+        return out
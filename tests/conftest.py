@@ -0,0 +1,29 @@
+import os
+import sys
+
+import pytest
+
+# 與 zlg_sdk 相同：專案根目錄與 zlg 資料夾 (zlgcan) 加入匯入路徑
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for path in (ROOT, os.path.join(ROOT, "zlg")):
+    if path not in sys.path: sys.path.insert(0, path)
+
+import zlgcan
+from zcan_sim import SimZCAN
+
+
+@pytest.fixture
+def sim_bus():
+    """一台模擬 USBCANFD-200U，兩個已啟動的通道互為對端；回傳 (zcanlib, ch0, ch1)。"""
+    def open_bus(can_type=0):
+        zcanlib = SimZCAN(seed=0)
+        dev = zcanlib.OpenDevice(zlgcan.ZCAN_USBCANFD_200U, 0, 0)
+        cfg = zlgcan.ZCAN_CHANNEL_INIT_CONFIG()
+        cfg.can_type = can_type
+        handles = [zcanlib.InitCAN(dev, i, cfg) for i in (0, 1)]
+        for h in handles: zcanlib.StartCAN(h)
+        opened.append((zcanlib, dev))
+        return (zcanlib, *handles)
+    opened = []
+    yield open_bus
+    for zcanlib, dev in opened: zcanlib.CloseDevice(dev)
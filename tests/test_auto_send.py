@@ -0,0 +1,116 @@
+import time
+
+import pytest
+
+import zlgcan
+from auto_send import AutoSendTable, AutoSendError
+from cyclic_tx import CyclicScheduler
+from device_manager import DeviceManager
+from zcan_sim import SimZCAN
+
+
+class RecordingSim(SimZCAN):
+    """記錄 ZCAN_SetValue 的屬性路徑；fail 內的屬性回傳失敗。"""
+    def __init__(self, **kw):
+        super().__init__(**kw)
+        self.calls, self.fail = [], set()
+
+    def ZCAN_SetValue(self, device_handle, path, value):
+        self.calls.append(path)
+        if path.partition("/")[2] in self.fail: return zlgcan.ZCAN_STATUS_ERR
+        return super().ZCAN_SetValue(device_handle, path, value)
+
+
+@pytest.fixture
+def bus():
+    zcanlib = RecordingSim(seed=0)
+    dev = zcanlib.OpenDevice(zlgcan.ZCAN_USBCANFD_200U, 0, 0)
+    cfg = zlgcan.ZCAN_CHANNEL_INIT_CONFIG()
+    cfg.can_type = 0
+    ch0, ch1 = (zcanlib.InitCAN(dev, i, cfg) for i in (0, 1))
+    zcanlib.StartCAN(ch0); zcanlib.StartCAN(ch1)
+    yield zcanlib, dev, ch0, ch1
+    zcanlib.CloseDevice(dev)
+
+
+def _received(zcanlib, chn, wait=0.08):
+    # 等硬體定時發送跑幾個週期後，讀出對端通道收到的 (ID, payload)
+    time.sleep(wait)
+    msgs, n = zcanlib.Receive(chn, 1000, 0)
+    return [(m.frame.can_id, bytes(m.frame.data[:m.frame.can_dlc])) for m in msgs[:n]]
+
+
+def test_program_slot_sends_from_hardware(bus):
+    zcanlib, dev, _, ch1 = bus
+    table = AutoSendTable(zcanlib, dev, 0, 0)
+    assert table.add("a", 0x123, b"\x01\x02", 0.010) == "HW"
+    assert table.stats()["a"] == {"mode": "HW", "slot": 0, "period_ms": 10.0, "delay_ms": 0}
+    frames = _received(zcanlib, ch1)
+    assert len(frames) >= 3 and set(frames) == {(0x123, b"\x01\x02")}
+    table.clear()
+
+
+def test_update_rewrites_payload_in_same_slot(bus):
+    zcanlib, dev, _, ch1 = bus
+    table = AutoSendTable(zcanlib, dev, 0, 0)
+    table.add("a", 0x123, b"\x01\x02", 0.010)
+    table.add("b", 0x124, b"\x00", 0.010)
+    table.update("a", b"\x05\x06\x07")
+    assert table.stats()["a"]["slot"] == 0 and table.stats()["b"]["slot"] == 1
+    _received(zcanlib, ch1, wait=0.02)  # 丟棄更新前已在匯流排上的報文
+    frames = _received(zcanlib, ch1)
+    assert (0x123, b"\x05\x06\x07") in frames and (0x123, b"\x01\x02") not in frames
+    # 內容不變時不再寫入設備
+    n = len(zcanlib.calls)
+    table.update("a", b"\x05\x06\x07")
+    assert len(zcanlib.calls) == n
+    table.clear()
+
+
+def test_falls_back_to_scheduler_when_slots_run_out(bus):
+    zcanlib, dev, ch0, ch1 = bus
+    sched = CyclicScheduler(zcanlib, ch0, 0)
+    sched.start()
+    try:
+        table = AutoSendTable(zcanlib, dev, 0, 0, slots=1, fallback=sched)
+        assert table.add("a", 0x100, b"\x01", 0.010) == "HW"
+        assert table.add("b", 0x200, b"\x02", 0.010) == "SW"
+        assert table.add("c", 0x300, b"\x03", 0.0105) == "SW"  # 非整數 ms 週期只能軟體排程
+        assert sched.keys() == ["b", "c"] and table.mode("b") == "SW"
+        table.update("b", b"\x22")
+        ids = {(i, p) for i, p in _received(zcanlib, ch1)}
+        assert {(0x100, b"\x01"), (0x200, b"\x22"), (0x300, b"\x03")} <= ids
+        # 槽位釋放後重新加入的任務改回硬體，並從軟體排程移除
+        table.remove("a")
+        assert table.add("b", 0x200, b"\x22", 0.010) == "HW" and sched.keys() == ["c"]
+        table.clear()
+        assert table.keys() == [] and sched.keys() == []
+    finally:
+        sched.stop()
+
+
+def test_failed_disable_keeps_slot_tracked(bus):
+    zcanlib, dev, _, _ = bus
+    table = AutoSendTable(zcanlib, dev, 0, 0)
+    table.add("a", 0x123, b"\x01", 0.010)
+    zcanlib.fail = {"apply_auto_send"}
+    with pytest.raises(AutoSendError):
+        table.remove("a")
+    assert table.mode("a") == "HW"
+    # clear 失敗時逐槽停用，恢復後可再次清除
+    zcanlib.fail = {"apply_auto_send", "clear_auto_send"}
+    table.clear()
+    assert table.keys() == ["a"]
+    zcanlib.fail = set()
+    table.clear()
+    assert table.keys() == []
+
+
+def test_close_clears_hardware_slots():
+    zcanlib = RecordingSim(seed=0)
+    mgr = DeviceManager(zcanlib)
+    assert mgr.open_channels("USBCANFD_200U", 0, [0], 0) == {}
+    link = next(iter(mgr.links.values()))
+    assert link.auto_send.add("a", 0x123, b"\x01", 0.010) == "HW"
+    mgr.close_all()
+    assert "0/clear_auto_send" in zcanlib.calls
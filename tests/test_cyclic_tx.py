@@ -0,0 +1,62 @@
+import time
+
+from cyclic_tx import CyclicScheduler
+from frame_store import FrameStore, DIR_TX, STATUS_OK
+
+
+class ManualClock:
+    """由測試推進的時鐘；排程器只透過它判斷截止時間。"""
+    def __init__(self, t=100.0):
+        self.t = t
+
+    def __call__(self):
+        return self.t
+
+
+def _wait_count(sched, key, count, timeout=2.0):
+    end = time.monotonic() + timeout
+    while time.monotonic() < end:
+        stats = sched.stats().get(key)
+        if stats is not None and stats["count"] >= count: return stats
+        time.sleep(0.001)
+    raise AssertionError(f"{key} 未在時限內送出 {count} 筆: {sched.stats()}")
+
+
+def _scheduler(sim_bus, clock, store=None):
+    zcanlib, ch0, _ = sim_bus()
+    sched = CyclicScheduler(zcanlib, ch0, 0, store=store, clock=clock)
+    sched.start()
+    return sched
+
+
+def test_late_fire_counts_skipped_periods(sim_bus):
+    clock, store = ManualClock(), FrameStore(100)
+    sched = _scheduler(sim_bus, clock, store)
+    try:
+        sched.add("a", 0x123, b"\x01\x02", 0.010)  # 加入時即到期
+        _wait_count(sched, "a", 1)
+        # 第二次到期 (t0 + 10 ms) 時排程器才在 t0 + 55.5 ms 醒來：錯過 t0 + 20/30/40/50 ms 四個週期，不補發
+        clock.t += 0.0555
+        stats = _wait_count(sched, "a", 2)
+        assert stats["overruns"] == 4 and stats["errors"] == 0
+        time.sleep(0.02)
+        assert sched.stats()["a"]["count"] == 2  # 時鐘未推進，下一個週期 (t0 + 60 ms) 尚未到期
+    finally:
+        sched.stop()
+    cols = store.read(0)[0]
+    assert cols["can_id"].tolist() == [0x123, 0x123]
+    assert (cols["direction"] == DIR_TX).all() and (cols["status"] == STATUS_OK).all()
+
+
+def test_on_time_fires_have_no_overruns(sim_bus):
+    clock = ManualClock()
+    sched = _scheduler(sim_bus, clock)
+    try:
+        sched.add("a", 0x123, b"\x01", 0.010)
+        for n in range(1, 6):
+            _wait_count(sched, "a", n)
+            clock.t += 0.010
+        stats = _wait_count(sched, "a", 6)
+        assert stats["overruns"] == 0 and stats["errors"] == 0
+    finally:
+        sched.stop()
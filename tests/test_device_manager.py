@@ -0,0 +1,34 @@
+import threading
+import time
+
+import numpy as np
+
+from device_manager import DeviceManager
+from frame_store import DIR_RX
+from zcan_sim import SimZCAN
+
+
+def test_concurrent_send_batch_keeps_frames_intact():
+    # 多個 session 同時對同一通道批次發送：每筆報文的 ID 與 payload 必須來自同一個呼叫端
+    mgr = DeviceManager(SimZCAN(seed=0, tx_fifo_s=10.0))
+    try:
+        assert mgr.open_channels("USBCANFD_200U", 0, [0, 1], 0) == {}
+        label = next(l for l, link in mgr.links.items() if link.chn_index == 0)
+        rounds, per_batch = 20, 150
+        def sender(k):
+            for _ in range(rounds): mgr.send_batch(label, [(0x100 + k, bytes([k] * 8))] * per_batch)
+        threads = [threading.Thread(target=sender, args=(k,)) for k in range(4)]
+        for t in threads: t.start()
+        for t in threads: t.join()
+        total = 4 * rounds * per_batch
+        end = time.monotonic() + 10.0
+        while time.monotonic() < end:
+            cols = mgr.store.read(0)[0]
+            rx = cols["direction"] == DIR_RX
+            if rx.sum() >= total: break
+            time.sleep(0.05)
+        assert rx.sum() == total
+        ids, data = cols["can_id"][rx], cols["data"][rx, :8]
+        assert (data == (ids - 0x100)[:, None]).all()
+    finally:
+        mgr.shutdown()
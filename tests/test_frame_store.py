@@ -0,0 +1,56 @@
+import numpy as np
+
+from frame_store import FrameStore, DIR_RX, DIR_TX, FLAG_EFF, STATUS_OK
+
+
+def _extend(store, ids, width=8, **kw):
+    ids = np.asarray(ids, dtype=np.uint32)
+    data = np.tile(np.arange(width, dtype=np.uint8), (len(ids), 1)) + ids[:, None].astype(np.uint8)
+    store.extend(kw.get("ts", 0.0), 0, ids, kw.get("direction", DIR_RX), width, kw.get("flags", 0), STATUS_OK, data)
+    return data
+
+
+def test_extend_wraps_and_reads_in_order():
+    store = FrameStore(capacity=5)
+    _extend(store, [1, 2, 3])
+    _extend(store, [4, 5, 6, 7])
+    cols, start, end = store.read(0)
+    assert (start, end) == (2, 7)
+    assert cols["can_id"].tolist() == [3, 4, 5, 6, 7]
+    assert store.overwritten == 2 and len(store) == 5
+    # since 為新到舊，且回報被覆寫而遺失的筆數
+    cols, cursor, lost = store.since(0)
+    assert cols["can_id"].tolist() == [7, 6, 5, 4, 3] and cursor == 7 and lost == 2
+
+
+def test_extend_larger_than_capacity_keeps_tail():
+    store = FrameStore(capacity=4)
+    _extend(store, np.arange(10))
+    cols, start, end = store.read(0)
+    assert (start, end) == (6, 10)
+    assert cols["can_id"].tolist() == [6, 7, 8, 9]
+
+
+def test_extend_scalars_and_narrow_data_are_zero_padded():
+    store = FrameStore(capacity=3)
+    store.append(0.0, 0x10, DIR_TX, bytes(range(64)))
+    store.append(0.0, 0x11, DIR_TX, bytes(range(64)))
+    _extend(store, [0x20, 0x21], width=2, flags=FLAG_EFF, direction=DIR_TX)
+    cols = store.read(0)[0]
+    assert cols["can_id"].tolist() == [0x11, 0x20, 0x21]
+    assert cols["flags"].tolist() == [0, FLAG_EFF, FLAG_EFF]
+    assert cols["direction"].tolist() == [DIR_TX] * 3
+    # 第一列覆寫了原本 64 位元組的報文，超出 2 位元組的部分需清為 0
+    assert cols["data"][1, :2].tolist() == [0x20, 0x21] and not cols["data"][1, 2:].any()
+
+
+def test_sinks_see_written_frames_in_seq_order():
+    store = FrameStore(capacity=4)
+    seen = []
+    store.add_sink(lambda cols: seen.extend(cols["can_id"].tolist()))
+    store.add_sink(lambda cols: 1 / 0)
+    _extend(store, np.arange(6))
+    store.append(0.0, 99, DIR_RX, b"\x01")
+    # 超出容量而略過的前段不送給 sink；sink 異常只計數，不影響寫入
+    assert seen == [2, 3, 4, 5, 99]
+    assert store.sink_errors == 2 and store.seq == 7
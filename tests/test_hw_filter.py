@@ -0,0 +1,75 @@
+import time
+
+import numpy as np
+import pytest
+
+from device_manager import DeviceManager
+from frame_store import DIR_RX, FLAG_EFF, FLAG_ERR
+from hw_filter import FILTER_STD, FILTER_EXT, plan_filters, plan_coverage, fit_plan, plan_mask
+from zcan_sim import SimZCAN
+
+
+def test_contiguous_ids_merge_into_one_range():
+    assert plan_filters([0x100, 0x101, 0x102, 0x200]) == [(FILTER_STD, 0x100, 0x102), (FILTER_STD, 0x200, 0x200)]
+
+
+def test_empty_plan():
+    assert plan_filters() == []
+
+
+def test_over_budget_keeps_largest_gaps():
+    # 3 槽時保留最大的兩個間隔 (0x10->0x100、0x100->0x400)，0x1->0x10 併入同一組
+    plan = plan_filters([0x1, 0x10, 0x100, 0x400], max_slots=3)
+    assert plan == [(FILTER_STD, 0x1, 0x10), (FILTER_STD, 0x100, 0x100), (FILTER_STD, 0x400, 0x400)]
+    assert plan_coverage(plan) == 0x10 + 1 + 1
+
+
+def test_std_and_ext_share_slots():
+    # 擴展幀的間隔 (0x10) 大於標準幀的 (2)，槽數不足時併入標準幀範圍
+    plan = plan_filters([0x1, 0x3, 0x5], [0x18FF0000, 0x18FF0010], max_slots=3)
+    assert plan == [(FILTER_STD, 0x1, 0x5), (FILTER_EXT, 0x18FF0000, 0x18FF0000), (FILTER_EXT, 0x18FF0010, 0x18FF0010)]
+    for mode, ids in ((FILTER_STD, [0x1, 0x3, 0x5]), (FILTER_EXT, [0x18FF0000, 0x18FF0010])):
+        assert all(any(m == mode and s <= i <= e for m, s, e in plan) for i in ids)
+
+
+def test_not_enough_slots():
+    with pytest.raises(ValueError):
+        plan_filters([0x1], [0x18FF0000], max_slots=1)
+
+
+def test_fit_plan_merges_existing_ranges():
+    plan = [(FILTER_STD, 0x1, 0x2), (FILTER_STD, 0x10, 0x12), (FILTER_STD, 0x400, 0x400), (FILTER_EXT, 0x18FF0000, 0x18FF0001)]
+    assert fit_plan(plan, 4) == plan
+    assert fit_plan(plan, 3) == [(FILTER_STD, 0x1, 0x12), (FILTER_STD, 0x400, 0x400), (FILTER_EXT, 0x18FF0000, 0x18FF0001)]
+    with pytest.raises(ValueError):
+        fit_plan(plan, 1)
+
+
+def test_plan_mask_matches_frame_type_and_passes_errors():
+    plan = [(FILTER_STD, 0x100, 0x1FF)]
+    can_id = np.array([0x100, 0x100, 0x200, 0x0], dtype=np.uint32)
+    flags = np.array([0, FLAG_EFF, 0, FLAG_ERR], dtype=np.uint8)
+    assert plan_mask(plan, can_id, flags, np.empty(4, np.bool_)).tolist() == [True, False, False, True]
+
+
+@pytest.mark.parametrize("merged", [False, True])
+@pytest.mark.parametrize("sim_slots, link_slots", [(None, 1), (1, None)])
+def test_falls_back_to_software_filter(merged, sim_slots, link_slots):
+    # link_slots=1：標準幀與擴展幀各需一組，槽數不足；sim_slots=1：設備實際組數少於預期，寫入失敗
+    mgr = DeviceManager(SimZCAN(seed=0, filter_slots=sim_slots))
+    try:
+        assert mgr.open_channels("USBCANFD_200U", 0, [0, 1], 0, merged, link_slots) == {}
+        rx_label, tx_label = (next(l for l, link in mgr.links.items() if link.chn_index == i) for i in (0, 1))
+        plan = plan_filters([0x100], [0x18FF0000])
+        assert mgr.set_filters(plan) == {}
+        link = mgr.links[rx_label]
+        assert link.filters == plan and link.hw_filters == []
+        for msg_id in (0x100, 0x200, 0x18FF0000, 0x18FF0001): mgr.send(tx_label, msg_id, bytes(8))
+        end = time.monotonic() + 2.0
+        while time.monotonic() < end and link.rx_stats.filtered < 2: time.sleep(0.02)
+        cols = mgr.store.read(0)[0]
+        rx = (cols["direction"] == DIR_RX) & (cols["chn"] == link.chn_id)
+        assert sorted(cols["can_id"][rx].tolist()) == [0x100, 0x18FF0000]
+        assert link.rx_stats.filtered == 2
+    finally:
+        mgr.shutdown()
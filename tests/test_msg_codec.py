@@ -0,0 +1,53 @@
+import cantools
+import pytest
+
+from msg_codec import MessageEncoder
+
+DBC = """VERSION ""
+
+BS_:
+
+BU_:
+
+BO_ 291 MsgA: 8 Vector__XXX
+ SG_ S1 : 8|8@1+ (1,0) [0|255] "" Vector__XXX
+ SG_ S0 : 0|8@1+ (1,0) [0|255] "" Vector__XXX
+ SG_ Flag : 19|1@1+ (1,0) [0|1] "" Vector__XXX
+ SG_ Wide : 20|20@1+ (1,0) [0|1048575] "" Vector__XXX
+
+BO_ 2566848770 MsgB: 16 Vector__XXX
+ SG_ Temp : 16|10@1- (0.5,0) [-256|255] "" Vector__XXX
+ SG_ Speed : 7|16@0+ (0.1,-10) [-10|6000] "" Vector__XXX
+ SG_ Gear : 39|3@0+ (1,0) [0|7] "" Vector__XXX
+"""
+
+
+@pytest.fixture(scope="module")
+def db():
+    return cantools.database.load_string(DBC, database_format="dbc")
+
+
+@pytest.mark.parametrize("name, steps", [
+    ("MsgA", [{"S0": 5}, {"S1": 255}, {"Wide": 123456, "Flag": 1}, {"S0": 0, "Wide": 1048575}]),
+    ("MsgB", [{"Speed": 100.0}, {"Temp": -12.5}, {"Gear": 5, "Speed": 5999.9}, {"Temp": 255.0}, {"Speed": -10.0}]),
+])
+def test_patch_encode_matches_cantools(db, name, steps):
+    m = db.get_message_by_name(name)
+    enc = MessageEncoder(m)
+    values = dict(enc.defaults)
+    assert enc.encode() == m.encode(values)
+    for step in steps:
+        values.update(step)
+        assert enc.encode(values) == m.encode(values), step
+    assert enc.full_encodes == 1 and enc.patch_encodes == len(steps)
+
+
+def test_unchanged_values_hit_cache_and_out_of_range_falls_back(db):
+    m = db.get_message_by_name("MsgA")
+    enc = MessageEncoder(m)
+    first = enc.encode({"S0": 1})
+    assert enc.encode({"S0": 1}) is first and enc.cache_hits == 1
+    # 超出 DBC 範圍的值不走位元改寫，交給 cantools (其會拋出例外)
+    with pytest.raises(Exception):
+        enc.encode({"S0": 300})
+    assert enc.patch_encodes == 0
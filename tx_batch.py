@@ -0,0 +1,107 @@
+import logging
+from ctypes import memmove, addressof, sizeof
+
+import numpy as np
+
+import zlgcan
+from frame_codec import TX_CAN_DTYPE, TX_CANFD_DTYPE
+from frame_store import FLAG_EFF, FLAG_RTR, FLAG_BRS
+
+logger = logging.getLogger("ZLG_CAN_TOOL")
+
+EFF_BIT, RTR_BIT = 1 << 31, 1 << 30
+
+
+def build_tx_frame(can_id, data, fd):
+    # 組出單筆 ctypes 發送結構，payload 以 memmove 一次複製
+    if fd:
+        obj = zlgcan.ZCAN_TransmitFD_Data()
+        obj.frame.len, obj.frame.brs = len(data), 1
+    else:
+        obj = zlgcan.ZCAN_Transmit_Data()
+        obj.frame.can_dlc = len(data)
+    obj.frame.can_id, obj.frame.eff = can_id, 1 if can_id > 0x7FF else 0
+    memmove(addressof(obj.frame.data), bytes(data), len(data))
+    return obj
+
+
+# --- 批次發送 ---
+# 預先配置 ZCAN_TransmitFD_Data * N 陣列並以 NumPy 檢視整批填寫，一次 DLL 呼叫送出整批；
+# SDK 回傳值即為該批實際被接受的報文數 (依序由第一筆算起)。
+class TxBatch:
+    def __init__(self, zcanlib, chn_handle, can_type, capacity=256):
+        self.zcanlib, self.chn_handle, self.fd, self.capacity = zcanlib, chn_handle, can_type == 1, capacity
+        ctype = zlgcan.ZCAN_TransmitFD_Data if self.fd else zlgcan.ZCAN_Transmit_Data
+        self._buf = (ctype * capacity)()
+        self._base, self._size = addressof(self._buf), sizeof(ctype)
+        self._view = np.frombuffer(self._buf, dtype=TX_CANFD_DTYPE if self.fd else TX_CAN_DTYPE)
+        self.count = 0
+        self.batches = self.submitted = self.accepted = 0
+
+    def __len__(self):
+        return self.count
+
+    @property
+    def full(self):
+        return self.count >= self.capacity
+
+    def add(self, can_id, data):
+        """加入一筆報文，回傳其在本批中的索引；批次已滿時回傳 None。"""
+        if self.count >= self.capacity: return None
+        i, n = self.count, len(data)
+        frame = self._buf[i].frame
+        frame.can_id, frame.err, frame.rtr, frame.eff = can_id, 0, 0, 1 if can_id > 0x7FF else 0
+        if self.fd: frame.len, frame.brs, frame.esi = n, 1, 0
+        else: frame.can_dlc = n
+        memmove(addressof(frame.data), bytes(data), n)
+        self.count += 1
+        return i
+
+    def add_frame(self, obj):
+        """直接複製一個預先組好的發送結構 (整個結構一次 memmove)。"""
+        if self.count >= self.capacity: return None
+        i = self.count
+        memmove(self._base + i * self._size, addressof(obj), self._size)
+        self.count += 1
+        return i
+
+    def pack(self, can_id, dlc, data, flags=None):
+        """以陣列整批填寫 (覆蓋目前內容)；data 為 (n, w) uint8，回傳實際填入筆數。
+
+        flags 為 FrameStore 旗標時依其設定 EFF/RTR 與 CANFD 的 BRS；省略時 ID > 0x7FF 視為擴展幀，CANFD 一律 BRS。
+        """
+        n = min(len(can_id), self.capacity)
+        can_id = np.asarray(can_id[:n], dtype=np.uint32)
+        frame = self._view["frame"][:n]
+        if flags is None:
+            frame["id_word"] = can_id | np.where(can_id > 0x7FF, EFF_BIT, 0).astype(np.uint32)
+            frame["pad"] = 1 if self.fd else 0
+        else:
+            flags = np.asarray(flags[:n], dtype=np.uint8)
+            frame["id_word"] = can_id | np.where(flags & FLAG_EFF, EFF_BIT, 0).astype(np.uint32) | np.where(flags & FLAG_RTR, RTR_BIT, 0).astype(np.uint32)
+            frame["pad"] = ((flags & FLAG_BRS) != 0) if self.fd else 0
+        frame["len"] = dlc[:n]
+        width = min(data.shape[1], frame["data"].shape[1])
+        frame["data"][:, :width] = data[:n, :width]
+        self._view["transmit_type"][:n] = 0
+        self.count = n
+        return n
+
+    def submit(self):
+        """送出目前批次並清空，回傳被接受的報文數。"""
+        n, self.count = self.count, 0
+        if n == 0: return 0
+        if self.fd: ret = self.zcanlib.TransmitFD(self.chn_handle, self._buf, n)
+        else: ret = self.zcanlib.Transmit(self.chn_handle, self._buf, n)
+        self.batches += 1; self.submitted += n; self.accepted += ret
+        if ret != n: logger.warning(f"批次發送僅接受 {ret}/{n} 筆 (handle={self.chn_handle})")
+        return ret
+
+    def send_arrays(self, can_id, dlc, data):
+        """將任意筆數切成多個批次送出，回傳每批的接受筆數。"""
+        accepted = []
+        for start in range(0, len(can_id), self.capacity):
+            end = start + self.capacity
+            self.pack(can_id[start:end], dlc[start:end], data[start:end])
+            accepted.append(self.submit())
+        return accepted
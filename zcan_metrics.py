@@ -0,0 +1,142 @@
+import json
+import time
+import threading
+from bisect import bisect_right
+
+import zlgcan
+
+# 延遲直方圖：1 µs 起每 1/4 個倍頻一格，涵蓋到約 16 s
+_EDGES = [1e-6 * 2 ** (i / 4) for i in range(97)]
+
+# 方法名稱 -> 回傳值判讀方式
+#   tx: (chn, msgs, len) -> 接受筆數     rx: (chn, n, wait) -> (msgs, 筆數)     count: 回傳筆數 (含 Receive*Into)
+#   status: ZCAN_STATUS_OK 以外為錯誤    handle: 0 為錯誤                      obj: None 為錯誤
+METHOD_KINDS = {
+    "Transmit": "tx", "TransmitFD": "tx", "TransmitData": "tx",
+    "Receive": "rx", "ReceiveFD": "rx", "ReceiveData": "rx",
+    "ReceiveInto": "count", "ReceiveFDInto": "count", "ReceiveDataInto": "count",
+    "GetReceiveNum": "count",
+    "StartCAN": "status", "ResetCAN": "status", "ClearBuffer": "status", "CloseDevice": "status", "ZCAN_SetValue": "status",
+    "OpenDevice": "handle", "InitCAN": "handle",
+    "GetDeviceInf": "obj", "ReadChannelErrInfo": "obj", "ReadChannelStatus": "obj", "ZCAN_GetValue": "obj",
+    "DeviceOnLine": "plain",
+}
+
+
+class CallStats:
+    __slots__ = ("count", "errors", "error_codes", "frames", "total_s", "max_s", "hist", "lock")
+
+    def __init__(self):
+        self.count = self.errors = self.frames = 0
+        self.total_s = self.max_s = 0.0
+        self.error_codes = {}
+        self.hist = [0] * (len(_EDGES) + 1)
+        self.lock = threading.Lock()
+
+    def percentile(self, q):
+        target, acc = q * self.count, 0
+        for i, c in enumerate(self.hist):
+            acc += c
+            if acc >= target and c:
+                return min(_EDGES[min(i, len(_EDGES) - 1)], self.max_s)
+        return self.max_s
+
+    def summary(self):
+        with self.lock:
+            n = self.count
+            return {"count": n, "errors": self.errors, "error_codes": dict(self.error_codes), "frames": self.frames,
+                    "frames_per_call": round(self.frames / n, 2) if n else 0.0,
+                    "mean_us": round(self.total_s / n * 1e6, 2) if n else 0.0,
+                    "p50_us": round(self.percentile(0.5) * 1e6, 2), "p99_us": round(self.percentile(0.99) * 1e6, 2),
+                    "max_us": round(self.max_s * 1e6, 2)}
+
+
+# --- SDK 呼叫量測代理 ---
+# 包住 zlgcan.ZCAN (或 SimZCAN)，依函式與第一個參數 (設備/通道 handle) 分別統計呼叫次數、錯誤回傳碼、
+# 延遲直方圖與每次呼叫的報文數。停用時直接把原始 bound method 設為實例屬性，呼叫路徑與未包裝時相同；
+# 執行緒每次呼叫都重新查找屬性，因此可在執行中切換。
+class InstrumentedZCAN:
+    def __init__(self, inner, enabled=False):
+        self._inner = inner
+        self._stats = {}
+        self._lock = threading.Lock()
+        self._t0 = time.time()
+        self.enabled = False
+        self.set_enabled(enabled)
+
+    def __getattr__(self, name):
+        # 未列入量測的方法 (含模擬後端的設定介面) 直接轉給原始物件
+        return getattr(self._inner, name)
+
+    def set_enabled(self, enabled):
+        for name, kind in METHOD_KINDS.items():
+            func = getattr(self._inner, name, None)
+            if func is None: continue
+            setattr(self, name, self._wrap(name, kind, func) if enabled else func)
+        self.enabled = enabled
+
+    def _get(self, name, handle):
+        key = (name, handle)
+        st = self._stats.get(key)
+        if st is None:
+            with self._lock: st = self._stats.setdefault(key, CallStats())
+        return st
+
+    def _wrap(self, name, kind, func):
+        clock, edges = time.perf_counter, _EDGES
+
+        def call(*args, **kwargs):
+            st = self._get(name, args[0] if args else None)
+            t0 = clock()
+            try:
+                ret = func(*args, **kwargs)
+            except Exception:
+                dt = clock() - t0
+                with st.lock:
+                    st.count += 1; st.errors += 1; st.total_s += dt
+                    st.error_codes["EXC"] = st.error_codes.get("EXC", 0) + 1
+                raise
+            dt = clock() - t0
+            frames, err = 0, None
+            if kind == "tx":
+                frames = ret
+                if len(args) > 2 and ret < args[2]: err = "SHORT" if ret else ret
+            elif kind == "rx": frames = ret[1]
+            elif kind == "count": frames = ret
+            elif kind == "status":
+                if ret != zlgcan.ZCAN_STATUS_OK: err = ret
+            elif kind == "handle":
+                if not ret: err = ret
+            elif kind == "obj":
+                if ret is None: err = "NONE"
+            with st.lock:
+                st.count += 1; st.frames += frames; st.total_s += dt
+                if dt > st.max_s: st.max_s = dt
+                st.hist[bisect_right(edges, dt)] += 1
+                if err is not None:
+                    st.errors += 1
+                    st.error_codes[err] = st.error_codes.get(err, 0) + 1
+            return ret
+        return call
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+            self._t0 = time.time()
+
+    def snapshot(self):
+        """回傳可序列化的統計快照，每個 (函式, handle) 一列。"""
+        with self._lock: items = sorted(self._stats.items(), key=lambda kv: (kv[0][0], str(kv[0][1])))
+        rows = []
+        for (name, handle), st in items:
+            row = {"func": name, "handle": handle if isinstance(handle, (int, type(None))) else str(handle)}
+            row.update(st.summary())
+            row["error_codes"] = {str(k): v for k, v in row["error_codes"].items()}
+            rows.append(row)
+        return {"enabled": self.enabled, "since": self._t0, "uptime_s": round(time.time() - self._t0, 3), "calls": rows}
+
+    def dump_json(self, path=None):
+        text = json.dumps(self.snapshot(), ensure_ascii=False, indent=2)
+        if path is not None:
+            with open(path, "w", encoding="utf-8") as f: f.write(text)
+        return text
@@ -0,0 +1,464 @@
+import time
+import threading
+from collections import deque
+from ctypes import c_char, c_void_p, cast
+
+import numpy as np
+
+import zlgcan
+from frame_codec import RX_CAN_DTYPE, RX_CANFD_DTYPE, TX_CAN_DTYPE, TX_CANFD_DTYPE, DATAOBJ_DTYPE, DT_CAN_CANFD, DATA_FRAME_FD, DATA_ECHO_REQUEST, DATA_ECHOED, TX_ECHO_FLAG
+from hw_filter import device_filter_slots
+
+ERR_BIT, EFF_BIT = 1 << 29, 1 << 31
+DEVICE_CHANNELS = {38: 1, 39: 2, 40: 4, 41: 2, 42: 1, 43: 1, 59: 8, 76: 4}  # 設備型號 -> 通道數，其餘預設 2
+
+
+def _value(v):
+    return v.value if hasattr(v, "value") else v
+
+
+def _frame_time(id_word, dlc, fd, brs, abit, dbit):
+    """向量化估算每筆報文佔用匯流排的秒數 (含約 10% 位元填充)。"""
+    eff = (id_word & EFF_BIT) != 0
+    dlc = dlc.astype(np.float64)
+    if not fd: return (np.where(eff, 67.0, 47.0) + 8 * dlc) * 1.1 / abit
+    arb = np.where(eff, 49.0, 30.0) / abit
+    data = (8 * dlc + np.where(dlc > 16, 25.0, 21.0)) * 1.1
+    return arb + data / (dbit if brs else abit)
+
+
+class _SimChannel:
+    def __init__(self, device, index, handle):
+        self.device, self.index, self.handle = device, index, handle
+        self.fd, self.started, self.start_t = True, False, 0.0
+        self.queue, self.count = deque(), 0      # 已到達、等待應用讀取的報文 (RX_CANFD_DTYPE 區塊)
+        self.inflight = deque()                  # (到達主機時間陣列, 報文區塊)：仍在匯流排上傳輸中
+        self.error_code = 0
+        self.rx_total = self.tx_total = self.dropped = 0
+        self.auto_active = {}                    # 槽號 -> [下次發送時間, 週期 s, 發送物件]
+        self.filters = None                      # 生效中的接收濾波 [(mode, start, end)]，None 為全部放行
+        self.filtered = 0
+
+
+class _SimDevice:
+    def __init__(self, dev_type, index, handle, skew_ppm):
+        self.dev_type, self.index, self.handle = dev_type, index, handle
+        self.t0, self.skew = time.perf_counter(), 1.0 + skew_ppm * 1e-6
+        self.channels = {}
+        self.config = {}
+
+    def dev_us(self, host_t):
+        # 設備時間戳：開機後的微秒數，晶振相對主機有固定偏差
+        return ((np.asarray(host_t) - self.t0) * 1e6 * self.skew).astype(np.uint64)
+
+
+class _Generator:
+    __slots__ = ("fps", "ids", "dlc", "fd", "error_rate", "t0", "sent", "load")
+
+
+# --- 模擬 ZCAN 後端 ---
+# 與 zlgcan.ZCAN 相同的方法介面，供無 zlgcan.dll 的 Linux 環境開發、量測與壓測使用。
+# 同一個實例內所有已啟動的通道共用一條虛擬匯流排：一個通道發送的報文依位元率計算傳輸時間後送達其餘通道；
+# 另可設定背景負載 (模擬匯流排上的其他節點)，以 NumPy 依經過時間一次產生整批報文，可達每秒數十萬筆。
+class SimZCAN:
+    def __init__(self, rx_capacity=1 << 18, tx_fifo_s=0.2, skew_ppm=35.0, seed=None, filter_slots=None):
+        self.rx_capacity, self.tx_fifo_s, self.skew_ppm = rx_capacity, tx_fifo_s, skew_ppm
+        self.filter_slots = filter_slots  # 每通道硬體濾波組數，None 依設備類型
+        self.abit, self.dbit = 500000, 2000000
+        self._devices, self._channels, self._gens = {}, {}, []
+        self._busy_until = 0.0
+        self._rng = np.random.default_rng(seed)
+        self._cond = threading.Condition()
+
+    # --- 模擬設定 (非 ZCAN 介面) ---
+    def set_bus_load(self, load=None, fps=None, ids=(0x100, 0x101, 0x18FF0102), dlc=8, fd=True, error_rate=0.0):
+        """設定背景負載；load 為匯流排佔用比例 (依位元率換算 fps)，或直接指定 fps。"""
+        g = _Generator()
+        g.ids = np.asarray(ids, dtype=np.uint32) | np.where(np.asarray(ids) > 0x7FF, EFF_BIT, 0).astype(np.uint32)
+        g.dlc, g.fd, g.error_rate = dlc, fd, error_rate
+        per_frame = float(_frame_time(g.ids[:1], np.array([dlc]), fd, fd, self.abit, self.dbit)[0])
+        g.fps = fps if fps is not None else (load or 0.0) / per_frame
+        g.load = min(0.95, g.fps * per_frame)
+        g.t0, g.sent = time.perf_counter(), 0
+        with self._cond:
+            self._gens = [g] if g.fps > 0 else []
+            self._cond.notify_all()
+
+    def clear_bus_load(self):
+        with self._cond: self._gens = []
+
+    def inject_error(self, chn_handle, error_code=zlgcan.ZCAN_ERROR_CAN_BUSERR):
+        with self._cond: self._channels[chn_handle].error_code |= error_code
+
+    def bus_stats(self):
+        with self._cond:
+            return {"load": sum(g.load for g in self._gens), "fps": sum(g.fps for g in self._gens),
+                    "channels": {h: {"rx": c.rx_total, "tx": c.tx_total, "queued": c.count, "dropped": c.dropped, "filtered": c.filtered} for h, c in self._channels.items()}}
+
+    # --- 設備與通道 ---
+    def OpenDevice(self, device_type, device_index, reserved):
+        dev_type, index = _value(device_type), _value(device_index)
+        with self._cond:
+            if any(d.dev_type == dev_type and d.index == index for d in self._devices.values()): return zlgcan.INVALID_DEVICE_HANDLE
+            handle = 0x1000 + len(self._devices) * 0x100 + index
+            self._devices[handle] = _SimDevice(dev_type, index, handle, self.skew_ppm)
+        return handle
+
+    def CloseDevice(self, device_handle):
+        with self._cond:
+            dev = self._devices.pop(device_handle, None)
+            if dev is None: return zlgcan.ZCAN_STATUS_ERR
+            for h in dev.channels.values(): self._channels.pop(h.handle, None)
+        return zlgcan.ZCAN_STATUS_OK
+
+    def GetDeviceInf(self, device_handle):
+        dev = self._devices.get(device_handle)
+        if dev is None: return None
+        info = zlgcan.ZCAN_DEVICE_INFO()
+        info.hw_Version, info.fw_Version, info.dr_Version, info.in_Version = 0x0100, 0x0100, 0x0100, 0x0100
+        info.can_Num = DEVICE_CHANNELS.get(dev.dev_type, 2)
+        for dst, text in ((info.str_Serial_Num, f"SIM{dev.handle:08X}"), (info.str_hw_Type, f"ZCAN-SIM ({dev.dev_type})")):
+            for i, ch in enumerate(text.encode()[:len(dst) - 1]): dst[i] = ch
+        return info
+
+    def DeviceOnLine(self, device_handle):
+        return zlgcan.ZCAN_STATUS_ONLINE if device_handle in self._devices else zlgcan.ZCAN_STATUS_OFFLINE
+
+    def InitCAN(self, device_handle, can_index, init_config):
+        with self._cond:
+            dev = self._devices.get(device_handle)
+            if dev is None or can_index >= DEVICE_CHANNELS.get(dev.dev_type, 2): return zlgcan.INVALID_CHANNEL_HANDLE
+            chn = dev.channels.get(can_index)
+            if chn is None:
+                chn = dev.channels[can_index] = _SimChannel(dev, can_index, (device_handle << 8) | (can_index + 1))
+                self._channels[chn.handle] = chn
+            chn.fd = init_config.can_type == 1
+        return chn.handle
+
+    def StartCAN(self, chn_handle):
+        with self._cond:
+            chn = self._channels.get(chn_handle)
+            if chn is None: return zlgcan.ZCAN_STATUS_ERR
+            chn.started, chn.start_t = True, time.perf_counter()
+        return zlgcan.ZCAN_STATUS_OK
+
+    def ResetCAN(self, chn_handle):
+        with self._cond:
+            chn = self._channels.get(chn_handle)
+            if chn is None: return zlgcan.ZCAN_STATUS_ERR
+            chn.started = False
+            chn.queue.clear(); chn.inflight.clear(); chn.count = 0
+        return zlgcan.ZCAN_STATUS_OK
+
+    def ClearBuffer(self, chn_handle):
+        with self._cond:
+            chn = self._channels[chn_handle]
+            chn.queue.clear(); chn.count = 0
+        return zlgcan.ZCAN_STATUS_OK
+
+    def ReadChannelErrInfo(self, chn_handle):
+        with self._cond:
+            chn = self._channels.get(chn_handle)
+            if chn is None: return None
+            info = zlgcan.ZCAN_CHANNEL_ERR_INFO()
+            info.error_code, chn.error_code = chn.error_code, 0
+        return info
+
+    def ReadChannelStatus(self, chn_handle):
+        return zlgcan.ZCAN_CHANNEL_STATUS() if chn_handle in self._channels else None
+
+    def GetReceiveNum(self, chn_handle, can_type=0):
+        with self._cond:
+            chn = self._channels.get(chn_handle)
+            if chn is None: return 0
+            self._pump(time.perf_counter())
+            return chn.count if (can_type == 1) == chn.fd else 0
+
+    # --- 收發 ---
+    def Transmit(self, chn_handle, std_msg, len):
+        return self._transmit(chn_handle, std_msg, len, False)
+
+    def TransmitFD(self, chn_handle, fd_msg, len):
+        return self._transmit(chn_handle, fd_msg, len, True)
+
+    def Receive(self, chn_handle, rcv_num, wait_time=-1):
+        msgs = (zlgcan.ZCAN_Receive_Data * rcv_num)()
+        return msgs, self._receive(chn_handle, msgs, rcv_num, wait_time, False)
+
+    def ReceiveFD(self, chn_handle, rcv_num, wait_time=-1):
+        msgs = (zlgcan.ZCAN_ReceiveFD_Data * rcv_num)()
+        return msgs, self._receive(chn_handle, msgs, rcv_num, wait_time, True)
+
+    def ReceiveInto(self, chn_handle, msgs, rcv_num, wait_time=-1):
+        return self._receive(chn_handle, msgs, rcv_num, wait_time, False)
+
+    def ReceiveFDInto(self, chn_handle, msgs, rcv_num, wait_time=-1):
+        return self._receive(chn_handle, msgs, rcv_num, wait_time, True)
+
+    def TransmitData(self, device_handle, msg, len):
+        # 依 chnl 分段送往各通道；txEchoRequest 的報文傳輸完成後回顯給發送通道
+        if len <= 0: return 0
+        raw = (c_char * (len * DATAOBJ_DTYPE.itemsize)).from_address(cast(msg, c_void_p).value)
+        obj = np.frombuffer(raw, dtype=DATAOBJ_DTYPE)
+        key = obj["chnl"].astype(np.uint32) << 16 | (obj["flag"] & (3 | DATA_ECHO_REQUEST))
+        cuts = np.flatnonzero(np.diff(key)) + 1
+        sent = 0
+        with self._cond:
+            dev = self._devices.get(device_handle)
+            if dev is None: return 0
+            now = time.perf_counter()
+            for lo, hi in zip(np.r_[0, cuts], np.r_[cuts, len]):
+                chn = dev.channels.get(int(obj["chnl"][lo]))
+                if chn is None or not chn.started: break
+                flag, frame = int(obj["flag"][lo]), obj["frame"][lo:hi]
+                k = self._bus_send(chn, frame["id_word"], frame["len"], frame["pad"], frame["data"], flag & 3 == DATA_FRAME_FD, now, echo=bool(flag & DATA_ECHO_REQUEST))
+                sent += k
+                if k < hi - lo: break
+            self._cond.notify_all()
+        return sent
+
+    def ReceiveData(self, device_handle, rcv_num, wait_time=-1):
+        msgs = (zlgcan.ZCANDataObj * rcv_num)()
+        return msgs, self._receive_data(device_handle, msgs, rcv_num, wait_time)
+
+    def ReceiveDataInto(self, device_handle, msgs, rcv_num, wait_time=-1):
+        return self._receive_data(device_handle, msgs, rcv_num, wait_time)
+
+    def _transmit(self, chn_handle, msgs, n, fd):
+        if n <= 0: return 0
+        dtype = TX_CANFD_DTYPE if fd else TX_CAN_DTYPE
+        raw = (c_char * (n * dtype.itemsize)).from_address(cast(msgs, c_void_p).value)  # 陣列或 byref(報文)
+        frame = np.frombuffer(raw, dtype=dtype)["frame"]
+        with self._cond:
+            chn = self._channels.get(chn_handle)
+            if chn is None or not chn.started: return 0
+            accepted = self._bus_send(chn, frame["id_word"], frame["len"], frame["pad"], frame["data"], fd, time.perf_counter())
+            self._cond.notify_all()
+        return accepted
+
+    def _bus_send(self, src, id_word, dlc, pad, data, fd, now, echo=False):
+        # 依位元率排入匯流排，超出發送 FIFO 深度的報文不被接受；送達時間到了才會出現在其他通道
+        free = 1.0 - min(0.95, sum(g.load for g in self._gens))
+        cfg = src.device.config.get(src.index, {})
+        dur = _frame_time(id_word, dlc, fd, fd, cfg.get("abit", self.abit), cfg.get("dbit", self.dbit)) / free
+        ends = max(now, self._busy_until) + np.cumsum(dur)
+        k = int(np.searchsorted(ends, now + self.tx_fifo_s, side="right"))
+        if k == 0: return 0
+        self._busy_until = float(ends[k - 1])
+        src.tx_total += k
+        rec = np.zeros(k, dtype=RX_CANFD_DTYPE)
+        f = rec["frame"]
+        f["id_word"], f["len"], f["pad"] = id_word[:k], dlc[:k], pad[:k] if fd else 0
+        f["data"][:, :data.shape[1]] = data[:k]
+        for chn in self._channels.values():
+            if chn is src or not chn.started: continue
+            r = rec.copy()
+            r["timestamp"] = chn.device.dev_us(ends[:k])
+            chn.inflight.append((ends[:k], r))
+        if echo or cfg.get("set_device_tx_echo") == "1":
+            # 發送回顯：傳輸完成時以設備時間戳送回發送通道，__pad 標記 TX_ECHO_FLAG
+            r = rec.copy()
+            r["frame"]["pad"] |= TX_ECHO_FLAG
+            r["timestamp"] = src.device.dev_us(ends[:k])
+            src.inflight.append((ends[:k], r))
+        return k
+
+    def _receive(self, chn_handle, msgs, rcv_num, wait_time, fd):
+        wait = _value(wait_time)
+        deadline = time.perf_counter() + (wait / 1000.0 if wait >= 0 else 1e9)
+        with self._cond:
+            chn = self._channels.get(chn_handle)
+            while True:
+                now = time.perf_counter()
+                self._pump(now)
+                if chn is None or chn.count or now >= deadline: break
+                self._cond.wait(min(deadline, self._next_event(chn, now)) - now)
+            if chn is None or not chn.count: return 0
+            rec = self._peek(chn, rcv_num)
+            self._discard(chn, len(rec))
+            dst = np.frombuffer(msgs, dtype=RX_CANFD_DTYPE if fd else RX_CAN_DTYPE, count=len(rec))
+            if fd: dst[:] = rec
+            else:
+                dst["timestamp"] = rec["timestamp"]
+                dst["frame"]["id_word"] = rec["frame"]["id_word"]
+                dst["frame"]["len"] = np.minimum(rec["frame"]["len"], 8)
+                dst["frame"]["pad"] = rec["frame"]["pad"] & TX_ECHO_FLAG  # 緩衝區可能重複使用，未填的欄位需清除
+                dst["frame"]["res0"] = dst["frame"]["res1"] = 0
+                dst["frame"]["data"] = rec["frame"]["data"][:, :8]
+        return len(rec)
+
+    def _receive_data(self, device_handle, msgs, rcv_num, wait_time):
+        # 設備內所有通道的報文依設備時間戳合併，一次取回最早的 rcv_num 筆
+        wait = _value(wait_time)
+        deadline = time.perf_counter() + (wait / 1000.0 if wait >= 0 else 1e9)
+        with self._cond:
+            dev = self._devices.get(device_handle)
+            while True:
+                now = time.perf_counter()
+                self._pump(now)
+                ready = [c for c in dev.channels.values() if c.count] if dev is not None else []
+                if dev is None or ready or now >= deadline: break
+                nxt = min((self._next_event(c, now) for c in dev.channels.values()), default=now + 0.05)
+                self._cond.wait(min(deadline, nxt) - now)
+            if not ready: return 0
+            parts = [self._peek(c, rcv_num) for c in ready]
+            owner = np.repeat(np.arange(len(ready)), [len(p) for p in parts])
+            rec = np.concatenate(parts)
+            order = np.argsort(rec["timestamp"], kind="stable")[:rcv_num]
+            for c, k in zip(ready, np.bincount(owner[order], minlength=len(ready))): self._discard(c, int(k))
+            rec, owner = rec[order], owner[order]
+        fd = np.array([c.fd for c in ready])[owner]
+        pad = rec["frame"]["pad"]
+        dst = np.frombuffer(msgs, dtype=DATAOBJ_DTYPE, count=len(rec))
+        dst["data_type"], dst["obj_flag"] = DT_CAN_CANFD, 0
+        dst["chnl"] = np.array([c.index for c in ready], dtype=np.uint8)[owner]
+        dst["timestamp"] = rec["timestamp"]
+        dst["flag"] = np.where(fd, DATA_FRAME_FD, 0) | np.where(pad & TX_ECHO_FLAG, DATA_ECHOED, 0)
+        dst["frame"] = rec["frame"]
+        dst["frame"]["pad"] = np.where(fd, pad & (0xFF ^ TX_ECHO_FLAG), 0)
+        dst["frame"]["len"] = np.where(fd, rec["frame"]["len"], np.minimum(rec["frame"]["len"], 8))
+        return len(rec)
+
+    def _peek(self, chn, n):
+        # 接收佇列最前面的最多 n 筆 (不移除)
+        parts, got = [], 0
+        for block in chn.queue:
+            parts.append(block[:n - got]); got += len(parts[-1])
+            if got >= n: break
+        return parts[0] if len(parts) == 1 else np.concatenate(parts)
+
+    def _discard(self, chn, k):
+        chn.count -= k
+        while k:
+            block = chn.queue[0]
+            if k >= len(block): chn.queue.popleft(); k -= len(block)
+            else: chn.queue[0] = block[k:]; k = 0
+
+    def _next_event(self, chn, now):
+        t = now + 0.05
+        for g in self._gens: t = min(t, g.t0 + (g.sent + 1) / g.fps)
+        if chn.inflight: t = min(t, float(chn.inflight[0][0][0]))
+        for slot in chn.auto_active.values(): t = min(t, slot[0])
+        return max(t, now + 1e-4)
+
+    def _pump(self, now):
+        # 依經過時間補上背景負載與硬體定時發送，並把已傳輸完成的報文移入各通道接收佇列
+        for chn in list(self._channels.values()):
+            for slot in chn.auto_active.values():
+                due, interval, obj = slot
+                if due > now: continue
+                k = min(int((now - due) // interval) + 1, 10000)
+                frame = obj.obj.frame
+                fd = chn.fd
+                n = frame.len if fd else frame.can_dlc
+                id_word = np.full(k, frame.can_id | (EFF_BIT if frame.eff else 0), dtype=np.uint32)
+                data = np.tile(np.frombuffer(bytes(frame.data), dtype=np.uint8)[:64], (k, 1))
+                self._bus_send(chn, id_word, np.full(k, n, dtype=np.uint8), np.full(k, 1 if fd else 0, dtype=np.uint8), data, fd, due)
+                slot[0] = due + k * interval
+        channels = [c for c in self._channels.values() if c.started]
+        for g in self._gens:
+            total = int((now - g.t0) * g.fps)
+            k = min(total - g.sent, self.rx_capacity)
+            if k <= 0: continue
+            idx = g.sent + np.arange(k)
+            host_t = g.t0 + (idx + 1) / g.fps
+            g.sent = total
+            rec = np.zeros(k, dtype=RX_CANFD_DTYPE)
+            f = rec["frame"]
+            f["id_word"], f["len"], f["pad"] = g.ids[idx % len(g.ids)], g.dlc, 1 if g.fd else 0
+            f["data"][:, :8] = idx.astype("<u8").view(np.uint8).reshape(k, 8)
+            errs = self._rng.random(k) < g.error_rate if g.error_rate else None
+            if errs is not None and errs.any():
+                f["id_word"][errs] |= ERR_BIT; f["len"][errs] = 0
+            for chn in channels:
+                # 通道啟動前產生的報文不送達 (背景負載可能早於 OpenDevice 設定，設備時間戳不可為負)
+                if host_t[0] >= chn.start_t: r, t = rec.copy(), host_t
+                else: sel = host_t >= chn.start_t; r, t = rec[sel], host_t[sel]
+                r["timestamp"] = chn.device.dev_us(t)
+                self._deliver(chn, r)
+                if errs is not None and errs.any(): chn.error_code |= zlgcan.ZCAN_ERROR_CAN_BUSERR
+        for chn in channels:
+            while chn.inflight and chn.inflight[0][0][0] <= now:
+                ends, r = chn.inflight.popleft()
+                k = int(np.searchsorted(ends, now, side="right"))
+                if k < len(r): chn.inflight.appendleft((ends[k:], r[k:]))
+                self._deliver(chn, r[:k])
+
+    def _deliver(self, chn, rec):
+        if chn.filters is not None and len(rec):
+            # 硬體驗收濾波：ID 落在任一同類型 (標準/擴展) 範圍內才放行，錯誤幀不受影響
+            id_word = rec["frame"]["id_word"]
+            can_id, eff = id_word & 0x1FFFFFFF, (id_word & EFF_BIT) != 0
+            keep = ((id_word & ERR_BIT) != 0) | ((rec["frame"]["pad"] & TX_ECHO_FLAG) != 0)  # 錯誤幀與發送回顯不經濾波
+            for mode, start, end in chn.filters: keep |= (eff == (mode == 1)) & (can_id >= start) & (can_id <= end)
+            chn.filtered += int(len(rec) - keep.sum())
+            rec = rec[keep]
+        room = self.rx_capacity - chn.count
+        if len(rec) > room:
+            chn.dropped += len(rec) - room
+            chn.error_code |= zlgcan.ZCAN_ERROR_CAN_BUFFER_OVERFLOW
+            rec = rec[:room]
+        if len(rec):
+            chn.queue.append(rec); chn.count += len(rec); chn.rx_total += len(rec)
+
+    # --- 屬性設定 ---
+    def ZCAN_SetValue(self, device_handle, path, value):
+        with self._cond:
+            dev = self._devices.get(device_handle)
+            if dev is None: return zlgcan.ZCAN_STATUS_ERR
+            chn_str, _, prop = path.partition("/")
+            idx = int(chn_str) if chn_str.isdigit() else 0
+            cfg = dev.config.setdefault(idx, {})
+            obj = getattr(value, "_obj", None)
+            text = value.decode("utf-8") if isinstance(value, bytes) else None
+            chn = dev.channels.get(idx)
+            if prop in ("canfd_abit_baud_rate", "baud_rate"): cfg["abit"] = int(text)
+            elif prop == "canfd_dbit_baud_rate": cfg["dbit"] = int(text)
+            elif prop in ("auto_send", "auto_send_canfd") and obj is not None:
+                copy = type(obj).from_buffer_copy(obj)
+                cfg.setdefault("auto", {})[copy.index] = copy
+            elif prop == "auto_send_param" and obj is not None:
+                cfg.setdefault("auto_delay", {})[obj.indix] = obj.value / 1000.0
+            elif prop == "apply_auto_send" and chn is not None:
+                now = time.perf_counter()
+                for index, o in cfg.get("auto", {}).items():
+                    if not o.enable or o.interval == 0: chn.auto_active.pop(index, None); continue
+                    prev = chn.auto_active.get(index)
+                    due = prev[0] if prev is not None and prev[1] == o.interval / 1000.0 else now + cfg.get("auto_delay", {}).get(index, 0.0)
+                    chn.auto_active[index] = [due, o.interval / 1000.0, o]
+                self._cond.notify_all()
+            elif prop == "filter_clear": cfg["filters"] = []
+            elif prop == "filter_mode": cfg["filter_mode"] = int(text)
+            elif prop == "filter_start": cfg["filter_start"] = int(text, 0)
+            elif prop == "filter_end":
+                slots = self.filter_slots if self.filter_slots is not None else device_filter_slots(dev.dev_type)
+                if len(cfg.setdefault("filters", [])) >= slots: return zlgcan.ZCAN_STATUS_ERR
+                cfg["filters"].append((cfg.get("filter_mode", 0), cfg.get("filter_start", 0), int(text, 0)))
+            elif prop == "filter_ack" and chn is not None:
+                chn.filters = list(cfg.get("filters", [])) or None
+            elif prop == "clear_auto_send":
+                cfg.pop("auto", None); cfg.pop("auto_delay", None)
+                if chn is not None: chn.auto_active.clear()
+            else: cfg[prop] = text
+        return zlgcan.ZCAN_STATUS_OK
+
+    def ZCAN_GetValue(self, device_handle, path):
+        dev = self._devices.get(device_handle)
+        if dev is None: return None
+        chn_str, _, prop = path.partition("/")
+        if prop.startswith("get_cn"): return dev.config.get(int(chn_str), {}).get("set_cn", "").encode("utf-8")
+        return str(dev.config.get(int(chn_str) if chn_str.isdigit() else 0, {}).get(prop, "")).encode("utf-8")
+
+    def GetIProperty(self, device_handle):
+        return device_handle
+
+    def SetValue(self, iproperty, path, value):
+        return self.ZCAN_SetValue(iproperty, path, value.encode("utf-8") if isinstance(value, str) else value)
+
+    SetValue1 = SetValue
+
+    def GetValue(self, iproperty, path):
+        return self.ZCAN_GetValue(iproperty, path)
+
+    def ReleaseIProperty(self, iproperty):
+        return zlgcan.ZCAN_STATUS_OK
@@ -13,10 +13,6 @@
 #
 from ctypes import *
 import platform
-import threading
-
-import os
-import time
 
 
 
@@ -118,6 +114,17 @@ ZCAN_STATUS_ONLINE      = 2
 ZCAN_STATUS_OFFLINE     = 3
 ZCAN_STATUS_UNSUPPORTED = 4
 
+'''
+ CAN error code (ZCAN_CHANNEL_ERR_INFO.error_code)
+'''
+ZCAN_ERROR_CAN_OVERFLOW        = 0x0001
+ZCAN_ERROR_CAN_ERRALARM        = 0x0002
+ZCAN_ERROR_CAN_PASSIVE         = 0x0004
+ZCAN_ERROR_CAN_LOSE            = 0x0008
+ZCAN_ERROR_CAN_BUSERR          = 0x0010
+ZCAN_ERROR_CAN_BUSOFF          = 0x0020
+ZCAN_ERROR_CAN_BUFFER_OVERFLOW = 0x0040
+
 '''
  CAN type
 '''
@@ -329,230 +336,156 @@ class IProperty(Structure):
 
 
 
+class ZCANError(Exception):
+    """SDK 載入失敗、缺少入口點或通道啟動失敗。"""
+
+
+# 入口點 -> (restype, argtypes)，載入時一次設定完成
+_SIGNATURES = {
+    "ZCAN_OpenDevice":         (c_void_p, [c_uint, c_uint, c_uint]),
+    "ZCAN_CloseDevice":        (c_uint,   [c_void_p]),
+    "ZCAN_GetDeviceInf":       (c_uint,   [c_void_p, POINTER(ZCAN_DEVICE_INFO)]),
+    "ZCAN_IsDeviceOnLine":     (c_uint,   [c_void_p]),
+    "ZCAN_InitCAN":            (c_void_p, [c_void_p, c_uint, POINTER(ZCAN_CHANNEL_INIT_CONFIG)]),
+    "ZCAN_StartCAN":           (c_uint,   [c_void_p]),
+    "ZCAN_ResetCAN":           (c_uint,   [c_void_p]),
+    "ZCAN_ClearBuffer":        (c_uint,   [c_void_p]),
+    "ZCAN_ReadChannelErrInfo": (c_uint,   [c_void_p, POINTER(ZCAN_CHANNEL_ERR_INFO)]),
+    "ZCAN_ReadChannelStatus":  (c_uint,   [c_void_p, POINTER(ZCAN_CHANNEL_STATUS)]),
+    "ZCAN_GetReceiveNum":      (c_uint,   [c_void_p, c_uint]),
+    # 收發熱路徑：緩衝區以 c_void_p 接受報文陣列或 byref(報文)，handle 與控制路徑同為完整寬度的 c_void_p
+    "ZCAN_Transmit":           (c_uint,   [c_void_p, c_void_p, c_uint]),
+    "ZCAN_TransmitFD":         (c_uint,   [c_void_p, c_void_p, c_uint]),
+    "ZCAN_TransmitData":       (c_uint,   [c_void_p, c_void_p, c_uint]),
+    "ZCAN_Receive":            (c_uint,   [c_void_p, c_void_p, c_uint, c_int]),
+    "ZCAN_ReceiveFD":          (c_uint,   [c_void_p, c_void_p, c_uint, c_int]),
+    "ZCAN_ReceiveData":        (c_uint,   [c_void_p, c_void_p, c_uint, c_int]),
+    "ZCAN_SetValue":           (c_uint,   [c_void_p, c_char_p, c_void_p]),
+    "ZCAN_GetValue":           (c_void_p, [c_void_p, c_char_p]),
+    "GetIProperty":            (POINTER(IProperty), [c_void_p]),
+    "ReleaseIProperty":        (c_uint,   [POINTER(IProperty)]),
+}
+
+_PROPERTY_SET = CFUNCTYPE(c_uint, c_char_p, c_char_p)
+_PROPERTY_SET_PTR = CFUNCTYPE(c_uint, c_char_p, c_void_p)
+_PROPERTY_GET = CFUNCTYPE(c_char_p, c_char_p)
+
+
+def _missing(name):
+    def call(*args):
+        raise ZCANError("SDK 缺少入口點 %s" % name)
+    return call
+
+
+# --- 預先綁定的 SDK 介面 ---
+# 載入時解析每個入口點並設定 restype/argtypes；參數與回傳值可直接對應的呼叫 (Transmit*/StartCAN 等)
+# 以 ctypes 函式指標設為實例屬性，呼叫時沒有任何 Python 層的包裝；Receive* 只保留配置接收陣列的一層。
+# 錯誤以 ZCANError (載入/缺少入口點)、ctypes.ArgumentError (參數型別) 或 SDK 狀態碼回報，不再輸出到 stdout。
 class ZCAN(object):
-    def __init__(self):
-        if platform.system() == "Windows":
-            current_path = os.getcwd()
-            print("Current working directory:", current_path)
-            self.__dll = windll.LoadLibrary("./zlgcan.dll")
-        else:
-            print("No support now!")
-        if self.__dll == None:
-            print("DLL couldn't be loaded!")
-
-    def OpenDevice(self, device_type, device_index, reserved):
+    def __init__(self, dll_path=None):
         try:
-            return self.__dll.ZCAN_OpenDevice(device_type, device_index, reserved)
-        except:
-            print("Exception on OpenDevice!") 
-            raise
+            if platform.system() == "Windows": dll = WinDLL(dll_path or "./zlgcan.dll")
+            else: dll = CDLL(dll_path or "./libzlgcan.so")
+        except OSError as e:
+            raise ZCANError("無法載入 ZLG SDK: %s" % e)
+        self._fn = {}
+        for name, (restype, argtypes) in _SIGNATURES.items():
+            try: func = getattr(dll, name)
+            except AttributeError:
+                self._fn[name] = _missing(name); continue
+            func.restype, func.argtypes = restype, argtypes
+            self._fn[name] = func
+        self._arrays = {}  # (結構, 筆數) -> 陣列型別
+        fn = self._fn
+        self.CloseDevice = fn["ZCAN_CloseDevice"]
+        self.DeviceOnLine = fn["ZCAN_IsDeviceOnLine"]
+        self.StartCAN = fn["ZCAN_StartCAN"]
+        self.ResetCAN = fn["ZCAN_ResetCAN"]
+        self.ClearBuffer = fn["ZCAN_ClearBuffer"]
+        self.Transmit = fn["ZCAN_Transmit"]
+        self.TransmitFD = fn["ZCAN_TransmitFD"]
+        self.TransmitData = fn["ZCAN_TransmitData"]
+        self.ReleaseIProperty = fn["ReleaseIProperty"]
+        # (handle, 呼叫端預先配置的陣列, 筆數, 等待 ms) -> 讀到的筆數；搭配 rx_buffer 重複使用緩衝區
+        self.ReceiveInto = self._receive = fn["ZCAN_Receive"]
+        self.ReceiveFDInto = self._receive_fd = fn["ZCAN_ReceiveFD"]
+        self.ReceiveDataInto = self._receive_data = fn["ZCAN_ReceiveData"]
 
-    def CloseDevice(self, device_handle):
-        try:
-            return self.__dll.ZCAN_CloseDevice(device_handle)
-        except:
-            print("Exception on CloseDevice!")
-            raise
+    def OpenDevice(self, device_type, device_index, reserved):
+        return self._fn["ZCAN_OpenDevice"](device_type, device_index, reserved) or INVALID_DEVICE_HANDLE
 
     def GetDeviceInf(self, device_handle):
-        try:
-            info = ZCAN_DEVICE_INFO()
-            ret = self.__dll.ZCAN_GetDeviceInf(device_handle, byref(info))
-            return info if ret == ZCAN_STATUS_OK else None
-        except:
-            print("Exception on ZCAN_GetDeviceInf")
-            raise
-
-    def DeviceOnLine(self, device_handle):
-        try:
-            return self.__dll.ZCAN_IsDeviceOnLine(device_handle)
-        except:
-            print("Exception on ZCAN_ZCAN_IsDeviceOnLine!")
-            raise
+        info = ZCAN_DEVICE_INFO()
+        ret = self._fn["ZCAN_GetDeviceInf"](device_handle, info)
+        return info if ret == ZCAN_STATUS_OK else None
 
     def InitCAN(self, device_handle, can_index, init_config):
-        try:
-            return self.__dll.ZCAN_InitCAN(device_handle, can_index, byref(init_config))
-        except:
-            print("Exception on ZCAN_InitCAN!")
-            raise
-
-    def StartCAN(self, chn_handle):
-        try:
-            return self.__dll.ZCAN_StartCAN(chn_handle)
-        except:
-            print("Exception on ZCAN_StartCAN!")
-            raise
-
-    def ResetCAN(self, chn_handle):
-        try:
-            return self.__dll.ZCAN_ResetCAN(chn_handle)
-        except:
-            print("Exception on ZCAN_ResetCAN!")
-            raise
-
-    def ClearBuffer(self, chn_handle):
-        try:
-            return self.__dll.ZCAN_ClearBuffer(chn_handle)
-        except:
-            print("Exception on ZCAN_ClearBuffer!")
-            raise
+        return self._fn["ZCAN_InitCAN"](device_handle, can_index, init_config) or INVALID_CHANNEL_HANDLE
 
     def ReadChannelErrInfo(self, chn_handle):
-        try:
-            ErrInfo = ZCAN_CHANNEL_ERR_INFO()
-            ret = self.__dll.ZCAN_ReadChannelErrInfo(chn_handle, byref(ErrInfo))
-            return ErrInfo if ret == ZCAN_STATUS_OK else None
-        except:
-            print("Exception on ZCAN_ReadChannelErrInfo!")
-            raise
+        err_info = ZCAN_CHANNEL_ERR_INFO()
+        ret = self._fn["ZCAN_ReadChannelErrInfo"](chn_handle, err_info)
+        return err_info if ret == ZCAN_STATUS_OK else None
 
     def ReadChannelStatus(self, chn_handle):
-        try:
-            status = ZCAN_CHANNEL_STATUS()
-            ret = self.__dll.ZCAN_ReadChannelStatus(chn_handle, byref(status))
-            return status if ret == ZCAN_STATUS_OK else None
-        except:
-            print("Exception on ZCAN_ReadChannelStatus!")
-            raise
+        status = ZCAN_CHANNEL_STATUS()
+        ret = self._fn["ZCAN_ReadChannelStatus"](chn_handle, status)
+        return status if ret == ZCAN_STATUS_OK else None
 
     def GetReceiveNum(self, chn_handle, can_type = ZCAN_TYPE_CAN):
-        try:
-            return self.__dll.ZCAN_GetReceiveNum(chn_handle, can_type)
-        except:
-            print("Exception on ZCAN_GetReceiveNum!")
-            raise
+        return self._fn["ZCAN_GetReceiveNum"](chn_handle, can_type)
 
-    def Transmit(self, chn_handle, std_msg, len):
-        try:
-            return self.__dll.ZCAN_Transmit(chn_handle, byref(std_msg), len)
-        except:
-            print("Exception on ZCAN_Transmit!")
-            raise
+    def _array(self, ctype, n):
+        t = self._arrays.get((ctype, n))
+        if t is None: t = self._arrays[(ctype, n)] = ctype * n
+        return t()
 
-    def Receive(self, chn_handle, rcv_num, wait_time = c_int(-1)):
-        try:
-            rcv_can_msgs = (ZCAN_Receive_Data * rcv_num)()
-            ret = self.__dll.ZCAN_Receive(chn_handle, byref(rcv_can_msgs), rcv_num, wait_time)
-            return rcv_can_msgs, ret
-        except:
-            print("Exception on ZCAN_Receive!")
-            raise
-    
-    def TransmitFD(self, chn_handle, fd_msg, len):
-        try:
-            return self.__dll.ZCAN_TransmitFD(chn_handle, byref(fd_msg), len)
-        except:
-            print("Exception on ZCAN_TransmitFD!")
-            raise
-    
-            
-    def TransmitData(self,device_handle,msg,len):
-        try:
-            return self.__dll.ZCAN_TransmitData(device_handle,byref(msg),len)
-        except:
-            print("Exception on ZCAN_TransmitData!")
-            raise
-    def ReceiveFD(self, chn_handle, rcv_num, wait_time = c_int(-1)):
-        try:
-            rcv_canfd_msgs = (ZCAN_ReceiveFD_Data * rcv_num)()
-            ret = self.__dll.ZCAN_ReceiveFD(chn_handle, byref(rcv_canfd_msgs), rcv_num, wait_time)
-            return rcv_canfd_msgs, ret
-        except:
-            print("Exception on ZCAN_ReceiveF D!")
-            raise
-
-    def ReceiveData(self,device_handle,rcv_num,wait_time = c_int(-1)):
-        try:
-            rcv_can_data_msgs = (ZCANDataObj * rcv_num)()
-            ret = self.__dll.ZCAN_ReceiveData(device_handle , rcv_can_data_msgs, rcv_num,wait_time)
-            return  rcv_can_data_msgs ,ret
-        except:
-            print("Exception on ZCAN_ReceiveData!")
-            raise
+    def Receive(self, chn_handle, rcv_num, wait_time = -1):
+        rcv_can_msgs = self._array(ZCAN_Receive_Data, rcv_num)
+        return rcv_can_msgs, self._receive(chn_handle, rcv_can_msgs, rcv_num, wait_time)
+
+    def ReceiveFD(self, chn_handle, rcv_num, wait_time = -1):
+        rcv_canfd_msgs = self._array(ZCAN_ReceiveFD_Data, rcv_num)
+        return rcv_canfd_msgs, self._receive_fd(chn_handle, rcv_canfd_msgs, rcv_num, wait_time)
 
+    def ReceiveData(self, device_handle, rcv_num, wait_time = -1):
+        rcv_can_data_msgs = self._array(ZCANDataObj, rcv_num)
+        return rcv_can_data_msgs, self._receive_data(device_handle, rcv_can_data_msgs, rcv_num, wait_time)
 
     def GetIProperty(self, device_handle):
-        try:
-            self.__dll.GetIProperty.restype = POINTER(IProperty)
-            return self.__dll.GetIProperty(device_handle)
-        except:
-            print("Exception on ZCAN_GetIProperty!")
-            raise
+        return self._fn["GetIProperty"](device_handle)
 
     def SetValue(self, iproperty, path, value):
-        try:
-            func = CFUNCTYPE(c_uint, c_char_p, c_char_p)(iproperty.contents.SetValue)
-            return func(c_char_p(path.encode("utf-8")), c_char_p(value.encode("utf-8")))
-        except:
-            print("Exception on IProperty SetValue")
-            raise
-            
-    def SetValue1(self, iproperty, path, value):                                              #############################
-        try:
-            func = CFUNCTYPE(c_uint, c_char_p, c_char_p)(iproperty.contents.SetValue)
-            return func(c_char_p(path.encode("utf-8")), c_void_p(value))
-        except:
-            print("Exception on IProperty SetValue")
-            raise
-            
+        return _PROPERTY_SET(iproperty.contents.SetValue)(path.encode("utf-8"), value.encode("utf-8"))
+
+    def SetValue1(self, iproperty, path, value):
+        return _PROPERTY_SET_PTR(iproperty.contents.SetValue)(path.encode("utf-8"), value)
 
     def GetValue(self, iproperty, path):
-        try:
-            func = CFUNCTYPE(c_char_p, c_char_p)(iproperty.contents.GetValue)
-            return func(c_char_p(path.encode("utf-8")))
-        except:
-            print("Exception on IProperty GetValue")
-            raise
+        return _PROPERTY_GET(iproperty.contents.GetValue)(path.encode("utf-8"))
+
+    def ZCAN_SetValue(self, device_handle, path, value):
+        return self._fn["ZCAN_SetValue"](device_handle, path.encode("utf-8"), value)
+
+    def ZCAN_GetValue(self, device_handle, path):
+        return self._fn["ZCAN_GetValue"](device_handle, path.encode("utf-8"))
 
-    def ReleaseIProperty(self, iproperty):
-        try:
-            return self.__dll.ReleaseIProperty(iproperty)
-        except:
-            print("Exception on ZCAN_ReleaseIProperty!")
-            raise
-        
-    def ZCAN_SetValue(self,device_handle,path,value):
-        try:
-            self.__dll.ZCAN_SetValue.argtypes=[c_void_p,c_char_p,c_void_p]
-            return self.__dll.ZCAN_SetValue(device_handle,path.encode("utf-8"),value)
-        except:
-            print("Exception on ZCAN_SetValue")
-            raise
-    
-    def ZCAN_GetValue(self,device_handle,path):
-        try:
-            self.__dll.ZCAN_GetValue.argtypes =[c_void_p,c_char_p]
-            self.__dll.ZCAN_GetValue.restype =c_void_p
-            return self.__dll.ZCAN_GetValue(device_handle,path.encode("utf-8"))
-        except:
-            print("Exception on ZCAN_GetValue")
-            raise
-            
 ###############################################################################
 '''
 USBCANFD-MINI Demo
 '''
 def canfd_start(zcanlib, device_handle, chn):
 
-    ret = zcanlib.ZCAN_SetValue(device_handle, str(chn) + "/canfd_standard", "0".encode("utf-8"))
-    if ret != ZCAN_STATUS_OK:
-        print("Set CH%d CANFD standard failed!" %(chn))
-    ret = zcanlib.ZCAN_SetValue(device_handle, str(chn) + "/initenal_resistance", "1".encode("utf-8"))
-    if ret != ZCAN_STATUS_OK:
-        print("Open CH%d resistance failed!" %(chn))
-        exit(0)
+    # 失敗時拋出 ZCANError (原範例以 print + exit(0) 結束整個行程)
+    def set_value(prop, value, what):
+        if zcanlib.ZCAN_SetValue(device_handle, str(chn) + "/" + prop, value.encode("utf-8")) != ZCAN_STATUS_OK:
+            raise ZCANError("CH%d %s failed" % (chn, what))
 
-    ret = zcanlib.ZCAN_SetValue(device_handle,str(chn)+"/canfd_abit_baud_rate","500000".encode("utf-8"))  #设置波特率
-    ret = zcanlib.ZCAN_SetValue(device_handle,str(chn)+"/canfd_dbit_baud_rate","2000000".encode("utf-8"))
-    if ret != ZCAN_STATUS_OK:
-        print("Set CH%d baud failed!" %(chn))      
-        exit(0)
-        
-    ret = zcanlib.ZCAN_SetValue(device_handle, "0/set_cn","A001".encode("utf-8"))
-    if ret == ZCAN_STATUS_OK:
-        t = zcanlib.ZCAN_GetValue(device_handle, "0/get_cn/1")
-        print(c_char_p(t).value.decode("utf-8"))
+    zcanlib.ZCAN_SetValue(device_handle, str(chn) + "/canfd_standard", "0".encode("utf-8"))   # 部分型號不支援，忽略失敗
+    set_value("initenal_resistance", "1", "open resistance")
+    zcanlib.ZCAN_SetValue(device_handle,str(chn)+"/canfd_abit_baud_rate","500000".encode("utf-8"))  #设置波特率
+    set_value("canfd_dbit_baud_rate", "2000000", "set baud")
+    zcanlib.ZCAN_SetValue(device_handle, "0/set_cn","A001".encode("utf-8"))
 
 
     chn_init_cfg = ZCAN_CHANNEL_INIT_CONFIG()
@@ -560,46 +493,20 @@ def canfd_start(zcanlib, device_handle, chn):
     chn_init_cfg.config.canfd.mode  = 0
     chn_handle = zcanlib.InitCAN(device_handle, chn, chn_init_cfg)
     if chn_handle ==0:
-        print("initCAN failed!" %(chn))  
-        exit(0)
+        raise ZCANError("CH%d initCAN failed" % chn)
 ###SET filter  
-    ret = zcanlib.ZCAN_SetValue(device_handle,str(chn)+"/filter_clear","0".encode("utf-8"))
-    if ret != ZCAN_STATUS_OK:
-        print("Set CH%d  filter_clear failed!" %(chn))
-        exit(0)
-    ret = zcanlib.ZCAN_SetValue(device_handle,str(chn)+"/filter_mode","0".encode("utf-8"))    #标准帧滤波
-    if ret != ZCAN_STATUS_OK:
-        print("Set CH%d  filter_mode failed!" %(chn)) 
-        exit(0)
-    ret = zcanlib.ZCAN_SetValue(device_handle,str(chn)+"/filter_start","0".encode("utf-8"))
-    if ret != ZCAN_STATUS_OK:
-        print("Set CH%d  filter_start failed!" %(chn))  
-        exit(0)        
-    ret = zcanlib.ZCAN_SetValue(device_handle,str(chn)+"/filter_end","0x7FF".encode("utf-8"))
-    if ret != ZCAN_STATUS_OK:
-        print("Set CH%d  filter_end failed!" %(chn)) 
-        exit(0)
-    ret = zcanlib.ZCAN_SetValue(device_handle,str(chn)+"/filter_mode","1".encode("utf-8"))    #扩展帧滤波
-    if ret != ZCAN_STATUS_OK:
-        print("Set CH%d  filter_mode failed!" %(chn))
-        exit(0)
-    ret = zcanlib.ZCAN_SetValue(device_handle,str(chn)+"/filter_start","0".encode("utf-8"))
-    if ret != ZCAN_STATUS_OK:
-        print("Set CH%d  filter_start failed!" %(chn))
-        exit(0)        
-    ret = zcanlib.ZCAN_SetValue(device_handle,str(chn)+"/filter_end","0x1FFFFFFF".encode("utf-8"))
-    if ret != ZCAN_STATUS_OK:
-        print("Set CH%d  filter_end failed!" %(chn))
-        exit(0)
-    ret = zcanlib.ZCAN_SetValue(device_handle,str(chn)+"/filter_ack","0".encode("utf-8"))
-    if ret != ZCAN_STATUS_OK:
-        print("Set CH%d  filter_ack failed!" %(chn))
-        exit(0)
+    set_value("filter_clear", "0", "filter_clear")
+    set_value("filter_mode", "0", "filter_mode")    #标准帧滤波
+    set_value("filter_start", "0", "filter_start")
+    set_value("filter_end", "0x7FF", "filter_end")
+    set_value("filter_mode", "1", "filter_mode")    #扩展帧滤波
+    set_value("filter_start", "0", "filter_start")
+    set_value("filter_end", "0x1FFFFFFF", "filter_end")
+    set_value("filter_ack", "0", "filter_ack")
 
     ret=zcanlib.StartCAN(chn_handle)
     if ret != ZCAN_STATUS_OK:
-        print("startCAN failed!" %(chn))
-        exit(0)  
+        raise ZCANError("CH%d startCAN failed" % chn)
 
     # ret = zcanlib.ZCAN_SetValue(device_handle,str(chn)+"/set_device_tx_echo","1".encode("utf-8"))   #发送回显设置，0-禁用，1-开启
     # if ret != ZCAN_STATUS_OK:
@@ -0,0 +1,49 @@
+import os
+import sys
+import platform
+import logging
+from contextlib import contextmanager
+
+logger = logging.getLogger("ZLG_CAN_TOOL")
+
+# --- SDK 路徑與環境 ---
+# 網頁介面與無頭 CLI 共用：zlg 資料夾加入 sys.path/DLL 搜尋路徑，呼叫 SDK 時切換工作目錄 (kerneldlls 以相對路徑載入)。
+current_dir = os.path.dirname(os.path.abspath(__file__))
+zlg_folder_path = os.path.normpath(os.path.join(current_dir, "zlg"))
+if os.path.exists(zlg_folder_path):
+    if zlg_folder_path not in sys.path:
+        sys.path.insert(0, zlg_folder_path)
+    if platform.system() == "Windows":
+        try:
+            os.add_dll_directory(zlg_folder_path)
+        except:
+            pass
+
+# 非 Windows (無 zlgcan.dll) 或設定 ZLG_SIM=1 時改用模擬後端；ZLG_SIM=0 強制使用實體 SDK
+USE_SIM = os.environ.get("ZLG_SIM", "0" if platform.system() == "Windows" else "1") == "1"
+
+
+@contextmanager
+def zlg_env():
+    _old_cwd = os.getcwd()
+    try:
+        os.chdir(zlg_folder_path)
+        yield
+    finally:
+        os.chdir(_old_cwd)
+
+
+def create_zcan(metrics=None, sim_load=None, sim_fps=None):
+    """建立 (已包裝呼叫統計的) ZCAN 實例；參數為 None 時依 ZLG_METRICS/ZLG_SIM_LOAD/ZLG_SIM_FPS 環境變數。"""
+    with zlg_env():
+        import zlgcan
+        from zcan_metrics import InstrumentedZCAN
+        ZCAN = zlgcan.ZCAN
+        if USE_SIM: from zcan_sim import SimZCAN as ZCAN
+        logger.info("建立 ZCAN 模擬後端..." if USE_SIM else "建立 ZCAN SDK 實例...")
+        zcanlib = InstrumentedZCAN(ZCAN(), enabled=os.environ.get("ZLG_METRICS") == "1" if metrics is None else metrics)
+    if USE_SIM:
+        if sim_load is None and os.environ.get("ZLG_SIM_LOAD"): sim_load = float(os.environ["ZLG_SIM_LOAD"])
+        if sim_fps is None and os.environ.get("ZLG_SIM_FPS"): sim_fps = float(os.environ["ZLG_SIM_FPS"])
+        if sim_load is not None or sim_fps is not None: zcanlib.set_bus_load(load=sim_load or 0.0, fps=sim_fps)
+    return zcanlib